@@ -1,12 +1,16 @@
 from collections import defaultdict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import dataclasses
 import enum
 from typing import List, Tuple, Dict, Optional, Type
 
-import crowdkit.aggregation as aggregation
+import numpy as np
 import pandas as pd
 import toloka.client as toloka
 
 from .. import base, mapping, objects, Worker, Human
+from . import aggregation
+from .aggregation import AggregationState
 
 
 class AggregationAlgorithm(enum.Enum):
@@ -15,6 +19,12 @@ class AggregationAlgorithm(enum.Enum):
     DAWID_SKENE = 'dawid-skene'
 
 
+class AggregationBackend(enum.Enum):
+    NATIVE = 'native'
+    # reference implementation, requires crowd-kit
+    CROWDKIT = 'crowd-kit'
+
+
 WorkerLabel = Tuple[base.Label, Worker]
 TaskLabels = List[WorkerLabel]
 LabelProba = Tuple[base.Label, float]
@@ -27,6 +37,19 @@ aggregator_map = {
     AggregationAlgorithm.DAWID_SKENE: aggregation.DawidSkene(n_iter=10),
 }
 
+# Warm-started Dawid-Skene runs until labels probas converge, so its results don't depend on starting point, unless
+# warm start diverges, see aggregation.DawidSkene.
+warm_start_dawid_skene = aggregation.DawidSkene(n_iter=100, probas_tol=1e-5)
+
+
+def get_crowdkit_aggregator(aggregation_algorithm: AggregationAlgorithm):
+    import crowdkit.aggregation
+
+    return {
+        AggregationAlgorithm.MAJORITY_VOTE: crowdkit.aggregation.MajorityVote(),
+        AggregationAlgorithm.DAWID_SKENE: crowdkit.aggregation.DawidSkene(n_iter=10),
+    }[aggregation_algorithm]
+
 
 def split_generated_answer(combined_type: Type[objects.CombinedAnswer]) -> List[List[objects.CombinedAnswer]]:
     answer_groups = defaultdict(list)
@@ -41,49 +64,121 @@ def predict_labels_probas(
     aggregation_algorithm: AggregationAlgorithm,
     task_mapping: mapping.TaskMapping,
     worker_weights: Optional[WorkerWeights] = None,
+    backend: AggregationBackend = AggregationBackend.NATIVE,
+    state: Optional[AggregationState] = None,
+    workers: int = 1,
+    use_processes: bool = False,
 ) -> List[Optional[TaskLabelsProbas]]:
     label_cls = task_mapping.output_mapping[0].obj_meta.type
     assert issubclass(label_cls, base.Label)
     if not issubclass(label_cls, objects.CombinedAnswer):
         classes = label_cls.possible_instances()
         extra_data = None if worker_weights is None else (worker_weights, classes)
-        return predict_labels_probas_for_class(labels, aggregation_algorithm, extra_data)
+        return predict_labels_probas_for_class(labels, aggregation_algorithm, extra_data, backend, state)
 
-    results = [None for _ in labels]
+    # tasks are partitioned by class groups in one pass, group of task is determined by its first label
+    groups = split_generated_answer(label_cls)
+    label_to_group = {label: group_idx for group_idx, classes in enumerate(groups) for label in classes}
+    group_indices = [[] for _ in groups]
+    for i, task_labels in enumerate(labels):
+        if not task_labels:
+            continue
+        group_idx = label_to_group.get(task_labels[0][0])
+        matches = sum(label_to_group.get(label) == group_idx for label, _ in task_labels)
+        assert matches == len(task_labels), 'Found mixed-class output labels'
+        if group_idx is not None:
+            group_indices[group_idx].append(i)
 
-    for classes in split_generated_answer(label_cls):
-        indices, current_labels = [], []
-        for i, task_labels in enumerate(labels):
-            if not task_labels:
-                continue
-            matches = sum(label in classes for label, _ in task_labels)
-            assert matches == 0 or matches == len(task_labels), 'Found mixed-class output labels'
+    # Groups are aggregated independently, so they can be aggregated concurrently. Aggregation is CPU-bound, so
+    # processes are needed to use several cores. Generated answer classes can't be pickled, so labels of each group are
+    # replaced by their ranks, which keep labels order.
+    group_idx_list = [group_idx for group_idx, indices in enumerate(group_indices) if indices]
+    group_values = {group_idx: sorted(groups[group_idx]) for group_idx in group_idx_list}
+    args_list = []
+    for group_idx in group_idx_list:
+        ranks = {label: rank for rank, label in enumerate(group_values[group_idx])}
+        group_state = None
+        if state is not None:
+            group_state = AggregationState(
+                {
+                    tuple(ranks[label] for label in key): dataclasses.replace(
+                        model, label_values=[ranks[label] for label in model.label_values]
+                    )
+                    for key, model in state.dawid_skene.items()
+                    if all(label in ranks for label in key)
+                }
+            )
+        args_list.append(
+            (
+                [[(ranks[label], w) for label, w in labels[i]] for i in group_indices[group_idx]],
+                aggregation_algorithm,
+                None if worker_weights is None else (worker_weights, [ranks[label] for label in groups[group_idx]]),
+                backend,
+                group_state,
+            )
+        )
+    if workers > 1 and len(args_list) > 1:
+        executor_cls: Type[Executor] = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        with executor_cls(max_workers=min(workers, len(args_list))) as executor:
+            groups_results = list(executor.map(predict_labels_probas_for_group, *zip(*args_list)))
+    else:
+        groups_results = [predict_labels_probas_for_group(*args) for args in args_list]
 
-            if matches:
-                current_labels.append(task_labels)
-                indices.append(i)
+    results = [None for _ in labels]
+    for group_idx, (label_probas, group_state) in zip(group_idx_list, groups_results):
+        values = group_values[group_idx]
+        for i, probas in zip(group_indices[group_idx], label_probas):
+            if probas is not None:
+                results[i] = {values[rank]: proba for rank, proba in probas.items()}
+        if state is not None:
+            for key, model in group_state.dawid_skene.items():
+                state.dawid_skene[tuple(values[rank] for rank in key)] = dataclasses.replace(
+                    model, label_values=[values[rank] for rank in model.label_values]
+                )
+    return results
 
-        extra_data = None if worker_weights is None else (worker_weights, classes)
-        label_probas = predict_labels_probas_for_class(current_labels, aggregation_algorithm, extra_data)
-        for i, probas in zip(indices, label_probas):
-            results[i] = probas
 
-    return results
+# Aggregation state of class group is returned, because group may be aggregated in another process.
+def predict_labels_probas_for_group(
+    labels: List[TaskLabels],
+    aggregation_algorithm: AggregationAlgorithm,
+    worker_weights_and_classes: Optional[Tuple[WorkerWeights, List[base.Label]]],
+    backend: AggregationBackend,
+    state: Optional[AggregationState],
+) -> Tuple[List[Optional[TaskLabelsProbas]], Optional[AggregationState]]:
+    probas = predict_labels_probas_for_class(labels, aggregation_algorithm, worker_weights_and_classes, backend, state)
+    return probas, state
 
 
 def predict_labels_probas_for_class(
     labels: List[TaskLabels],
     aggregation_algorithm: AggregationAlgorithm,
     worker_weights_and_classes: Optional[Tuple[WorkerWeights, List[base.Label]]] = None,
+    backend: AggregationBackend = AggregationBackend.NATIVE,
+    state: Optional[AggregationState] = None,
 ) -> List[Optional[TaskLabelsProbas]]:
     if not labels:
         return []
+    if aggregation_algorithm in aggregator_map and backend == AggregationBackend.NATIVE:
+        results = [None for _ in labels]
+        data = aggregation.EncodedLabels.encode(labels)
+        if not data.num_tasks:
+            return results
+        aggregator = aggregator_map[aggregation_algorithm]
+        if state is not None and isinstance(aggregator, aggregation.DawidSkene):
+            key = tuple(data.label_values)
+            label_probas, state.dawid_skene[key] = warm_start_dawid_skene.fit(data, state.dawid_skene.get(key))
+        else:
+            label_probas = aggregator.fit_predict_proba(data)
+        for task_idx, probas in zip(data.task_indices, label_probas):
+            results[task_idx] = {label: float(proba) for label, proba in zip(data.label_values, probas)}
+        return results
     if aggregation_algorithm in aggregator_map:
         crowdkit_labels = []
         for task_idx, task_labels in enumerate(labels):
             for label, worker in task_labels:
                 crowdkit_labels.append({'label': label, 'task': task_idx, 'worker': worker.id})
-        aggregator = aggregator_map[aggregation_algorithm]
+        aggregator = get_crowdkit_aggregator(aggregation_algorithm)
         results = [None for _ in labels]
 
         if not crowdkit_labels:
@@ -101,27 +196,39 @@ def predict_labels_probas_for_class(
     assert worker_weights_and_classes is not None
     worker_weights, classes = worker_weights_and_classes
     num_classes = len(classes)
+    num_tasks = len(labels)
+    label_to_index = {label: i for i, label in enumerate(classes)}
 
-    def bayes_proba(answer: base.Label, answers: TaskLabels) -> float:
-        result = 1.0
-        for other_answer, w in answers:
-            q = worker_weights[w.id]
-            if other_answer == answer:
-                result *= q
-            else:
-                result *= (1 - q) / (num_classes - 1)
-        return result
-
-    weighted_results = []
-    for task_labels in labels:
-        if not task_labels:
-            weighted_results.append(None)
-            continue
-        calculated_z_proba = {label: bayes_proba(label, task_labels) * (1 / num_classes) for label in classes}
-        normalization = sum(calculated_z_proba.values())
-        weighted_results.append({label: value / normalization for label, value in calculated_z_proba.items()})
+    # (task, worker, label) table of all answers, integer-encoded
+    task_indices, label_indices, weights = [], [], []
+    for task_idx, task_labels in enumerate(labels):
+        for label, w in task_labels:
+            task_indices.append(task_idx)
+            label_indices.append(label_to_index[label])
+            weights.append(worker_weights[w.id])
+    if not weights:
+        return [None for _ in labels]
+    task_indices = np.array(task_indices, dtype=int)
+    label_indices = np.array(label_indices, dtype=int)
+    weights = np.array(weights, dtype=float)
+
+    # Answer of worker with weight q contributes log(q) to answered label and log((1 - q) / (num_classes - 1)) to
+    # others. Contributions are summed per task in log space, because product of probabilities underflows for tasks
+    # with high overlap. Uniform prior of labels is omitted, it is cancelled by normalization.
+    with np.errstate(divide='ignore'):
+        answers_log_probas = np.repeat(np.log((1 - weights) / (num_classes - 1))[:, np.newaxis], num_classes, axis=1)
+        answers_log_probas[np.arange(len(weights)), label_indices] = np.log(weights)
+    log_probas = np.zeros((num_tasks, num_classes))
+    np.add.at(log_probas, task_indices, answers_log_probas)
+
+    probas = np.exp(log_probas - log_probas.max(axis=1, keepdims=True))
+    probas /= probas.sum(axis=1, keepdims=True)
+    has_labels = np.bincount(task_indices, minlength=num_tasks) > 0
 
-    return weighted_results
+    return [
+        {label: float(proba) for label, proba in zip(classes, task_probas)} if task_has_labels else None
+        for task_probas, task_has_labels in zip(probas, has_labels)
+    ]
 
 
 def get_most_probable_label(label_probas: Optional[TaskLabelsProbas]) -> Optional[LabelProba]:
@@ -136,6 +243,9 @@ def collect_labels_probas_from_assignments(
     pool_input_objects: List[mapping.Objects],
     aggregation_algorithm: AggregationAlgorithm,
     worker_weights: Optional[WorkerWeights] = None,
+    state: Optional[AggregationState] = None,
+    workers: int = 1,
+    use_processes: bool = False,
 ) -> List[Tuple[Optional[TaskLabelsProbas], List[WorkerLabel]]]:
     raw_labels = []
     for _, output_objects_list in mapping.get_solutions(assignments, task_mapping, pool_input_objects):
@@ -148,4 +258,17 @@ def collect_labels_probas_from_assignments(
             task_labels.append((label, worker))
         raw_labels.append(task_labels)
 
-    return list(zip(predict_labels_probas(raw_labels, aggregation_algorithm, task_mapping, worker_weights), raw_labels))
+    return list(
+        zip(
+            predict_labels_probas(
+                raw_labels,
+                aggregation_algorithm,
+                task_mapping,
+                worker_weights,
+                state=state,
+                workers=workers,
+                use_processes=use_processes,
+            ),
+            raw_labels,
+        )
+    )
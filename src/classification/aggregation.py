@@ -0,0 +1,207 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .. import base, Worker
+
+# same as in crowd-kit, errors probabilities are clipped to avoid zero likelihoods
+EPS = 1e-10
+
+
+@dataclass
+class EncodedLabels:
+    """
+    Integer-encoded (task, worker, label) table of workers answers. Only tasks with answers are encoded, `task_indices`
+    maps them back to positions in original list of task labels. Labels are sorted, as columns in crowd-kit results.
+    """
+
+    tasks: np.ndarray
+    workers: np.ndarray
+    labels: np.ndarray
+    task_indices: np.ndarray
+    worker_ids: List[str]
+    label_values: List[base.Label]
+
+    @staticmethod
+    def encode(labels: Sequence[Sequence[Tuple[base.Label, Worker]]]) -> 'EncodedLabels':
+        task_indices, worker_ids, label_values = [], [], []
+        for task_idx, task_labels in enumerate(labels):
+            for label, worker in task_labels:
+                task_indices.append(task_idx)
+                worker_ids.append(worker.id)
+                label_values.append(label)
+        task_indices, tasks = np.unique(np.array(task_indices, dtype=int), return_inverse=True)
+        worker_ids, workers = unique(worker_ids)
+        label_values, labels = unique(label_values)
+        return EncodedLabels(
+            tasks=tasks.reshape(-1),
+            workers=workers,
+            labels=labels,
+            task_indices=task_indices,
+            worker_ids=worker_ids,
+            label_values=label_values,
+        )
+
+    @property
+    def num_tasks(self) -> int:
+        return len(self.task_indices)
+
+    @property
+    def num_workers(self) -> int:
+        return len(self.worker_ids)
+
+    @property
+    def num_labels(self) -> int:
+        return len(self.label_values)
+
+
+def unique(values: list) -> Tuple[list, np.ndarray]:
+    sorted_values = sorted(set(values))
+    value_to_index = {value: i for i, value in enumerate(sorted_values)}
+    return sorted_values, np.array([value_to_index[value] for value in values], dtype=int)
+
+
+# Sums rows of `values` with same index, NumPy bincount is used per column because it is much faster than np.add.at.
+def scatter_sum(indices: np.ndarray, values: np.ndarray, size: int) -> np.ndarray:
+    return np.stack([np.bincount(indices, weights=column, minlength=size) for column in values.T], axis=1)
+
+
+def normalize_rows(scores: np.ndarray) -> np.ndarray:
+    return scores / scores.sum(axis=1, keepdims=True)
+
+
+class MajorityVote:
+    def fit_predict_proba(self, data: EncodedLabels) -> np.ndarray:
+        scores = np.bincount(data.tasks * data.num_labels + data.labels, minlength=data.num_tasks * data.num_labels)
+        return normalize_rows(scores.reshape(data.num_tasks, data.num_labels).astype(float))
+
+
+@dataclass
+class DawidSkeneModel:
+    """
+    Fitted Dawid-Skene parameters: class priors and sparse workers errors matrices, with rows for (worker, answered
+    label) pairs, encoded as `worker * len(label_values) + label`.
+    """
+
+    worker_ids: List[str]
+    label_values: List[base.Label]
+    pair_keys: np.ndarray
+    errors: np.ndarray
+    priors: np.ndarray
+    iterations: int
+    # if False, model was fitted from cold start, i.e. after warm start divergence
+    warm_started: bool = False
+
+
+@dataclass
+class AggregationState:
+    """
+    Models fitted by previous aggregation of the pool, to warm-start next aggregation after loop iteration, which
+    adds small fraction of labels. Dawid-Skene models are kept per labels set, so each class group of CombinedAnswer
+    has its own model.
+    """
+
+    dawid_skene: Dict[Tuple[base.Label, ...], DawidSkeneModel] = field(default_factory=dict)
+
+
+@dataclass
+class DawidSkene:
+    """
+    Dawid-Skene EM aggregation over integer-encoded labels, same as in crowd-kit, which is kept as reference backend.
+
+    Workers errors matrices are sparse: each worker has rows only for labels which they answered, because E-step uses
+    only them. Rows are indexed by (worker, label) pairs, so confusion matrices of all workers are stored in single
+    (pairs, labels) array. EM stops after `n_iter` iterations, or when evidence lower bound improves less than `tol`.
+    Evidence lower bound may be almost flat far from the fixed point, so if `probas_tol` is set, EM instead stops when
+    labels probas change less than it.
+
+    EM can be warm-started with model fitted on previous labels of the same tasks. Its priors and errors of known
+    (worker, label) pairs seed the first E-step, errors of new pairs are initialized by majority vote, as in cold start.
+    EM has many local optima, and warm start may settle in another one than cold start, i.e. when labels are noisy.
+    So warm start is kept only if EM converges and labels predicted by seeding model don't change, otherwise it is
+    diverged, and EM is re-initialized from cold start. This check is heuristic, it doesn't guarantee same results as
+    cold start, so warm start is intended for intermediate aggregations with `probas_tol` set.
+    """
+
+    n_iter: int = 100
+    tol: float = 1e-5
+    probas_tol: Optional[float] = None
+
+    def fit_predict_proba(self, data: EncodedLabels) -> np.ndarray:
+        probas, _ = self.fit(data)
+        return probas
+
+    def fit(self, data: EncodedLabels, model: Optional[DawidSkeneModel] = None) -> Tuple[np.ndarray, DawidSkeneModel]:
+        pair_keys, answer_pairs = np.unique(data.workers * data.num_labels + data.labels, return_inverse=True)
+        answer_pairs = answer_pairs.reshape(-1)
+        pair_workers = pair_keys // data.num_labels
+
+        def normalize_errors(errors: np.ndarray) -> np.ndarray:
+            return errors / scatter_sum(pair_workers, errors, data.num_workers)[pair_workers]
+
+        def m_step(probas: np.ndarray) -> np.ndarray:
+            return normalize_errors(np.maximum(scatter_sum(answer_pairs, probas[data.tasks], len(pair_keys)), EPS))
+
+        def e_step(priors: np.ndarray, errors: np.ndarray) -> np.ndarray:
+            with np.errstate(divide='ignore'):
+                log_likelihoods = np.log(priors) + scatter_sum(data.tasks, np.log(errors)[answer_pairs], data.num_tasks)
+            return normalize_rows(np.exp(log_likelihoods - log_likelihoods.max(axis=1, keepdims=True)))
+
+        def evidence_lower_bound(probas: np.ndarray, priors: np.ndarray, errors: np.ndarray) -> float:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                # 0 * log(0) terms are skipped, as NaN values in crowd-kit
+                joint_expectation = np.nansum(probas[data.tasks] * (np.log(errors)[answer_pairs] + np.log(priors)))
+                entropy = -np.nansum(probas * np.log(probas))
+            return (joint_expectation + entropy) / len(data.tasks)
+
+        def em(priors: np.ndarray, errors: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int, bool]:
+            loss = -np.inf
+            probas = None
+            iterations = 0
+            for iterations in range(1, self.n_iter + 1):
+                previous_probas, probas = probas, e_step(priors, errors)
+                priors = probas.mean(axis=0)
+                errors = m_step(probas)
+                if self.probas_tol is not None:
+                    if previous_probas is not None and np.abs(probas - previous_probas).max() < self.probas_tol:
+                        return probas, priors, errors, iterations, True
+                    continue
+                new_loss = evidence_lower_bound(probas, priors, errors)
+                if new_loss - loss < self.tol:
+                    return probas, priors, errors, iterations, True
+                loss = new_loss
+            return probas, priors, errors, iterations, False
+
+        probas = MajorityVote().fit_predict_proba(data)
+        cold_priors = probas.mean(axis=0)
+        cold_errors = m_step(probas)
+        priors, errors = cold_priors, cold_errors
+        warm_started = model is not None and model.label_values == data.label_values
+        if warm_started:
+            worker_to_index = {worker_id: i for i, worker_id in enumerate(data.worker_ids)}
+            model_workers = np.array([worker_to_index.get(worker_id, -1) for worker_id in model.worker_ids], dtype=int)
+            model_pair_workers = model_workers[model.pair_keys // data.num_labels]
+            known = model_pair_workers >= 0
+            model_pair_keys = model_pair_workers[known] * data.num_labels + model.pair_keys[known] % data.num_labels
+            positions = np.minimum(np.searchsorted(pair_keys, model_pair_keys), len(pair_keys) - 1)
+            found = pair_keys[positions] == model_pair_keys
+            errors = cold_errors.copy()
+            errors[positions[found]] = model.errors[known][found]
+            # known workers may have answered new labels, so their matrices are normalized again
+            errors = normalize_errors(errors)
+            priors = model.priors
+            seed_labels = e_step(priors, errors).argmax(axis=1)
+        probas, priors, errors, iterations, converged = em(priors, errors)
+        if warm_started and (not converged or (probas.argmax(axis=1) != seed_labels).any()):
+            warm_started = False
+            probas, priors, errors, iterations, _ = em(cold_priors, cold_errors)
+        return probas, DawidSkeneModel(
+            worker_ids=data.worker_ids,
+            label_values=data.label_values,
+            pair_keys=pair_keys,
+            errors=errors,
+            priors=priors,
+            iterations=iterations,
+            warm_started=warm_started,
+        )
@@ -1,10 +1,17 @@
+import asyncio
+from collections import defaultdict
 from dataclasses import dataclass, field
+import datetime
 import logging
-from typing import List, Dict, Union, Optional, Tuple
+import threading
+import time
+from typing import Any, List, Dict, Union, Optional, Set, Tuple, Iterable, Iterator
 
+import numpy as np
 import toloka.client as toloka
 
 from .. import base, classification, control, duration, evaluation, mapping, mos, pool as pool_config, utils, worker
+from .state import LoopStateStore
 
 logger = logging.getLogger(__name__)
 
@@ -51,6 +58,372 @@ class Params:
     control: control.Control
     task_duration_function: duration.TaskDurationFunction
     aggregation_algorithm: Optional[classification.AggregationAlgorithm] = None
+    # class groups of CombinedAnswer labels are aggregated concurrently by this number of threads or processes
+    aggregation_workers: int = 1
+    aggregation_use_processes: bool = False
+
+
+@dataclass
+class PoolAssignmentsCursor:
+    # latest event timestamps among fetched assignments, next fetches request only assignments with newer events
+    submitted: Optional[datetime.datetime] = None
+    accepted: Optional[datetime.datetime] = None
+    rejected: Optional[datetime.datetime] = None
+    id_to_assignment: Dict[str, toloka.Assignment] = field(default_factory=dict)
+    # active assignments, which are tracked only for in-flight attempts and are not stored
+    created: Optional[datetime.datetime] = None
+    id_to_active_assignment: Dict[str, toloka.Assignment] = field(default_factory=dict)
+
+    def update(self, assignment: toloka.Assignment):
+        existing = self.id_to_assignment.get(assignment.id)
+        # same assignment may be received by several requests, latest version wins
+        if existing is None or get_last_event_time(existing) <= (get_last_event_time(assignment) or existing.submitted):
+            self.id_to_assignment[assignment.id] = assignment
+        self.submitted = max_time(self.submitted, assignment.submitted)
+        self.accepted = max_time(self.accepted, assignment.accepted)
+        self.rejected = max_time(self.rejected, assignment.rejected)
+
+
+def max_time(a: Optional[datetime.datetime], b: Optional[datetime.datetime]) -> Optional[datetime.datetime]:
+    if a is None or b is None:
+        return a or b
+    return max(a, b)
+
+
+def get_last_event_time(assignment: toloka.Assignment) -> Optional[datetime.datetime]:
+    return max_time(max_time(assignment.submitted, assignment.accepted), assignment.rejected)
+
+
+class AssignmentsFetcher:
+    """
+    Fetches pool assignments incrementally. Loops request all assignments of the pool with given statuses on each
+    iteration, which is slow for large pools. Fetcher keeps all received assignments in a local store and on each call
+    requests from Toloka only assignments which were submitted, accepted or rejected after the latest seen event, with
+    small lag to tolerate events with same timestamps.
+
+    Fetcher can be passed to ClassificationLoop and FeedbackLoop in place of client assignments requests. Fetcher is
+    thread-safe, so it can be shared by concurrent requests of async loops. With state store, received assignments are
+    persisted, and fetcher created after restart continues from them.
+    """
+
+    statuses = (toloka.Assignment.SUBMITTED, toloka.Assignment.ACCEPTED, toloka.Assignment.REJECTED)
+
+    client: toloka.TolokaClient
+    lag: datetime.timedelta
+    cursors: Dict[str, PoolAssignmentsCursor]
+    lock: threading.RLock
+    state_store: Optional[LoopStateStore]
+
+    def __init__(
+        self,
+        client: toloka.TolokaClient,
+        lag: datetime.timedelta = datetime.timedelta(minutes=1),
+        state_store: Optional[LoopStateStore] = None,
+    ):
+        self.client = client
+        self.lag = lag
+        self.cursors = {}
+        self.lock = threading.RLock()
+        self.state_store = state_store
+
+    def get_assignments(
+        self,
+        status: Union[toloka.Assignment.Status, List[toloka.Assignment.Status]],
+        pool_id: str,
+    ) -> List[toloka.Assignment]:
+        statuses = set(status) if isinstance(status, list) else {status}
+        assert statuses <= set(self.statuses), f'only assignments with statuses {self.statuses} are fetched'
+        with self.lock:
+            cursor = self.fetch(pool_id)
+            # order is the same as in Toloka search results
+            return [
+                assignment for _, assignment in sorted(cursor.id_to_assignment.items()) if assignment.status in statuses
+            ]
+
+    def fetch(self, pool_id: str) -> PoolAssignmentsCursor:
+        with self.lock:
+            cursor = self.cursors.get(pool_id) or self.restore(pool_id)
+            if cursor.submitted is None:
+                requests = [{'status': list(self.statuses)}]
+            else:
+                requests = []
+                for event, event_time, status in (
+                    ('submitted', cursor.submitted, toloka.Assignment.SUBMITTED),
+                    ('accepted', cursor.accepted, toloka.Assignment.ACCEPTED),
+                    ('rejected', cursor.rejected, toloka.Assignment.REJECTED),
+                ):
+                    if event_time is None:
+                        # no such events yet, so all of them are new
+                        requests.append({'status': [status]})
+                    else:
+                        requests.append({'status': list(self.statuses), f'{event}_gte': event_time - self.lag})
+            received = []
+            for request in requests:
+                for assignment in self.client.get_assignments(pool_id=pool_id, **request):
+                    cursor.update(assignment)
+                    received.append(assignment)
+            if self.state_store is not None:
+                self.state_store.put_assignments(pool_id, (cursor.id_to_assignment[a.id] for a in received))
+            self.cursors[pool_id] = cursor
+            logger.debug(
+                f'{len(received)} assignments are received for pool {pool_id}, {len(cursor.id_to_assignment)} in total'
+            )
+            return cursor
+
+    # Assignments which are being solved or are not evaluated yet. Active assignments are requested by creation time
+    # after the latest seen one, and are dropped once they are submitted, skipped or expired.
+    def get_in_flight_assignments(self, pool_id: str) -> List[toloka.Assignment]:
+        with self.lock:
+            cursor = self.cursors.get(pool_id) or self.restore(pool_id)
+            self.cursors[pool_id] = cursor
+            active = cursor.id_to_active_assignment
+            # active assignments are requested first, so assignment submitted in between is received by fetch()
+            request = {'status': [toloka.Assignment.ACTIVE]}
+            if cursor.created is not None:
+                request['created_gte'] = cursor.created - self.lag
+            for assignment in self.client.get_assignments(pool_id=pool_id, **request):
+                active[assignment.id] = assignment
+                cursor.created = max_time(cursor.created, assignment.created)
+            self.fetch(pool_id)
+            # submitted assignments are no longer active
+            for assignment_id in active.keys() & cursor.id_to_assignment.keys():
+                del active[assignment_id]
+
+            if active:
+                created = [assignment.created for assignment in active.values()]
+                # assignment can't end before it is created
+                since = min(created) - self.lag if None not in created else None
+                for event, status in (('skipped', toloka.Assignment.SKIPPED), ('expired', toloka.Assignment.EXPIRED)):
+                    request = {'status': [status]}
+                    if since is not None:
+                        request[f'{event}_gte'] = since
+                    for assignment in self.client.get_assignments(pool_id=pool_id, **request):
+                        active.pop(assignment.id, None)
+
+            return [assignment for _, assignment in sorted(active.items())] + [
+                assignment
+                for _, assignment in sorted(cursor.id_to_assignment.items())
+                if assignment.status == toloka.Assignment.SUBMITTED
+            ]
+
+    def restore(self, pool_id: str) -> PoolAssignmentsCursor:
+        cursor = PoolAssignmentsCursor()
+        if self.state_store is not None:
+            for assignment in self.state_store.get_assignments(pool_id):
+                cursor.update(assignment)
+        return cursor
+
+    def reset(self, pool_id: str):
+        with self.lock:
+            self.cursors.pop(pool_id, None)
+
+
+class PoolTasks:
+    """
+    Tasks of the pool, listed from Toloka once and decoded. Loop stages need pool tasks in different forms, i.e.
+    input objects or mapping from TaskID to Toloka task ID, and listing all pool tasks for each of them is slow for
+    large pools.
+
+    Loop keeps pool tasks during its iteration and appends tasks created by it. Streaming loop keeps them across polls
+    and refreshes them with tasks created since the latest known one. Tasks are only appended, so only tasks after
+    the stored ones are put to LoopStateStore.
+    """
+
+    pool_id: str
+    task_mapping: mapping.TaskMapping
+    tasks: List[toloka.Task]
+    objects: List[mapping.Objects]
+    task_ids: List[mapping.TaskID]
+    toloka_ids: Set[str]
+    # count of first tasks which are already in LoopStateStore
+    stored_count: int
+
+    def __init__(self, pool_id: str, task_mapping: mapping.TaskMapping, tasks: Iterable[toloka.Task] = ()):
+        self.pool_id = pool_id
+        self.task_mapping = task_mapping
+        self.tasks, self.objects, self.task_ids = [], [], []
+        self.toloka_ids = set()
+        self.stored_count = 0
+        self.add(tasks)
+
+    @staticmethod
+    def list(client: toloka.TolokaClient, pool_id: str, task_mapping: mapping.TaskMapping) -> 'PoolTasks':
+        return PoolTasks(pool_id, task_mapping, client.get_tasks(pool_id))
+
+    def add(self, tasks: Iterable[toloka.Task]):
+        for task in tasks:
+            objects, task_id = self.task_mapping.decode_task(task)
+            self.tasks.append(task)
+            self.objects.append(objects)
+            self.task_ids.append(task_id)
+            if task.id is not None:
+                self.toloka_ids.add(task.id)
+
+    # Returns count of added tasks. Tasks created at the same time as the latest known one are listed again, so
+    # tasks which are already known are skipped.
+    def refresh(self, client: toloka.TolokaClient) -> int:
+        created = [task.created for task in self.tasks if task.created is not None]
+        if created:
+            tasks = client.get_tasks(pool_id=self.pool_id, created_gte=max(created))
+        else:
+            tasks = client.get_tasks(pool_id=self.pool_id)
+        new_tasks = [task for task in tasks if task.id not in self.toloka_ids]
+        self.add(new_tasks)
+        return len(new_tasks)
+
+    def iterate(self, with_control_tasks: bool) -> Iterator[Tuple[toloka.Task, mapping.Objects, mapping.TaskID]]:
+        return (
+            (task, objects, task_id)
+            for task, objects, task_id in zip(self.tasks, self.objects, self.task_ids)
+            if (with_control_tasks or not task.known_solutions)
+        )
+
+    def input_objects(self) -> List[mapping.Objects]:
+        return [objects for _, objects, _ in self.iterate(with_control_tasks=False)]
+
+    def task_id_map(self, with_control_tasks: bool = False) -> Dict[mapping.TaskID, str]:
+        return {task_id: task.id for task, _, task_id in self.iterate(with_control_tasks)}
+
+    # pool tasks are added to index; array is aligned with index, tasks from index which are not found in pool
+    # have None Toloka ID
+    def toloka_task_ids(self, task_index: mapping.TaskIndex, with_control_tasks: bool = False) -> np.ndarray:
+        indices, toloka_task_ids = [], []
+        for task, _, task_id in self.iterate(with_control_tasks):
+            indices.append(task_index.add(task_id))
+            toloka_task_ids.append(task.id)
+        result = np.full(len(task_index), None, dtype=object)
+        result[indices] = toloka_task_ids
+        return result
+
+
+class LabelProbasTracker:
+    """
+    Label probabilities of pool tasks, maintained incrementally between loop iterations for dynamic overlap. Full
+    aggregation of all pool tasks on each iteration is slow for large pools, while only few tasks receive new labels.
+
+    Tracker keeps labels of accepted assignments per task and re-aggregates only tasks which received new labels.
+    Probabilities of other tasks are kept, though they were calculated with outdated worker weights, so tracker falls
+    back to full aggregation when any worker weight drifted more than `drift_tolerance` since the last full
+    aggregation. Full aggregation is also performed when worker weights appear or disappear, when previously accepted
+    assignment is no longer accepted, and on each update for Dawid-Skene, which estimates workers skills from all tasks
+    at once.
+    """
+
+    drift_tolerance: float
+    assignment_ids: set
+    task_labels: Dict[str, classification.TaskLabels]
+    task_id_to_label_proba: Dict[str, classification.LabelProba]
+    aggregated: bool
+    worker_weights: Optional[classification.WorkerWeights]
+    full_aggregations: int
+
+    def __init__(self, drift_tolerance: float = 0.05):
+        assert drift_tolerance >= 0
+        self.drift_tolerance = drift_tolerance
+        self.reset()
+        self.full_aggregations = 0
+
+    def reset(self):
+        self.assignment_ids = set()
+        self.task_labels = {}
+        self.task_id_to_label_proba = {}
+        self.aggregated = False
+        self.worker_weights = None
+
+    def add_assignment(self, assignment: toloka.Assignment, task_mapping: mapping.TaskMapping) -> List[str]:
+        self.assignment_ids.add(assignment.id)
+        task_ids = []
+        for task_id, _, output_objects in mapping.iterate_assignment(assignment, task_mapping):
+            # for now label is always the first output object; composite labels not supported yet
+            label = output_objects[0]
+            assert isinstance(label, base.Label)
+            self.task_labels.setdefault(task_id, []).append((label, worker.Human(assignment)))
+            task_ids.append(task_id)
+        return task_ids
+
+    def drift(self, worker_weights: Optional[classification.WorkerWeights]) -> float:
+        if worker_weights is None or self.worker_weights is None:
+            return 0.0
+        # weights of new workers are not drifted, their tasks are re-aggregated anyway
+        return max(
+            (abs(worker_weights.get(worker_id, weight) - weight) for worker_id, weight in self.worker_weights.items()),
+            default=0.0,
+        )
+
+    def aggregate(
+        self,
+        task_ids: List[str],
+        task_mapping: mapping.TaskMapping,
+        aggregation_algorithm: classification.AggregationAlgorithm,
+        worker_weights: Optional[classification.WorkerWeights],
+        aggregation_state: Optional[classification.AggregationState] = None,
+        workers: int = 1,
+        use_processes: bool = False,
+    ):
+        labels = [self.task_labels[task_id] for task_id in task_ids]
+        probas_list = classification.predict_labels_probas(
+            labels,
+            aggregation_algorithm,
+            task_mapping,
+            worker_weights,
+            state=aggregation_state,
+            workers=workers,
+            use_processes=use_processes,
+        )
+        for task_id, probas in zip(task_ids, probas_list):
+            label_proba = classification.get_most_probable_label(probas)
+            if label_proba is not None:
+                self.task_id_to_label_proba[task_id] = label_proba
+
+    def update(
+        self,
+        assignment_solutions: List[mapping.AssignmentSolutions],
+        task_mapping: mapping.TaskMapping,
+        aggregation_algorithm: classification.AggregationAlgorithm,
+        worker_weights: Optional[classification.WorkerWeights],
+        aggregation_state: Optional[classification.AggregationState] = None,
+        workers: int = 1,
+        use_processes: bool = False,
+    ):
+        accepted_assignments = [
+            assignment for assignment, _ in assignment_solutions if assignment.status == toloka.Assignment.ACCEPTED
+        ]
+        full = (
+            not self.aggregated
+            or (worker_weights is None) != (self.worker_weights is None)
+            or aggregation_algorithm == classification.AggregationAlgorithm.DAWID_SKENE
+            or not self.assignment_ids <= {assignment.id for assignment in accepted_assignments}
+            or self.drift(worker_weights) > self.drift_tolerance
+        )
+        if full:
+            self.reset()
+        changed_task_ids = set()
+        for assignment in accepted_assignments:
+            if assignment.id not in self.assignment_ids:
+                changed_task_ids.update(self.add_assignment(assignment, task_mapping))
+        if full:
+            self.full_aggregations += 1
+            self.aggregated = True
+            self.worker_weights = worker_weights
+            changed_task_ids = self.task_labels.keys()
+        logger.debug(f'{len(changed_task_ids)} of {len(self.task_labels)} tasks are re-aggregated')
+        self.aggregate(
+            sorted(changed_task_ids),
+            task_mapping,
+            aggregation_algorithm,
+            worker_weights,
+            aggregation_state,
+            workers,
+            use_processes,
+        )
+
+    def get_label_probas(self, pool_tasks: 'PoolTasks') -> Dict[mapping.TaskID, classification.LabelProba]:
+        result = {}
+        for _, _, task_id in pool_tasks.iterate(with_control_tasks=False):
+            label_proba = self.task_id_to_label_proba.get(task_id.id)
+            if label_proba is not None:
+                result[task_id] = label_proba
+        return result
 
 
 class ClassificationLoop:
@@ -60,6 +433,16 @@ class ClassificationLoop:
     lang: str
     assignment_evaluation_strategy: evaluation.AssignmentAccuracyEvaluationStrategy
     model_ws: Optional[worker.ModelWorkspace]
+    task_indexes: Dict[str, mapping.TaskIndex]
+    pool_tasks: Dict[str, PoolTasks]
+    assignments_fetcher: Optional[AssignmentsFetcher]
+    state_store: Optional[LoopStateStore]
+    label_probas_drift_tolerance: Optional[float]
+    label_probas_trackers: Dict[str, LabelProbasTracker]
+    warm_start_aggregation: bool
+    aggregation_states: Dict[str, classification.AggregationState]
+    worker_weights_accumulators: Dict[str, evaluation.WorkerWeightsAccumulator]
+    task_overlaps: Dict[str, Dict[str, int]]
 
     def __init__(
         self,
@@ -69,6 +452,10 @@ class ClassificationLoop:
         lang: str,
         with_control_tasks: bool = True,
         model: Optional[worker.Model] = None,
+        assignments_fetcher: Optional[AssignmentsFetcher] = None,
+        state_store: Optional[LoopStateStore] = None,
+        label_probas_drift_tolerance: Optional[float] = None,
+        warm_start_aggregation: bool = False,
     ):
         self.client = client
         self.task_mapping = task_mapping
@@ -81,6 +468,64 @@ class ClassificationLoop:
         self.model_ws = None
         if model:
             self.model_ws = worker.ModelWorkspace(model=model, task_mapping=self.task_mapping)
+        self.task_indexes = {}
+        self.pool_tasks = {}
+        if state_store is not None and assignments_fetcher is None:
+            assignments_fetcher = AssignmentsFetcher(client, state_store=state_store)
+        self.assignments_fetcher = assignments_fetcher
+        self.state_store = state_store
+        # if set, label probas for dynamic overlap are calculated incrementally, see LabelProbasTracker
+        self.label_probas_drift_tolerance = label_probas_drift_tolerance
+        self.label_probas_trackers = {}
+        # if set, Dawid-Skene aggregation for dynamic overlap is warm-started, see AggregationState
+        self.warm_start_aggregation = warm_start_aggregation
+        self.aggregation_states = {}
+        self.worker_weights_accumulators = {}
+        self.task_overlaps = {}
+
+    def get_task_index(self, pool_id: str) -> mapping.TaskIndex:
+        if pool_id not in self.task_indexes:
+            self.task_indexes[pool_id] = mapping.TaskIndex()
+        return self.task_indexes[pool_id]
+
+    def get_pool_tasks(self, pool_id: str) -> PoolTasks:
+        if pool_id not in self.pool_tasks:
+            tasks = self.state_store.get_tasks(pool_id) if self.state_store is not None else None
+            if tasks is not None:
+                self.pool_tasks[pool_id] = PoolTasks(pool_id, self.task_mapping, tasks)
+                self.pool_tasks[pool_id].stored_count = len(tasks)
+            else:
+                self.pool_tasks[pool_id] = PoolTasks.list(self.client, pool_id, self.task_mapping)
+                self.store_pool_tasks(pool_id)
+        return self.pool_tasks[pool_id]
+
+    # Aggregation of the pool for dynamic overlap is warm-started with models fitted on previous iteration, if enabled.
+    # Warm start may settle in another local optimum than cold start, so final results are aggregated from cold start.
+    def get_aggregation_state(self, pool_id: str) -> Optional[classification.AggregationState]:
+        if not self.warm_start_aggregation:
+            return None
+        if pool_id not in self.aggregation_states:
+            self.aggregation_states[pool_id] = classification.AggregationState()
+        return self.aggregation_states[pool_id]
+
+    # Worker weights of the pool are updated only with new or re-verdicted assignments.
+    def get_worker_weights_accumulator(self, pool_id: str) -> evaluation.WorkerWeightsAccumulator:
+        if pool_id not in self.worker_weights_accumulators:
+            self.worker_weights_accumulators[pool_id] = evaluation.WorkerWeightsAccumulator()
+        return self.worker_weights_accumulators[pool_id]
+
+    # Overlaps set to pool tasks by loop, by Toloka task ID.
+    def get_task_overlaps(self, pool_id: str) -> Dict[str, int]:
+        if pool_id not in self.task_overlaps:
+            self.task_overlaps[pool_id] = {}
+        return self.task_overlaps[pool_id]
+
+    def store_pool_tasks(self, pool_id: str):
+        if self.state_store is not None and pool_id in self.pool_tasks:
+            pool_tasks = self.pool_tasks[pool_id]
+            start = pool_tasks.stored_count
+            self.state_store.set_tasks(pool_id, pool_tasks.tasks[start:], start)
+            pool_tasks.stored_count = len(pool_tasks.tasks)
 
     def create_pool(
         self,
@@ -103,6 +548,30 @@ class ClassificationLoop:
     def add_input_objects(
         self, pool_id: str, input_objects: Union[List[mapping.Objects], List[Tuple[mapping.Objects, worker.Worker]]]
     ):
+        tasks = self.to_tasks(pool_id, input_objects)
+        logger.debug(f'creating {len(tasks)} tasks')
+        self.invalidate_stored_pool_tasks(pool_id)
+        result = self.client.create_tasks(tasks, allow_defaults=True, async_mode=True, skip_invalid_items=False)
+        self.add_created_tasks(pool_id, result)
+        if not self.model_ws:
+            # in case of model worker, pool is only needed to store tasks
+            self.client.open_pool(pool_id)
+
+    async def add_input_objects_async(
+        self, pool_id: str, input_objects: Union[List[mapping.Objects], List[Tuple[mapping.Objects, worker.Worker]]]
+    ):
+        client = utils.AsyncTolokaClient(self.client)
+        tasks = self.to_tasks(pool_id, input_objects)
+        logger.debug(f'creating {len(tasks)} tasks')
+        self.invalidate_stored_pool_tasks(pool_id)
+        result = await client.create_tasks(tasks, allow_defaults=True, async_mode=True, skip_invalid_items=False)
+        self.add_created_tasks(pool_id, result)
+        if not self.model_ws:
+            await client.open_pool(pool_id)
+
+    def to_tasks(
+        self, pool_id: str, input_objects: Union[List[mapping.Objects], List[Tuple[mapping.Objects, worker.Worker]]]
+    ) -> List[toloka.Task]:
         tasks = []
         for objects_data in input_objects:
             objects, user_id = objects_data, None
@@ -114,85 +583,213 @@ class ClassificationLoop:
             task.unavailable_for = user_id
             task.pool_id = pool_id
             tasks.append(task)
-        logger.debug(f'creating {len(tasks)} tasks')
-        self.client.create_tasks(tasks, allow_defaults=True, async_mode=True, skip_invalid_items=False)
-        if not self.model_ws:
-            # in case of model worker, pool is only needed to store tasks
-            self.client.open_pool(pool_id)
+        return tasks
+
+    def add_created_tasks(self, pool_id: str, result: Any):
+        if pool_id in self.pool_tasks:
+            if isinstance(result, toloka.batch_create_results.TaskBatchCreateResult) and result.items:
+                self.pool_tasks[pool_id].add(result.items[key] for key in sorted(result.items, key=int))
+            else:
+                # created tasks IDs are unknown, pool tasks will be listed again
+                del self.pool_tasks[pool_id]
+        self.store_pool_tasks(pool_id)
+
+    # If loop is interrupted after tasks creation, stored pool tasks are incomplete, so they are invalidated beforehand.
+    def invalidate_stored_pool_tasks(self, pool_id: str):
+        if self.state_store is not None:
+            self.state_store.invalidate_tasks(pool_id)
 
     def prior_filtration_is_enabled(self) -> bool:
         return True
 
-    def loop(self, pool_id: str):
+    def loop(self, pool_id: str, streaming: bool = False, poll_interval_seconds: float = 30.0):
         if self.model_ws:
             return
 
+        if streaming:
+            return self.stream(pool_id, poll_interval_seconds)
+
         iteration = 1
         while True:
             logger.debug(f'classification loop iteration #{iteration} is started')
             utils.wait_pool_for_close(self.client, pool_id)
+            # pool tasks are listed once per iteration
+            self.pool_tasks.pop(pool_id, None)
 
-            # TODO: collect stats about how workers answers control tasks and ignore bad control tasks by percentile
+            self.evaluate_submitted_assignments(pool_id)
 
-            submitted_assignments = self.get_assignments_solutions(
-                pool_id, toloka.Assignment.SUBMITTED, with_control_tasks=True
-            )
+            if self.rework_tasks(pool_id) == 0:
+                return
 
-            logger.debug(f'{len(submitted_assignments)} submitted assignments are received')
+            iteration += 1
 
-            if self.prior_filtration_is_enabled():
+    # Streaming mode does not wait for pool to close. Submitted assignments are evaluated and tasks are reworked while
+    # workers are solving the pool, so pool is not drained and reopened between iterations. Loop ends when pool is
+    # closed and no tasks need rework.
+    #
+    # Pool tasks are kept across polls. While pool is open, assignments which are being solved or evaluated are counted
+    # as task attempts, so overlap is not increased for them once more, and tasks whose overlap is already set are not
+    # patched again. Assignments are received by AssignmentsFetcher, so only assignments with new events are requested
+    # on each poll.
+    def stream(self, pool_id: str, poll_interval_seconds: float = 30.0):
+        if self.assignments_fetcher is None:
+            self.assignments_fetcher = AssignmentsFetcher(self.client)
+        poll = 1
+        while True:
+            # pool state is checked before assignments receiving, so all assignments of closed pool are processed
+            closed = self.client.get_pool(pool_id).is_closed()
+            if pool_id in self.pool_tasks and self.pool_tasks[pool_id].refresh(self.client) > 0:
+                self.store_pool_tasks(pool_id)
 
-                filtered_assignments, _ = evaluation.prior_filter_assignments(
-                    self.client,
-                    submitted_assignments,
-                    self.params.control,
-                    self.lang,
-                    task_duration_function=self.params.task_duration_function,
-                )
-                logger.debug(f'{len(filtered_assignments)} assignments left after prior filter')
+            evaluated_assignments = self.evaluate_submitted_assignments(pool_id)
 
-            else:
-                filtered_assignments = submitted_assignments
-                logger.debug('prior filtration is disabled')
+            if evaluated_assignments > 0 or closed:
+                tasks_to_rework = self.rework_tasks(pool_id, open_pool=closed, count_in_flight=not closed)
+                logger.debug(f'classification loop poll #{poll}: {tasks_to_rework} tasks are reworked')
+                if closed and tasks_to_rework == 0:
+                    return
 
-            if isinstance(self.assignment_evaluation_strategy, evaluation.CustomEvaluationStrategy):
-                self.assignment_evaluation_strategy.update(submitted_assignments)
+            poll += 1
+            time.sleep(poll_interval_seconds)
 
-            evaluation.evaluate_submitted_assignments_and_apply_rules(
-                filtered_assignments,
-                self.assignment_evaluation_strategy,
-                self.params.control,
-                self.client,
-                self.lang,
-                pool_id,
+    # Async loop has the same iterations as the blocking one, but independent Toloka requests of iteration, i.e.
+    # listing of pool tasks and receiving of assignments, are made concurrently.
+    async def loop_async(self, pool_id: str, pull_interval_seconds: float = 60.0):
+        if self.model_ws:
+            return
+
+        client = utils.AsyncTolokaClient(self.client)
+        iteration = 1
+        while True:
+            logger.debug(f'classification loop iteration #{iteration} is started')
+            await utils.wait_pool_for_close_async(client, pool_id, pull_interval_seconds)
+            self.pool_tasks.pop(pool_id, None)
+
+            _, submitted_assignments = await asyncio.gather(
+                utils.run_blocking(self.get_pool_tasks, pool_id),
+                utils.run_blocking(
+                    self.get_assignments_solutions, pool_id, toloka.Assignment.SUBMITTED, with_control_tasks=True
+                ),
             )
 
-            tasks_to_rework = rework_not_finalized_tasks(
-                self.client,
-                self.get_assignments_solutions(pool_id, [toloka.Assignment.ACCEPTED, toloka.Assignment.REJECTED]),
-                self.task_mapping,
-                # possible cases:
-                # I. static overlap - increase until needed min_overlap is reached
-                # II. dynamic overlap -
-                #   1. increase until needed min_overlap is reached
-                #   2. increase after new accepted solution, because not enough confidence accumulated
-                #   3. NOT increase after new accepted solution, because enough confidence accumulated already
-                #   4. increase after new rejected solution, because not enough confidence accumulated
-                #   5. NOT increase after new rejected solution, because enough confidence accumulated due to
-                #        confidence recalculation because worker weights are also recalculated
-                self.get_task_id_to_overlap_increase(pool_id),
+            await utils.run_blocking(self.evaluate_submitted_assignments, pool_id, submitted_assignments)
+
+            finished_statuses = [toloka.Assignment.ACCEPTED, toloka.Assignment.REJECTED]
+            assignments_solutions, assignments_solutions_with_control_tasks = await asyncio.gather(
+                utils.run_blocking(self.get_assignments_solutions, pool_id, finished_statuses),
+                utils.run_blocking(self.get_assignments_solutions, pool_id, finished_statuses, with_control_tasks=True),
+            )
+
+            tasks_to_rework = await utils.run_blocking(
+                self.rework_tasks,
                 pool_id,
+                assignments_solutions=assignments_solutions,
+                assignments_solutions_with_control_tasks=assignments_solutions_with_control_tasks,
             )
             if tasks_to_rework == 0:
                 return
 
             iteration += 1
 
+    def evaluate_submitted_assignments(
+        self,
+        pool_id: str,
+        submitted_assignments: Optional[List[mapping.AssignmentSolutions]] = None,
+    ) -> int:
+        # TODO: collect stats about how workers answers control tasks and ignore bad control tasks by percentile
+
+        if submitted_assignments is None:
+            submitted_assignments = self.get_assignments_solutions(
+                pool_id, toloka.Assignment.SUBMITTED, with_control_tasks=True
+            )
+
+        logger.debug(f'{len(submitted_assignments)} submitted assignments are received')
+
+        if self.prior_filtration_is_enabled():
+
+            filtered_assignments, _ = evaluation.prior_filter_assignments(
+                self.client,
+                submitted_assignments,
+                self.params.control,
+                self.lang,
+                task_duration_function=self.params.task_duration_function,
+            )
+            logger.debug(f'{len(filtered_assignments)} assignments left after prior filter')
+
+        else:
+            filtered_assignments = submitted_assignments
+            logger.debug('prior filtration is disabled')
+
+        if isinstance(self.assignment_evaluation_strategy, evaluation.CustomEvaluationStrategy):
+            self.assignment_evaluation_strategy.update(submitted_assignments)
+
+        evaluation.evaluate_submitted_assignments_and_apply_rules(
+            filtered_assignments,
+            self.assignment_evaluation_strategy,
+            self.params.control,
+            self.client,
+            self.lang,
+            pool_id,
+        )
+
+        return len(submitted_assignments)
+
+    def rework_tasks(
+        self,
+        pool_id: str,
+        open_pool: bool = True,
+        assignments_solutions: Optional[List[mapping.AssignmentSolutions]] = None,
+        assignments_solutions_with_control_tasks: Optional[List[mapping.AssignmentSolutions]] = None,
+        count_in_flight: bool = False,
+    ) -> int:
+        finished_statuses = [toloka.Assignment.ACCEPTED, toloka.Assignment.REJECTED]
+        if assignments_solutions is None:
+            assignments_solutions = self.get_assignments_solutions(pool_id, finished_statuses)
+        in_flight_attempts = self.get_in_flight_tasks_attempts(pool_id) if count_in_flight else None
+        return rework_not_finalized_tasks(
+            self.client,
+            assignments_solutions,
+            self.task_mapping,
+            # possible cases:
+            # I. static overlap - increase until needed min_overlap is reached
+            # II. dynamic overlap -
+            #   1. increase until needed min_overlap is reached
+            #   2. increase after new accepted solution, because not enough confidence accumulated
+            #   3. NOT increase after new accepted solution, because enough confidence accumulated already
+            #   4. increase after new rejected solution, because not enough confidence accumulated
+            #   5. NOT increase after new rejected solution, because enough confidence accumulated due to
+            #        confidence recalculation because worker weights are also recalculated
+            self.get_task_id_to_overlap_increase(pool_id, assignments_solutions_with_control_tasks, in_flight_attempts),
+            pool_id,
+            pool_tasks=self.get_pool_tasks(pool_id),
+            open_pool=open_pool,
+            in_flight_attempts=in_flight_attempts,
+            task_overlaps=self.get_task_overlaps(pool_id),
+        )
+
+    # Attempts of assignments which are being solved or are not evaluated yet. Solutions of active assignments are not
+    # available, so attempts are counted by assignments tasks.
+    def get_in_flight_tasks_attempts(self, pool_id: str) -> Dict[mapping.TaskID, int]:
+        if self.assignments_fetcher is not None:
+            assignments = self.assignments_fetcher.get_in_flight_assignments(pool_id)
+        else:
+            assignments = self.client.get_assignments(
+                pool_id=pool_id, status=[toloka.Assignment.ACTIVE, toloka.Assignment.SUBMITTED]
+            )
+        task_id_to_attempts = defaultdict(int)
+        for assignment in assignments:
+            for task in assignment.tasks:
+                if not task.known_solutions:
+                    task_id_to_attempts[self.task_mapping.decode_task(task)[1]] += 1
+        return task_id_to_attempts
+
     def calculate_label_probas(
         self,
         assignment_solutions: List[mapping.AssignmentSolutions],
         pool_id: str,
     ) -> Dict[mapping.TaskID, classification.LabelProba]:
+        if self.label_probas_drift_tolerance is not None:
+            return self.update_label_probas(assignment_solutions, pool_id)
         return calculate_label_probas(
             self.client,
             self.task_mapping,
@@ -200,33 +797,68 @@ class ClassificationLoop:
             self.params.aggregation_algorithm,
             assignment_solutions,
             pool_id,
+            pool_tasks=self.get_pool_tasks(pool_id),
+            aggregation_state=self.get_aggregation_state(pool_id),
+            worker_weights_accumulator=self.get_worker_weights_accumulator(pool_id),
+            aggregation_workers=self.params.aggregation_workers,
+            aggregation_use_processes=self.params.aggregation_use_processes,
         )
 
-    def get_task_id_to_overlap_increase(self, pool_id: str) -> Dict[mapping.TaskID, int]:
-        # todo: we maybe should use _all_ assignments in dynamic overlap proba calculation, even rejected ones
-        assignments_solutions = get_assignments_solutions(
-            self.client,
+    def update_label_probas(
+        self,
+        assignment_solutions: List[mapping.AssignmentSolutions],
+        pool_id: str,
+    ) -> Dict[mapping.TaskID, classification.LabelProba]:
+        if pool_id not in self.label_probas_trackers:
+            self.label_probas_trackers[pool_id] = LabelProbasTracker(self.label_probas_drift_tolerance)
+        tracker = self.label_probas_trackers[pool_id]
+        worker_weights = evaluation.calculate_worker_weights(
+            assignment_solutions,
+            self.assignment_evaluation_strategy,
+            accumulator=self.get_worker_weights_accumulator(pool_id),
+        )
+        tracker.update(
+            assignment_solutions,
             self.task_mapping,
-            pool_id,
-            [toloka.Assignment.ACCEPTED, toloka.Assignment.REJECTED],
-            with_control_tasks=True,
+            self.params.aggregation_algorithm,
+            worker_weights,
+            self.get_aggregation_state(pool_id),
+            self.params.aggregation_workers,
+            self.params.aggregation_use_processes,
         )
-        accepted_assignments_solutions = [
-            assignment_solution
-            for assignment_solution in assignments_solutions
-            if assignment_solution[0].status == toloka.Assignment.ACCEPTED
-        ]
-        task_id_to_current_overlap = evaluation.get_tasks_attempts(accepted_assignments_solutions, self.task_mapping)
+        return tracker.get_label_probas(self.get_pool_tasks(pool_id))
+
+    def get_task_id_to_overlap_increase(
+        self,
+        pool_id: str,
+        assignments_solutions: Optional[List[mapping.AssignmentSolutions]] = None,
+        in_flight_attempts: Optional[Dict[mapping.TaskID, int]] = None,
+    ) -> Dict[mapping.TaskID, int]:
+        # todo: we maybe should use _all_ assignments in dynamic overlap proba calculation, even rejected ones
+        if assignments_solutions is None:
+            assignments_solutions = self.get_assignments_solutions(
+                pool_id, [toloka.Assignment.ACCEPTED, toloka.Assignment.REJECTED], with_control_tasks=True
+            )
         use_dynamic = isinstance(self.params.overlap, DynamicOverlap)
         task_id_to_label_confidence = self.calculate_label_probas(assignments_solutions, pool_id) if use_dynamic else {}
-        task_ids = get_task_id_map(self.client, pool_id, self.task_mapping).keys()
+        task_index = self.get_task_index(pool_id)
+        toloka_task_ids = self.get_pool_tasks(pool_id).toloka_task_ids(task_index)
+        assignments_frame = mapping.AssignmentFrame.from_assignments_solutions(
+            assignments_solutions, self.task_mapping, task_index
+        )
+        current_overlaps = assignments_frame.task_attempts(statuses=[toloka.Assignment.ACCEPTED])
         result = {}
-        for task_id in task_ids:
-            overlap = task_id_to_current_overlap[task_id]
-            residual_overlap = self.params.overlap.min_overlap - overlap
+        for i, toloka_task_id in enumerate(toloka_task_ids):
+            if toloka_task_id is None:
+                continue  # task is not from this pool
+            task_id = task_index[i]
+            overlap = current_overlaps[i]
+            in_flight = in_flight_attempts.get(task_id, 0) if in_flight_attempts else 0
+            residual_overlap = self.params.overlap.min_overlap - overlap - in_flight
             if residual_overlap > 0:
-                result[task_id] = residual_overlap
-            elif use_dynamic:
+                result[task_id] = int(residual_overlap)
+            # confidence is recalculated after in-flight solutions are evaluated
+            elif use_dynamic and in_flight == 0:
                 assert isinstance(self.params.overlap, DynamicOverlap)
                 label, conf = task_id_to_label_confidence[task_id]
                 if overlap < self.params.overlap.max_overlap and conf < self.params.overlap.min_confidence(label):
@@ -239,7 +871,9 @@ class ClassificationLoop:
         status: List[toloka.Assignment.Status],
         with_control_tasks: bool = False,
     ) -> List[mapping.AssignmentSolutions]:
-        return get_assignments_solutions(self.client, self.task_mapping, pool_id, status, with_control_tasks)
+        return get_assignments_solutions(
+            self.client, self.task_mapping, pool_id, status, with_control_tasks, self.assignments_fetcher
+        )
 
     def get_results(
         self,
@@ -249,7 +883,41 @@ class ClassificationLoop:
         pool_input_objects, accepted_assignments, worker_weights = self.get_assignments_and_worker_weights(
             pool_id, pool_input_objects
         )
+        return self.aggregate_results(pool_input_objects, accepted_assignments, worker_weights)
+
+    # Pool tasks are listed concurrently with assignments receiving.
+    async def get_results_async(
+        self,
+        pool_id: str,
+        pool_input_objects: Optional[List[mapping.Objects]] = None,
+    ) -> Tuple[classification.Results, Optional[classification.WorkerWeights]]:
+        if self.model_ws or pool_input_objects:
+            return await utils.run_blocking(self.get_results, pool_id, pool_input_objects)
+
+        pool_input_objects, all_assignments = await asyncio.gather(
+            utils.run_blocking(self.get_pool_input_objects, pool_id),
+            utils.run_blocking(
+                self.get_assignments_solutions,
+                pool_id,
+                [toloka.Assignment.ACCEPTED, toloka.Assignment.REJECTED],
+                with_control_tasks=True,
+            ),
+        )
+        accepted_assignments, worker_weights = get_accepted_assignments_and_worker_weights(
+            all_assignments,
+            self.params.aggregation_algorithm,
+            self.assignment_evaluation_strategy,
+            self.get_worker_weights_accumulator(pool_id),
+        )
+        return self.aggregate_results(pool_input_objects, accepted_assignments, worker_weights)
 
+    def aggregate_results(
+        self,
+        pool_input_objects: List[mapping.Objects],
+        accepted_assignments: List[toloka.Assignment],
+        worker_weights: Optional[classification.WorkerWeights],
+        aggregation_state: Optional[classification.AggregationState] = None,
+    ) -> Tuple[classification.Results, Optional[classification.WorkerWeights]]:
         return (
             classification.collect_labels_probas_from_assignments(
                 assignments=accepted_assignments,
@@ -257,6 +925,9 @@ class ClassificationLoop:
                 pool_input_objects=pool_input_objects,
                 aggregation_algorithm=self.params.aggregation_algorithm,
                 worker_weights=worker_weights,
+                state=aggregation_state,
+                workers=self.params.aggregation_workers,
+                use_processes=self.params.aggregation_use_processes,
             ),
             worker_weights,
         )
@@ -283,6 +954,8 @@ class ClassificationLoop:
             self.params.aggregation_algorithm,
             self.assignment_evaluation_strategy,
             pool_input_objects,
+            self.assignments_fetcher,
+            self.get_worker_weights_accumulator(pool_id),
         )
 
 
@@ -311,7 +984,12 @@ class MOSLoop(ClassificationLoop):
             task_duration_function=params.task_duration_function,
         )
 
-    def get_task_id_to_overlap_increase(self, pool_id: str):
+    def get_task_id_to_overlap_increase(
+        self,
+        pool_id: str,
+        assignments_solutions: Optional[List[mapping.AssignmentSolutions]] = None,
+        in_flight_attempts: Optional[Dict[mapping.TaskID, int]] = None,
+    ):
         return {}
 
     def prior_filtration_is_enabled(self) -> bool:
@@ -326,11 +1004,7 @@ def get_pool_input_objects(
     task_mapping: mapping.TaskMapping,
     pool_id: str,
 ) -> List[mapping.Objects]:
-    pool_input_objects = []
-    for task in client.get_tasks(pool_id):
-        if not task.known_solutions:
-            pool_input_objects.append(task_mapping.from_task(task))
-    return pool_input_objects
+    return PoolTasks.list(client, pool_id, task_mapping).input_objects()
 
 
 def get_assignments_solutions(
@@ -339,9 +1013,11 @@ def get_assignments_solutions(
     pool_id: str,
     status: List[toloka.Assignment.Status],
     with_control_tasks: bool = False,
+    assignments_fetcher: Optional[AssignmentsFetcher] = None,
 ) -> List[mapping.AssignmentSolutions]:
+    source = assignments_fetcher or client
     return mapping.get_assignments_solutions(
-        assignments=list(client.get_assignments(status=status, pool_id=pool_id)),
+        assignments=list(source.get_assignments(status=status, pool_id=pool_id)),
         mapping=task_mapping,
         with_control_tasks=with_control_tasks,
     )
@@ -354,10 +1030,17 @@ def calculate_label_probas(
     aggregation_algorithm: classification.AggregationAlgorithm,
     assignment_solutions: List[mapping.AssignmentSolutions],
     pool_id: str,
+    pool_tasks: Optional[PoolTasks] = None,
+    aggregation_state: Optional[classification.AggregationState] = None,
+    worker_weights_accumulator: Optional[evaluation.WorkerWeightsAccumulator] = None,
+    aggregation_workers: int = 1,
+    aggregation_use_processes: bool = False,
 ) -> Dict[mapping.TaskID, classification.LabelProba]:
     task_id_to_label_confidence = {}
-    worker_weights = evaluation.calculate_worker_weights(assignment_solutions, assignment_evaluation_strategy)
-    input_objects = get_pool_input_objects(client, task_mapping, pool_id)
+    worker_weights = evaluation.calculate_worker_weights(
+        assignment_solutions, assignment_evaluation_strategy, accumulator=worker_weights_accumulator
+    )
+    input_objects = (pool_tasks or PoolTasks.list(client, pool_id, task_mapping)).input_objects()
     accepted_assignments = [
         assignment for assignment, _ in assignment_solutions if assignment.status == toloka.Assignment.ACCEPTED
     ]
@@ -369,6 +1052,9 @@ def calculate_label_probas(
             pool_input_objects=input_objects,
             aggregation_algorithm=aggregation_algorithm,
             worker_weights=worker_weights,
+            state=aggregation_state,
+            workers=aggregation_workers,
+            use_processes=aggregation_use_processes,
         )
     ]
     for task_input_objects, probas in zip(input_objects, tasks_probas):
@@ -384,26 +1070,47 @@ def rework_not_finalized_tasks(
     task_mapping: mapping.TaskMapping,
     task_id_to_overlap_increase: Dict[mapping.TaskID, int],
     pool_id: str,
+    pool_tasks: Optional[PoolTasks] = None,
+    open_pool: bool = True,
+    workers: int = 16,
+    in_flight_attempts: Optional[Dict[mapping.TaskID, int]] = None,
+    task_overlaps: Optional[Dict[str, int]] = None,
 ) -> int:
     # full task ID list is available through created tasks, not assignments, because:
     # - input objects can be added iteratively in common case, "pool input objects" notion may be missing
     # - assignments statuses, attempts from which we take into account, can differ depends on scenario
-    task_id_map = get_task_id_map(client, pool_id, task_mapping)
-    tasks_to_rework = 0
+    task_id_map = (pool_tasks or PoolTasks.list(client, pool_id, task_mapping)).task_id_map()
+    patches = []
     # model worker solutions do not affect Toloka overlap
-    for task_id, attempts in evaluation.get_tasks_attempts(assignments, task_mapping, with_model=False).items():
+    task_id_to_attempts = evaluation.get_tasks_attempts(assignments, task_mapping, with_model=False)
+    # in-flight assignments are already counted in Toloka overlap
+    for task_id, attempts in (in_flight_attempts or {}).items():
+        task_id_to_attempts[task_id] += attempts
+    for task_id, attempts in task_id_to_attempts.items():
         overlap_increase = task_id_to_overlap_increase.get(task_id)
         if not overlap_increase:
             continue
-        tasks_to_rework += 1
         toloka_task_id = task_id_map[task_id]
         new_overlap = attempts + overlap_increase
+        # task of open pool whose overlap is already set doesn't need to be patched again
+        if not open_pool and task_overlaps is not None and task_overlaps.get(toloka_task_id) == new_overlap:
+            continue
         logger.debug(f'rework task "{task_id.id}", set overlap = {new_overlap} for toloka task {toloka_task_id}')
-        client.patch_task_overlap_or_min(
-            task_id=toloka_task_id, patch=toloka.task.TaskOverlapPatch(overlap=new_overlap)
-        )
+        patches.append((toloka_task_id, toloka.task.TaskOverlapPatch(overlap=new_overlap)))
+    tasks_to_rework = len(patches)
+
+    # Toloka has no bulk method for overlap patch, so tasks are patched concurrently
+    utils.map_concurrently(
+        lambda patch: client.patch_task_overlap_or_min(task_id=patch[0], patch=patch[1]),
+        patches,
+        workers=workers,
+        description='reworked tasks',
+    )
+    if task_overlaps is not None:
+        task_overlaps.update((toloka_task_id, patch.overlap) for toloka_task_id, patch in patches)
 
-    if tasks_to_rework > 0:
+    # open pool doesn't need to be reopened, i.e. in streaming mode
+    if tasks_to_rework > 0 and open_pool:
         client.open_pool(pool_id)
 
     return tasks_to_rework
@@ -415,11 +1122,7 @@ def get_task_id_map(
     task_mapping: mapping.TaskMapping,
     with_control_tasks: bool = False,
 ) -> Dict[mapping.TaskID, str]:
-    return {
-        mapping.TaskID(task_mapping.from_task(task)): task.id
-        for task in client.get_tasks(pool_id)
-        if (with_control_tasks or not task.known_solutions)
-    }
+    return PoolTasks.list(client, pool_id, task_mapping).task_id_map(with_control_tasks)
 
 
 def get_assignments_and_worker_weights(
@@ -429,19 +1132,40 @@ def get_assignments_and_worker_weights(
     aggregation_algorithm: classification.AggregationAlgorithm,
     assignment_evaluation_strategy: evaluation.AssignmentAccuracyEvaluationStrategy,
     pool_input_objects: Optional[List[mapping.Objects]] = None,
+    assignments_fetcher: Optional[AssignmentsFetcher] = None,
+    worker_weights_accumulator: Optional[evaluation.WorkerWeightsAccumulator] = None,
 ) -> Tuple[List[mapping.Objects], List[toloka.Assignment], Optional[classification.WorkerWeights]]:
     pool_input_objects = pool_input_objects or get_pool_input_objects(client, task_mapping, pool_id)
 
     all_assignments = get_assignments_solutions(
-        client, task_mapping, pool_id, [toloka.Assignment.ACCEPTED, toloka.Assignment.REJECTED], with_control_tasks=True
+        client,
+        task_mapping,
+        pool_id,
+        [toloka.Assignment.ACCEPTED, toloka.Assignment.REJECTED],
+        with_control_tasks=True,
+        assignments_fetcher=assignments_fetcher,
+    )
+    accepted_assignments, worker_weights = get_accepted_assignments_and_worker_weights(
+        all_assignments, aggregation_algorithm, assignment_evaluation_strategy, worker_weights_accumulator
     )
+
+    return pool_input_objects, accepted_assignments, worker_weights
+
+
+def get_accepted_assignments_and_worker_weights(
+    all_assignments: List[mapping.AssignmentSolutions],
+    aggregation_algorithm: classification.AggregationAlgorithm,
+    assignment_evaluation_strategy: evaluation.AssignmentAccuracyEvaluationStrategy,
+    worker_weights_accumulator: Optional[evaluation.WorkerWeightsAccumulator] = None,
+) -> Tuple[List[toloka.Assignment], Optional[classification.WorkerWeights]]:
     accepted_assignments = [
         assignment for assignment, _ in all_assignments if assignment.status == toloka.Assignment.ACCEPTED
     ]
     worker_weights = (
-        evaluation.calculate_worker_weights(all_assignments, assignment_evaluation_strategy)
+        evaluation.calculate_worker_weights(
+            all_assignments, assignment_evaluation_strategy, accumulator=worker_weights_accumulator
+        )
         if aggregation_algorithm == classification.AggregationAlgorithm.MAX_LIKELIHOOD
         else None
     )
-
-    return pool_input_objects, accepted_assignments, worker_weights
+    return accepted_assignments, worker_weights
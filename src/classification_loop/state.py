@@ -0,0 +1,85 @@
+import json
+import sqlite3
+import threading
+from typing import Iterable, List, Optional
+
+import toloka.client as toloka
+
+
+class LoopStateStore:
+    """
+    Local SQLite store of loops state, so restarted loop resumes from it instead of receiving the entire history
+    from Toloka.
+
+    Store keeps per pool:
+    - assignments, with their verdicts, received by AssignmentsFetcher, so after restart only assignments with new
+      events are requested
+    - pool tasks, so they are not listed again; stored tasks are marked as incomplete before new tasks creation, and
+      are listed again if loop was interrupted before created tasks were stored
+
+    Evaluations, worker weights and overlaps are calculated from assignments and tasks locally.
+    """
+
+    path: str
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        # loops requests can be made concurrently, i.e. in async loops, so connection is shared between threads
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.executescript('''
+                CREATE TABLE IF NOT EXISTS assignments (
+                    pool_id TEXT NOT NULL, id TEXT NOT NULL, data TEXT NOT NULL, PRIMARY KEY (pool_id, id)
+                );
+                CREATE TABLE IF NOT EXISTS tasks (
+                    pool_id TEXT NOT NULL, position INTEGER NOT NULL, data TEXT NOT NULL,
+                    PRIMARY KEY (pool_id, position)
+                );
+                CREATE TABLE IF NOT EXISTS pools (
+                    pool_id TEXT NOT NULL PRIMARY KEY, tasks_complete INTEGER NOT NULL
+                );
+                ''')
+
+    @staticmethod
+    def dumps(obj: toloka.primitives.base.BaseTolokaObject) -> str:
+        return json.dumps(obj.unstructure(), default=str)
+
+    def get_assignments(self, pool_id: str) -> List[toloka.Assignment]:
+        with self.lock:
+            rows = self.connection.execute('SELECT data FROM assignments WHERE pool_id = ? ORDER BY id', (pool_id,))
+            return [toloka.Assignment.structure(json.loads(data)) for data, in rows]
+
+    def put_assignments(self, pool_id: str, assignments: Iterable[toloka.Assignment]):
+        with self.lock, self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO assignments (pool_id, id, data) VALUES (?, ?, ?)',
+                ((pool_id, assignment.id, self.dumps(assignment)) for assignment in assignments),
+            )
+
+    # Returns None if pool tasks are not stored or stored tasks are incomplete.
+    def get_tasks(self, pool_id: str) -> Optional[List[toloka.Task]]:
+        with self.lock:
+            row = self.connection.execute('SELECT tasks_complete FROM pools WHERE pool_id = ?', (pool_id,)).fetchone()
+            if row is None or not row[0]:
+                return None
+            rows = self.connection.execute('SELECT data FROM tasks WHERE pool_id = ? ORDER BY position', (pool_id,))
+            return [toloka.Task.structure(json.loads(data)) for data, in rows]
+
+    # Stores pool tasks starting from position start, stored tasks before it are kept.
+    def set_tasks(self, pool_id: str, tasks: Iterable[toloka.Task], start: int = 0):
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM tasks WHERE pool_id = ? AND position >= ?', (pool_id, start))
+            self.connection.executemany(
+                'INSERT INTO tasks (pool_id, position, data) VALUES (?, ?, ?)',
+                ((pool_id, position, self.dumps(task)) for position, task in enumerate(tasks, start)),
+            )
+            self.connection.execute('INSERT OR REPLACE INTO pools (pool_id, tasks_complete) VALUES (?, 1)', (pool_id,))
+
+    def invalidate_tasks(self, pool_id: str):
+        with self.lock, self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO pools (pool_id, tasks_complete) VALUES (?, 0)', (pool_id,))
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
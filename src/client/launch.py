@@ -21,6 +21,7 @@ from .. import (
     metrics,
     pool as pool_config,
     project,
+    scheduler,
     worker,
     lzy as lzy_utils,
 )
@@ -43,11 +44,20 @@ if toloka.exceptions.ConflictStateApiError not in toloka.TolokaClient.EXCEPTIONS
 toloka.primitives.retry.STATUSES_TO_RETRY.add(409)
 
 
+# Requests of the client are admitted by its own scheduler, see scheduler.RequestScheduler for rate defaults.
 def create_toloka_client(
     token: str,
     environment: toloka.TolokaClient.Environment = toloka.TolokaClient.Environment.PRODUCTION,
+    requests_per_second: float = 10.0,
+    requests_burst: Optional[float] = None,
 ) -> toloka.TolokaClient:
-    return toloka.TolokaClient(token=token, environment=environment, retries=20, timeout=(60.0, 240.0))
+    return scheduler.ScheduledTolokaClient(
+        token=token,
+        environment=environment,
+        retries=20,
+        timeout=(60.0, 240.0),
+        scheduler=scheduler.RequestScheduler(requests_per_second, requests_burst),
+    )
 
 
 @dataclass
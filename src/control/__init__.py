@@ -1,2 +1,3 @@
 from .rule import *  # noqa
 from .rule_builder import *  # noqa
+from .decision_table import *  # noqa
@@ -0,0 +1,134 @@
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+
+from .rule import (
+    AssignmentAccuracyPredicate,
+    AssignmentDurationPredicate,
+    BlockUser,
+    Control,
+    Rule,
+    SetAssignmentStatus,
+)
+
+
+@dataclass
+class Decisions:
+    # status of first matched verdict rule, None if no verdict rule is matched
+    verdicts: np.ndarray
+    # first matched verdict rule, None if no verdict rule is matched
+    verdict_rules: np.ndarray
+    # flags of matched block rules, in order of DecisionTable.block_rules
+    blocks: np.ndarray
+
+
+class DecisionTable:
+    """
+    Control rules compiled for batch of assignments. Predicates of rules are checked for arrays of assignments values
+    at once with Predicate.check_batch(), so only actions of matched rules are left to perform.
+
+    Rules are applied as by loops: duration rules first, and if assignment gets verdict by them, it is not evaluated
+    further, so accuracy rules are not applied to it. Verdict is set by first matched verdict rule of each stage, and
+    each verdict rule is checked only for assignments which are not matched by previous ones. Block rules are checked
+    for all assignments of the stage, except ones which are not blockable, i.e. of model workers. Stage is skipped if
+    its values are not passed, i.e. duration rules for already prior filtered assignments.
+
+    Durations and their hints are passed in microseconds, as returned by get_assignments_durations(). Unknown accuracy,
+    i.e. of assignment without checks, is passed as NaN, and it can't be checked by threshold predicates, as None.
+    """
+
+    duration_verdict_rules: List[Rule]
+    duration_block_rules: List[Rule]
+    accuracy_verdict_rules: List[Rule]
+    accuracy_block_rules: List[Rule]
+
+    def __init__(self, control: Control):
+        self.duration_verdict_rules = control.filter_rules(AssignmentDurationPredicate, SetAssignmentStatus)
+        self.duration_block_rules = control.filter_rules(AssignmentDurationPredicate, BlockUser)
+        self.accuracy_verdict_rules = control.filter_rules(AssignmentAccuracyPredicate, SetAssignmentStatus)
+        self.accuracy_block_rules = control.filter_rules(AssignmentAccuracyPredicate, BlockUser)
+
+        # last item stands for no matched verdict rule
+        verdict_rules = self.duration_verdict_rules + self.accuracy_verdict_rules + [None]
+        self.verdict_rules = np.empty(len(verdict_rules), dtype=object)
+        self.verdict_rules[:] = verdict_rules
+        self.verdict_statuses = np.array(
+            [rule.action.status if rule is not None else None for rule in verdict_rules], dtype=object
+        )
+
+    @property
+    def duration_rules(self) -> List[Rule]:
+        return self.duration_verdict_rules + self.duration_block_rules
+
+    @property
+    def accuracy_rules(self) -> List[Rule]:
+        return self.accuracy_verdict_rules + self.accuracy_block_rules
+
+    @property
+    def block_rules(self) -> List[Rule]:
+        return self.duration_block_rules + self.accuracy_block_rules
+
+    # (rules, assignments) matrix of matched rules, rules are checked only for assignments from mask
+    @staticmethod
+    def check_rules(rules: List[Rule], mask: np.ndarray, **kwargs: np.ndarray) -> np.ndarray:
+        matched = np.zeros((len(rules), len(mask)), dtype=bool)
+        if mask.any():
+            kwargs = {key: arg[mask] for key, arg in kwargs.items()}
+            for rule_matched, rule in zip(matched, rules):
+                rule_matched[mask] = rule.predicate.check_batch(**kwargs)
+        return matched
+
+    # Sets indices of first matched verdict rules for assignments from mask, which have no verdict yet.
+    @staticmethod
+    def check_verdict_rules(
+        rules: List[Rule], offset: int, verdict_indices: np.ndarray, mask: np.ndarray, **kwargs: np.ndarray
+    ):
+        for i, rule in enumerate(rules):
+            rows = np.flatnonzero(mask & (verdict_indices < 0))
+            if len(rows) == 0:
+                break
+            matched = rule.predicate.check_batch(**{key: arg[rows] for key, arg in kwargs.items()})
+            verdict_indices[rows[matched]] = offset + i
+
+    def decide(
+        self,
+        accuracy: Optional[np.ndarray] = None,
+        durations: Optional[np.ndarray] = None,
+        duration_hints: Optional[np.ndarray] = None,
+        blockable: Optional[np.ndarray] = None,
+    ) -> Decisions:
+        assert accuracy is not None or durations is not None, 'values of at least one stage are required'
+        size = len(accuracy) if accuracy is not None else len(durations)
+        blockable = np.ones(size, dtype=bool) if blockable is None else np.asarray(blockable, dtype=bool)
+        verdict_indices = np.full(size, -1)
+
+        duration_blocks = np.zeros((len(self.duration_block_rules), size), dtype=bool)
+        if durations is not None:
+            assert duration_hints is not None and len(durations) == len(duration_hints) == size
+            duration_kwargs = {'value': np.asarray(durations), 'assignment_duration_hint': np.asarray(duration_hints)}
+            duration_blocks = self.check_rules(self.duration_block_rules, blockable, **duration_kwargs)
+            self.check_verdict_rules(
+                self.duration_verdict_rules, 0, verdict_indices, np.ones(size, dtype=bool), **duration_kwargs
+            )
+
+        evaluated = verdict_indices < 0
+        accuracy_blocks = np.zeros((len(self.accuracy_block_rules), size), dtype=bool)
+        if accuracy is not None:
+            assert len(accuracy) == size
+            accuracy_kwargs = {'value': np.asarray(accuracy, dtype=float)}
+            accuracy_blocks = self.check_rules(self.accuracy_block_rules, evaluated & blockable, **accuracy_kwargs)
+            self.check_verdict_rules(
+                self.accuracy_verdict_rules,
+                len(self.duration_verdict_rules),
+                verdict_indices,
+                evaluated,
+                **accuracy_kwargs
+            )
+
+        verdict_indices[verdict_indices < 0] = len(self.verdict_rules) - 1
+        return Decisions(
+            verdicts=self.verdict_statuses[verdict_indices],
+            verdict_rules=self.verdict_rules[verdict_indices],
+            blocks=np.concatenate([duration_blocks, accuracy_blocks]).T,
+        )
@@ -3,9 +3,13 @@ from dataclasses import dataclass
 import datetime
 from decimal import Decimal
 import enum
-from typing import List, Union, Optional, Dict, Any
+import functools
+import logging
+import operator
+from typing import List, Union, Optional, Dict, Any, Tuple
 
 
+import numpy as np
 import toloka.client as toloka
 from toloka.client import TolokaClient
 from toloka.client.user_restriction import (
@@ -17,12 +21,42 @@ from toloka.client.user_restriction import (
 from toloka.client.assignment import Assignment, AssignmentPatch
 from toloka.client.user_bonus import UserBonus
 
+from .. import utils
+
+logger = logging.getLogger(__name__)
+
 
 class Predicate:
     @abc.abstractmethod
     def check(self, **kwargs) -> bool:
         ...
 
+    # same as check(), but for arrays of values, returns boolean mask; predicates which can be checked vectorized
+    # override it, others are checked value by value
+    def check_batch(self, value: np.ndarray, **kwargs) -> np.ndarray:
+        batch_kwargs = {'value': value, **kwargs}
+        return np.array(
+            [
+                self.check(**self.from_batch({key: arg[i] for key, arg in batch_kwargs.items()}))
+                for i in range(len(value))
+            ],
+            dtype=bool,
+        )
+
+    # converts arguments of check_batch() item to types which check() expects
+    def from_batch(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: arg.item() if isinstance(arg, np.generic) else arg for key, arg in kwargs.items()}
+
+
+# Batch method of predicate class is consistent with method if it's defined in the same or in derived class, otherwise
+# subclass overrides method only, and batch method is not aware of it.
+@functools.lru_cache(maxsize=None)
+def is_batch_method_consistent(cls: type, method: str, batch_method: str) -> bool:
+    def defined_in(name: str) -> int:
+        return next(i for i, base_cls in enumerate(cls.__mro__) if name in base_cls.__dict__)
+
+    return defined_in(batch_method) <= defined_in(method)
+
 
 class ComparisonType(enum.Enum):
     GREATER_OR_EQUAL = '>='
@@ -31,6 +65,14 @@ class ComparisonType(enum.Enum):
     LESS = '<'
 
 
+comparison_operators = {
+    ComparisonType.GREATER_OR_EQUAL: operator.ge,
+    ComparisonType.GREATER: operator.gt,
+    ComparisonType.LESS_OR_EQUAL: operator.le,
+    ComparisonType.LESS: operator.lt,
+}
+
+
 PredicateValue = Union[float, datetime.timedelta]
 
 
@@ -40,21 +82,35 @@ class ThresholdComparisonPredicate(Predicate):
     comparison: ComparisonType
 
     def check(self, value: PredicateValue, **kwargs) -> bool:
-        threshold = self.get_threshold(**kwargs)
-        return {
-            ComparisonType.GREATER_OR_EQUAL: lambda: value >= threshold,
-            ComparisonType.GREATER: lambda: value > threshold,
-            ComparisonType.LESS_OR_EQUAL: lambda: value <= threshold,
-            ComparisonType.LESS: lambda: value < threshold,
-        }[self.comparison]()
+        return comparison_operators[self.comparison](value, self.get_threshold(**kwargs))
 
     def get_threshold(self, **kwargs) -> PredicateValue:
         return self.threshold
 
+    # Values are checked one by one by check() if subclass overrides it or get_threshold() only, or if some values are
+    # unknown, i.e. NaN accuracy of assignment without checks, which is passed to check() as None.
+    def check_batch(self, value: np.ndarray, **kwargs) -> np.ndarray:
+        cls = type(self)
+        if (
+            not is_batch_method_consistent(cls, 'check', 'check_batch')
+            or not is_batch_method_consistent(cls, 'get_threshold', 'get_batch_threshold')
+            or np.isnan(value).any()
+        ):
+            return super().check_batch(value=value, **kwargs)
+        return comparison_operators[self.comparison](value, self.get_batch_threshold(**kwargs))
+
+    def get_batch_threshold(self, **kwargs) -> Union[PredicateValue, np.ndarray]:
+        return self.threshold
+
 
 @dataclass
 class AssignmentAccuracyPredicate(ThresholdComparisonPredicate):
-    ...
+    # unknown accuracy is passed to check_batch() as NaN
+    def from_batch(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        kwargs = super().from_batch(kwargs)
+        if np.isnan(kwargs['value']):
+            kwargs['value'] = None
+        return kwargs
 
 
 @dataclass
@@ -62,12 +118,26 @@ class AssignmentDurationPredicate(ThresholdComparisonPredicate):
     def get_threshold(self, assignment_duration_hint: datetime.timedelta, **kwargs) -> datetime.timedelta:
         return self.threshold * assignment_duration_hint
 
+    # durations are passed to check_batch() in microseconds
+    def from_batch(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        kwargs = super().from_batch(kwargs)
+        for key in ('value', 'assignment_duration_hint'):
+            kwargs[key] = datetime.timedelta(microseconds=kwargs[key])
+        return kwargs
+
+    # durations are passed in microseconds, thresholds are rounded to them, as in timedelta multiplication
+    def get_batch_threshold(self, assignment_duration_hint: np.ndarray, **kwargs) -> np.ndarray:
+        return np.rint(self.threshold * assignment_duration_hint)
+
 
 @dataclass
 class AlwaysTruePredicate(Predicate):
     def check(self, **kwargs) -> bool:
         return True
 
+    def check_batch(self, value: np.ndarray, **kwargs) -> np.ndarray:
+        return np.ones(len(value), dtype=bool)
+
 
 class BooleanOperator(enum.Enum):
     AND = 'and'
@@ -96,6 +166,22 @@ class PredicateExpression(Predicate):
         else:
             raise ValueError(f'unsupported boolean operator for predicates: {self.boolean_operator}')
 
+    # as in check(), each predicate is checked only for values which result is not known after previous predicates
+    def check_batch(self, value: np.ndarray, **kwargs) -> np.ndarray:
+        if self.boolean_operator not in (BooleanOperator.AND, BooleanOperator.OR):
+            raise ValueError(f'unsupported boolean operator for predicates: {self.boolean_operator}')
+        is_and = self.boolean_operator == BooleanOperator.AND
+        result = np.full(len(value), is_and)
+        undecided = np.arange(len(value))
+        for predicate in self.predicates:
+            if len(undecided) == 0:
+                break
+            mask = predicate.check_batch(value=value[undecided], **{key: arg[undecided] for key, arg in kwargs.items()})
+            decided = ~mask if is_and else mask
+            result[undecided[decided]] = not is_and
+            undecided = undecided[~decided]
+        return result
+
 
 class Action:
     @abc.abstractmethod
@@ -117,6 +203,7 @@ class BlockUser(Action):
         block_start: Optional[datetime.datetime] = None,
         pool_id: Optional[str] = None,
         project_id: Optional[str] = None,
+        restriction_plan: Optional['UserRestrictionPlan'] = None,
         **kwargs,
     ) -> UserRestriction:
         params = {'user_id': user_id, 'private_comment': self.private_comment}
@@ -137,7 +224,10 @@ class BlockUser(Action):
             assignment_status != toloka.Assignment.Status.ACCEPTED
             and assignment_status != toloka.Assignment.Status.REJECTED
         ):
-            client.set_user_restriction(user_restriction=user_restriction)
+            if restriction_plan is not None:
+                restriction_plan.add(user_restriction)
+            else:
+                client.set_user_restriction(user_restriction=user_restriction)
         return user_restriction
 
 
@@ -151,6 +241,85 @@ class GiveBonusToUser(Action):
         )  # we may want to send the message here
 
 
+class UserRestrictionPlan:
+    """
+    User restrictions, collected while rules are applied to all assignments and then issued concurrently.
+
+    Only the strongest restriction is kept for each user and restriction target (scope with pool or project), so
+    a worker with many bad assignments is restricted once. Permanent restriction is stronger than any temporary one,
+    otherwise restriction which expires later is stronger.
+    """
+
+    restrictions: Dict[Tuple[str, UserRestriction.Scope, Optional[str]], UserRestriction]
+
+    def __init__(self):
+        self.restrictions = {}
+
+    @staticmethod
+    def get_key(restriction: UserRestriction) -> Tuple[str, UserRestriction.Scope, Optional[str]]:
+        if isinstance(restriction, PoolUserRestriction):
+            return restriction.user_id, restriction.scope, restriction.pool_id
+        if isinstance(restriction, ProjectUserRestriction):
+            return restriction.user_id, restriction.scope, restriction.project_id
+        return restriction.user_id, restriction.scope, None
+
+    @staticmethod
+    def is_stronger(restriction: UserRestriction, other: UserRestriction) -> bool:
+        if other.will_expire is None:
+            return False
+        return restriction.will_expire is None or restriction.will_expire > other.will_expire
+
+    def add(self, restriction: UserRestriction):
+        key = self.get_key(restriction)
+        current = self.restrictions.get(key)
+        if current is None or self.is_stronger(restriction, current):
+            self.restrictions[key] = restriction
+
+    def __len__(self) -> int:
+        return len(self.restrictions)
+
+    def execute(self, client: TolokaClient, workers: int = 16):
+        utils.map_concurrently(
+            lambda restriction: client.set_user_restriction(user_restriction=restriction),
+            list(self.restrictions.values()),
+            workers=workers,
+            description='user restrictions',
+        )
+        self.restrictions = {}
+
+
+class AssignmentVerdictPlan:
+    """
+    Assignment status patches, collected while rules are applied to all assignments and then executed concurrently.
+    """
+
+    patches: Dict[str, AssignmentPatch]
+
+    def __init__(self):
+        self.patches = {}
+
+    def add(self, assignment_id: str, patch: AssignmentPatch):
+        assert self.patches.get(assignment_id, patch) == patch, f'conflicting verdicts for assignment {assignment_id}'
+        self.patches[assignment_id] = patch
+
+    def __len__(self) -> int:
+        return len(self.patches)
+
+    def execute(self, client: TolokaClient, workers: int = 16):
+        def patch_assignment(item: Tuple[str, AssignmentPatch]):
+            assignment_id, patch = item
+            try:
+                client.patch_assignment(assignment_id=assignment_id, patch=patch)
+            except toloka.exceptions.ConflictStateApiError:
+                # verdict may be already set, i.e. by retried request which response was lost
+                if client.get_assignment(assignment_id).status != patch.status:
+                    raise
+                logger.debug(f'assignment {assignment_id} already has status {patch.status.value}')
+
+        utils.map_concurrently(patch_assignment, list(self.patches.items()), workers=workers, description='verdicts')
+        self.patches = {}
+
+
 @dataclass
 class SetAssignmentStatus(Action):
     status: Assignment.Status
@@ -160,6 +329,7 @@ class SetAssignmentStatus(Action):
         client: TolokaClient,
         assignment: toloka.Assignment,
         public_comment: str,
+        verdict_plan: Optional[AssignmentVerdictPlan] = None,
         **kwargs,
     ) -> Assignment.Status:
         if not assignment.id:
@@ -171,9 +341,11 @@ class SetAssignmentStatus(Action):
         ):
             return assignment.status
         comment = public_comment if self.status == Assignment.REJECTED else ''
-        client.patch_assignment(
-            assignment_id=assignment.id, patch=AssignmentPatch(public_comment=comment, status=self.status)
-        )
+        patch = AssignmentPatch(public_comment=comment, status=self.status)
+        if verdict_plan is not None:
+            verdict_plan.add(assignment.id, patch)
+        else:
+            client.patch_assignment(assignment_id=assignment.id, patch=patch)
         return self.status
 
 
@@ -1,11 +1,13 @@
 import abc
 import datetime
 from collections import defaultdict
-from dataclasses import dataclass
+from dataclasses import dataclass, field, replace
 import logging
 from random import shuffle
-from typing import List, Dict, Optional, Tuple, Iterable, Set
+import threading
+from typing import Any, List, Dict, Optional, Tuple, Iterable, Set
 
+import numpy as np
 import toloka.client as toloka
 
 from .. import base, classification, control, duration, mapping
@@ -122,6 +124,7 @@ def sample_solutions_to_check(
     return solutions[: check_sample.max_tasks_to_check]
 
 
+# If task index is passed, attempts are returned as array, aligned with index.
 def get_tasks_attempts(
     assignments: Iterable[mapping.AssignmentSolutions],
     markup_task_mapping: mapping.TaskMapping,
@@ -129,12 +132,13 @@ def get_tasks_attempts(
 ) -> Dict[mapping.TaskID, int]:
     task_id_to_attempts = defaultdict(int)
     for assignment, solutions in assignments:
-        for input_objects, _ in solutions:
+        tasks = mapping.get_solutions_tasks(assignment, solutions) or [None] * len(solutions)
+        for task, (input_objects, _) in zip(tasks, solutions):
             if not assignment.id and not with_model:
                 increase = 0
             else:
                 increase = 1
-            task_id_to_attempts[markup_task_mapping.task_id(input_objects)] += increase
+            task_id_to_attempts[markup_task_mapping.decoded_task_id(task, input_objects)] += increase
     return task_id_to_attempts
 
 
@@ -145,8 +149,36 @@ def process_assignment_by_duration(
     lang: str,
     client: toloka.TolokaClient,
     assignment_duration_hint: datetime.timedelta,
+    verdict_plan: Optional[control.AssignmentVerdictPlan] = None,
+    restriction_plan: Optional[control.UserRestrictionPlan] = None,
+) -> Optional[toloka.Assignment.Status]:
+    microsecond = datetime.timedelta(microseconds=1)
+    decision_table = control.DecisionTable(control.Control(reject_rules + block_rules))
+    decisions = decision_table.decide(
+        durations=np.array([(assignment.submitted - assignment.created) // microsecond], dtype=np.int64),
+        duration_hints=np.array([assignment_duration_hint // microsecond], dtype=np.int64),
+    )
+    return perform_duration_rules_actions(
+        reject_rules=[rule for rule in decisions.verdict_rules if rule is not None],
+        block_rules=[rule for rule, blocked in zip(decision_table.block_rules, decisions.blocks[0]) if blocked],
+        assignment=assignment,
+        lang=lang,
+        client=client,
+        verdict_plan=verdict_plan,
+        restriction_plan=restriction_plan,
+    )
+
+
+# Performs actions of duration rules, predicates of which are already checked for assignment.
+def perform_duration_rules_actions(
+    reject_rules: List[control.Rule],
+    block_rules: List[control.Rule],
+    assignment: toloka.Assignment,
+    lang: str,
+    client: toloka.TolokaClient,
+    verdict_plan: Optional[control.AssignmentVerdictPlan] = None,
+    restriction_plan: Optional[control.UserRestrictionPlan] = None,
 ) -> Optional[toloka.Assignment.Status]:
-    assignment_duration = assignment.submitted - assignment.created
     verdict: Optional[toloka.Assignment.Status] = None
     # We need to first block user, if needed, and only after that set the assignment status:
     # in feedback loop case, both SUBMITTED and REJECTED assignments can arrive here.
@@ -157,25 +189,23 @@ def process_assignment_by_duration(
     # because the assignment will be deemed as "already processed" by BlockUser
 
     for rule in block_rules:
-        restriction = rule.apply(
-            value=assignment_duration,
-            assignment_duration_hint=assignment_duration_hint,
+        restriction = rule.action.perform(
             client=client,
             user_id=assignment.user_id,
             pool_id=assignment.pool_id,
             block_start=assignment.submitted,
             assignment_status=assignment.status,
+            restriction_plan=restriction_plan,
         )
         if restriction is not None:
             logger.debug(f'add restriction {restriction} for user {assignment.user_id} by {rule.predicate}')
 
     for rule in reject_rules:
-        verdict = rule.apply(
-            value=assignment_duration,
-            assignment_duration_hint=assignment_duration_hint,
+        verdict = rule.action.perform(
             client=client,
             assignment=assignment,
             public_comment=assignment_short_rejection_comment[lang],
+            verdict_plan=verdict_plan,
         )
         if verdict is not None:
             logger.debug(f'set assignment {assignment.id} to status {verdict.value} by {rule.predicate}')
@@ -183,6 +213,38 @@ def process_assignment_by_duration(
     return verdict
 
 
+def get_assignments_durations(
+    assignments_solutions: List[mapping.AssignmentSolutions],
+    task_duration_function: duration.TaskDurationFunction,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns actual and expected durations of assignments in microseconds, which is timedelta resolution.
+
+    Expected duration of task is calculated once per task, durations are memoized by Toloka task ID. Tasks without
+    ID are not memoized.
+    """
+    microsecond = datetime.timedelta(microseconds=1)
+    task_duration_hints = {}
+    durations, duration_hints = [], []
+    for assignment, solutions in assignments_solutions:
+        durations.append((assignment.submitted - assignment.created) // microsecond)
+        tasks = assignment.tasks or []
+        if len(tasks) != len(solutions):
+            # control tasks are omitted from solutions
+            tasks = [task for task in tasks if not task.known_solutions]
+        assert len(tasks) == len(solutions), f'solutions do not correspond to tasks of assignment {assignment.id}'
+        duration_hint = 0
+        for task, (input_objects, _) in zip(tasks, solutions):
+            task_duration_hint = task_duration_hints.get(task.id) if task.id is not None else None
+            if task_duration_hint is None:
+                task_duration_hint = task_duration_function(input_objects) // microsecond
+                if task.id is not None:
+                    task_duration_hints[task.id] = task_duration_hint
+            duration_hint += task_duration_hint
+        duration_hints.append(duration_hint)
+    return np.array(durations, dtype=np.int64), np.array(duration_hints, dtype=np.int64)
+
+
 # Some prior assignments checks, i.e. check for completion time, can be performed before real evaluation,
 # to avoid possibly time-cost consuming (in case of feedback loop) evaluation.
 def prior_filter_assignments(
@@ -192,29 +254,35 @@ def prior_filter_assignments(
     lang: str,
     task_duration_function: duration.TaskDurationFunction,
 ) -> Tuple[List[mapping.AssignmentSolutions], List[mapping.AssignmentSolutions]]:
-    reject_rules = control_params.filter_rules(
-        predicate_type=control.AssignmentDurationPredicate, action_type=control.SetAssignmentStatus
-    )
+    decision_table = control.DecisionTable(control_params)
+    submitted_assignments = list(submitted_assignments)
+    if not decision_table.duration_rules:
+        return submitted_assignments, []
 
-    block_rules = control_params.filter_rules(
-        predicate_type=control.AssignmentDurationPredicate, action_type=control.BlockUser
-    )
+    # rules predicates are checked for all assignments at once, only matched rules actions are performed
+    durations, duration_hints = get_assignments_durations(submitted_assignments, task_duration_function)
+    decisions = decision_table.decide(durations=durations, duration_hints=duration_hints)
+    matched = ~np.equal(decisions.verdict_rules, None) | decisions.blocks.any(axis=1)
 
     filtered_assignments = []
     fast_assignments = []
-    for assignment_solution in submitted_assignments:
+    # restrictions are issued first, so users are blocked before their assignments get verdicts
+    restriction_plan = control.UserRestrictionPlan()
+    verdict_plan = control.AssignmentVerdictPlan()
+    for i, assignment_solution in enumerate(submitted_assignments):
+        if not matched[i]:
+            filtered_assignments.append(assignment_solution)
+            continue
         assignment, solutions = assignment_solution
-        assignment_duration_hint = sum(
-            [task_duration_function(input_objects) for (input_objects, _) in solutions],
-            start=datetime.timedelta(seconds=0),
-        )
-        verdict = process_assignment_by_duration(
-            reject_rules=reject_rules,
-            block_rules=block_rules,
+        verdict_rule = decisions.verdict_rules[i]
+        verdict = perform_duration_rules_actions(
+            reject_rules=[verdict_rule] if verdict_rule is not None else [],
+            block_rules=[rule for rule, blocked in zip(decision_table.block_rules, decisions.blocks[i]) if blocked],
             assignment=assignment,
             lang=lang,
             client=client,
-            assignment_duration_hint=assignment_duration_hint,
+            verdict_plan=verdict_plan,
+            restriction_plan=restriction_plan,
         )
         if verdict is None:
             filtered_assignments.append(assignment_solution)
@@ -222,6 +290,8 @@ def prior_filter_assignments(
             fast_assignments.append(assignment_solution)
         else:
             assert False, f'Found fast assignment {assignment.id} with unexpected status {assignment.status}'
+    restriction_plan.execute(client)
+    verdict_plan.execute(client)
     return filtered_assignments, fast_assignments
 
 
@@ -244,6 +314,8 @@ class AssignmentEvaluation:
 
 class AssignmentAccuracyEvaluationStrategy:
     can_have_zero_checks = False
+    # evaluation of assignment solutions doesn't change over time, see WorkerWeightsAccumulator
+    stable_evaluations = False
 
     @abc.abstractmethod
     def ok(self, task: toloka.Task, solution: mapping.TaskSingleSolution) -> Optional[bool]:
@@ -273,11 +345,66 @@ class AssignmentAccuracyEvaluationStrategy:
         )
 
 
+class AssignmentEvaluationCache:
+    """
+    Evaluations of markup assignments by check results, keyed by (assignment ID, check results version). During
+    feedback loop iteration, same markup assignments are evaluated by several steps, and each evaluation builds check
+    TaskIDs of all assignment solutions, so cached evaluations are reused while check results are not changed.
+
+    Assignment evaluation depends only on `ok` values of check results, so version is incremented when they differ
+    from previously seen ones, evaluations of previous versions are dropped. Assignments without ID, i.e. model
+    markups, are not cached.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.solution_id_to_evaluation = None
+        self.solution_id_to_ok = None
+        self.version = 0
+        self.evaluations = {}
+
+    def get_version(self, solution_id_to_evaluation: Dict[mapping.TaskID, SolutionEvaluation]) -> int:
+        with self.lock:
+            if solution_id_to_evaluation is not self.solution_id_to_evaluation:
+                # check results are received again on each step, so their `ok` values are compared
+                solution_id_to_ok = {
+                    solution_id: solution_evaluation.ok
+                    for solution_id, solution_evaluation in solution_id_to_evaluation.items()
+                }
+                if solution_id_to_ok != self.solution_id_to_ok:
+                    self.version += 1
+                    self.evaluations = {}
+                self.solution_id_to_evaluation = solution_id_to_evaluation
+                self.solution_id_to_ok = solution_id_to_ok
+            return self.version
+
+    def get(self, assignment_id: str, version: int) -> Optional['AssignmentEvaluation']:
+        return self.evaluations.get((assignment_id, version))
+
+    def put(self, assignment_id: str, version: int, evaluation: 'AssignmentEvaluation'):
+        with self.lock:
+            if version == self.version:
+                self.evaluations[(assignment_id, version)] = evaluation
+
+
 # driven by evaluations in check pool
 @dataclass
 class CheckAssignmentAccuracyEvaluationStrategy(AssignmentAccuracyEvaluationStrategy):
     solution_id_to_evaluation: Dict[mapping.TaskID, SolutionEvaluation]
     check_task_mapping: mapping.TaskMapping
+    evaluation_cache: Optional[AssignmentEvaluationCache] = None
+
+    def evaluate_assignment(self, assignment_solutions: mapping.AssignmentSolutions) -> AssignmentEvaluation:
+        assignment, _ = assignment_solutions
+        if self.evaluation_cache is None or not assignment.id:
+            return super().evaluate_assignment(assignment_solutions)
+        version = self.evaluation_cache.get_version(self.solution_id_to_evaluation)
+        evaluation = self.evaluation_cache.get(assignment.id, version)
+        if evaluation is None:
+            evaluation = super().evaluate_assignment(assignment_solutions)
+            self.evaluation_cache.put(assignment.id, version, evaluation)
+        # assignment status may be changed since evaluation
+        return replace(evaluation, assignment=assignment)
 
     def ok(self, task: toloka.Task, solution: mapping.TaskSingleSolution) -> Optional[bool]:
         input_objects, output_objects = solution
@@ -287,24 +414,72 @@ class CheckAssignmentAccuracyEvaluationStrategy(AssignmentAccuracyEvaluationStra
         return self.solution_id_to_evaluation[solution_id].ok
 
 
+_missing = object()
+
+
+class _ControlTaskComparator:
+    """
+    Expected solution of control task, compiled once for task: expected values are arranged by output objects which
+    they belong to, so solution is checked by comparing values of these objects only, without building whole solution.
+
+    We check only values which are in expected solution, some output values, i.e. comments, is meaninglessly to check.
+    """
+
+    # output objects with expected values, their mappings and expected task fields
+    objects_fields: Tuple[Tuple[int, mapping.ObjectMapping, Tuple[str, ...]], ...]
+    expected: Tuple[Any, ...]
+    # expected solution has values which are not in output mapping, so no solution can match it
+    unmatchable: bool
+
+    def __init__(self, expected_solution: Dict[str, Any], task_mapping: mapping.TaskMapping):
+        objects_fields, expected, mapped_fields = [], [], set()
+        for i, obj_mapping in enumerate(task_mapping.output_mapping):
+            fields = tuple(
+                task_field for _, task_field in obj_mapping.obj_task_fields if task_field in expected_solution
+            )
+            if fields:
+                objects_fields.append((i, obj_mapping, fields))
+                expected += [expected_solution[task_field] for task_field in fields]
+                mapped_fields.update(fields)
+        self.objects_fields = tuple(objects_fields)
+        self.expected = tuple(expected)
+        self.unmatchable = mapped_fields != expected_solution.keys()
+
+    def ok(self, output_objects: mapping.Objects) -> bool:
+        if self.unmatchable:
+            return False
+        actual = []
+        for i, obj_mapping, fields in self.objects_fields:
+            values = obj_mapping.to_values(output_objects[i])
+            actual += [values.get(task_field, _missing) for task_field in fields]
+        return tuple(actual) == self.expected
+
+
 # driven by control tasks in each assignment
 @dataclass
 class ControlTasksAssignmentAccuracyEvaluationStrategy(AssignmentAccuracyEvaluationStrategy):
+    stable_evaluations = True
+
     task_mapping: mapping.TaskMapping
     can_have_zero_checks: bool = False
+    # control tasks comparators by task ID, compiled when control task is first seen
+    comparators: Dict[str, _ControlTaskComparator] = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    def get_comparator(self, task: toloka.Task) -> _ControlTaskComparator:
+        comparator = self.comparators.get(task.id) if task.id else None
+        if comparator is None:
+            assert len(task.known_solutions) == 1
+            comparator = _ControlTaskComparator(task.known_solutions[0].output_values, self.task_mapping)
+            if task.id:
+                self.comparators[task.id] = comparator
+        return comparator
 
     def ok(self, task: toloka.Task, solution: mapping.TaskSingleSolution) -> Optional[bool]:
         # we count on embedding control task single expected solution to Task.known_solutions
         if not task.known_solutions:
             return None
-        assert len(task.known_solutions) == 1
-        expected_solution = task.known_solutions[0].output_values
         _, output_objects = solution
-        actual_solution = self.task_mapping.to_solution(output_objects).output_values
-
-        # we check only values which are in expected solution, some output values,
-        # i.e. comments, is meaninglessly to check
-        return {**actual_solution, **expected_solution} == actual_solution
+        return self.get_comparator(task).ok(output_objects)
 
 
 class CustomEvaluationStrategy(AssignmentAccuracyEvaluationStrategy):
@@ -320,37 +495,86 @@ def apply_rules_to_assignment(
     client: toloka.TolokaClient,
     lang: str,
     pool_id: str,
+    verdict_plan: Optional[control.AssignmentVerdictPlan] = None,
+    restriction_plan: Optional[control.UserRestrictionPlan] = None,
 ) -> toloka.Assignment.Status:
-    verdict: Optional[toloka.Assignment.Status] = None
-    accuracy = evaluation.get_accuracy()
+    [verdict] = apply_accuracy_rules(
+        control.DecisionTable(control.Control(set_verdict_rules + block_rules)),
+        [evaluation],
+        client,
+        lang,
+        pool_id,
+        verdict_plan,
+        restriction_plan,
+    )
+    return verdict
+
+
+# Rules predicates are checked for all assignments at once, only matched rules actions are performed. Assignments are
+# already prior filtered, so duration rules are not applied.
+def apply_accuracy_rules(
+    decision_table: control.DecisionTable,
+    assignment_evaluations: List[AssignmentEvaluation],
+    client: toloka.TolokaClient,
+    lang: str,
+    pool_id: str,
+    verdict_plan: Optional[control.AssignmentVerdictPlan] = None,
+    restriction_plan: Optional[control.UserRestrictionPlan] = None,
+) -> List[toloka.Assignment.Status]:
+    decisions = decision_table.decide(
+        accuracy=np.array([evaluation.get_accuracy() for evaluation in assignment_evaluations], dtype=float),
+        # model workers are not blocked
+        blockable=np.array([bool(evaluation.assignment.id) for evaluation in assignment_evaluations], dtype=bool),
+    )
+    return [
+        perform_accuracy_rules_actions(
+            verdict_rule=verdict_rule,
+            block_rules=[rule for rule, blocked in zip(decision_table.block_rules, blocks) if blocked],
+            evaluation=evaluation,
+            client=client,
+            lang=lang,
+            pool_id=pool_id,
+            verdict_plan=verdict_plan,
+            restriction_plan=restriction_plan,
+        )
+        for evaluation, verdict_rule, blocks in zip(assignment_evaluations, decisions.verdict_rules, decisions.blocks)
+    ]
+
+
+# Performs actions of accuracy rules, predicates of which are already checked for assignment.
+def perform_accuracy_rules_actions(
+    verdict_rule: Optional[control.Rule],
+    block_rules: List[control.Rule],
+    evaluation: AssignmentEvaluation,
+    client: toloka.TolokaClient,
+    lang: str,
+    pool_id: str,
+    verdict_plan: Optional[control.AssignmentVerdictPlan] = None,
+    restriction_plan: Optional[control.UserRestrictionPlan] = None,
+) -> toloka.Assignment.Status:
+    assert verdict_rule is not None, f'no verdict rule is matched for assignment {evaluation.assignment.id}'
     for rule in block_rules:
         if not evaluation.assignment.id:
             continue  # model workers are not blocked
-        restriction = rule.apply(
-            value=accuracy,
+        restriction = rule.action.perform(
             client=client,
             user_id=evaluation.assignment.user_id,
             pool_id=pool_id,
             block_start=evaluation.assignment.submitted,
             assignment_status=evaluation.assignment.status,
+            restriction_plan=restriction_plan,
         )
-        if restriction is not None:
-            logger.debug(f'add restriction {restriction} for user {evaluation.assignment.user_id} by {rule.predicate}')
-    for rule in set_verdict_rules:
-        verdict = rule.apply(
-            value=accuracy,
-            client=client,
-            assignment=evaluation.assignment,
-            public_comment=get_assignment_rejection_comment(evaluation.incorrect_solution_indexes, lang),
-        )
-        if not evaluation.assignment.id:
-            # model worker assignments are not present in Toloka storage, so we have no possibility to store their
-            # status as for usual workers, so we set it on the fly
-            evaluation.assignment.status = verdict
-        if verdict is not None:
-            logger.debug(f'set assignment {evaluation.assignment.id} to status {verdict.value} by {rule.predicate}')
-            break
-    assert verdict is not None
+        logger.debug(f'add restriction {restriction} for user {evaluation.assignment.user_id} by {rule.predicate}')
+    verdict = verdict_rule.action.perform(
+        client=client,
+        assignment=evaluation.assignment,
+        public_comment=get_assignment_rejection_comment(evaluation.incorrect_solution_indexes, lang),
+        verdict_plan=verdict_plan,
+    )
+    if not evaluation.assignment.id:
+        # model worker assignments are not present in Toloka storage, so their status is set on the fly
+        evaluation.assignment.status = verdict
+    logger.debug(f'set assignment {evaluation.assignment.id} to status {verdict.value} by {verdict_rule.predicate}')
     return verdict
 
 
@@ -398,18 +622,21 @@ def evaluate_submitted_assignments_and_apply_rules(
         assignment_accuracy_evaluation_strategy.evaluate_assignment(assignment) for assignment in submitted_assignments
     ]
 
-    set_verdict_rules = control_params.filter_rules(
-        predicate_type=control.AssignmentAccuracyPredicate, action_type=control.SetAssignmentStatus
+    # restrictions are issued first, so users are blocked before their assignments get verdicts
+    restriction_plan = control.UserRestrictionPlan()
+    verdict_plan = control.AssignmentVerdictPlan()
+    verdicts = apply_accuracy_rules(
+        control.DecisionTable(control_params),
+        assignment_evaluations,
+        client,
+        lang,
+        pool_id,
+        verdict_plan,
+        restriction_plan,
     )
-
-    block_rules = control_params.filter_rules(
-        predicate_type=control.AssignmentAccuracyPredicate, action_type=control.BlockUser
-    )
-
-    return [
-        apply_rules_to_assignment(set_verdict_rules, block_rules, evaluation, client, lang, pool_id)
-        for evaluation in assignment_evaluations
-    ]
+    restriction_plan.execute(client)
+    verdict_plan.execute(client)
+    return verdicts
 
 
 def get_markup_task_id(check_task_id: mapping.TaskID, markup_task_mapping: mapping.TaskMapping) -> mapping.TaskID:
@@ -432,9 +659,10 @@ def find_finalized_tasks(
     check_task_mapping: mapping.TaskMapping,
     check_sample: Optional[AssignmentCheckSample],
     max_object_markup_attempts: Optional[int],
+    evaluation_cache: Optional[AssignmentEvaluationCache] = None,
 ) -> Set[mapping.TaskID]:
     assignment_accuracy_evaluation_strategy = CheckAssignmentAccuracyEvaluationStrategy(
-        solution_id_to_evaluation, check_task_mapping
+        solution_id_to_evaluation, check_task_mapping, evaluation_cache
     )
     assignments_evaluations = [
         assignment_accuracy_evaluation_strategy.evaluate_assignment(assignment) for assignment in markup_assignments
@@ -505,6 +733,7 @@ def calculate_bonuses_for_pool_of_markup_assignments(
     solution_id_to_evaluation: Dict[mapping.TaskID, SolutionEvaluation],
     check_task_mapping: mapping.TaskMapping,
     control_params: control.Control,
+    evaluation_cache: Optional[AssignmentEvaluationCache] = None,
 ) -> List[toloka.user_bonus.UserBonus]:
     assert all(
         assignment.status in (toloka.Assignment.ACCEPTED, toloka.Assignment.REJECTED)
@@ -520,7 +749,7 @@ def calculate_bonuses_for_pool_of_markup_assignments(
         return []
 
     assignment_accuracy_evaluation_strategy = CheckAssignmentAccuracyEvaluationStrategy(
-        solution_id_to_evaluation, check_task_mapping
+        solution_id_to_evaluation, check_task_mapping, evaluation_cache
     )
     assignment_evaluations = [
         assignment_accuracy_evaluation_strategy.evaluate_assignment(assignment) for assignment in markup_assignments
@@ -533,11 +762,86 @@ def calculate_bonuses_for_pool_of_markup_assignments(
     return bonuses
 
 
+class WorkerWeightsAccumulator:
+    """
+    Per-pool (correct, total) checks counts of each worker. Counts are updated only with new or re-verdicted
+    assignments, and counts of assignments which are no longer passed are withdrawn, so weights calculation on each loop
+    iteration scales with new assignments instead of the whole pool history.
+
+    Evaluation of assignment is expected to be stable, i.e. by control tasks. If evaluations can change, like in check
+    pool evaluations of feedback loop or in custom strategies, accumulator is not used and weights are calculated from
+    all assignments.
+    """
+
+    smoothness_k: float
+    # assignment ID -> (status, worker ID, ok checks, total checks)
+    assignment_counts: Dict[str, Tuple[toloka.Assignment.Status, str, int, int]]
+    correct_count: Dict[str, int]
+    total_count: Dict[str, int]
+    assignments_count: Dict[str, int]
+
+    def __init__(self, smoothness_k: float = 0.5):
+        self.smoothness_k = smoothness_k
+        self.reset()
+
+    def reset(self):
+        self.assignment_counts = {}
+        self.correct_count = defaultdict(int)
+        self.total_count = defaultdict(int)
+        self.assignments_count = defaultdict(int)
+
+    def add(self, worker_id: str, correct: int, total: int, sign: int):
+        self.correct_count[worker_id] += sign * correct
+        self.total_count[worker_id] += sign * total
+        self.assignments_count[worker_id] += sign
+        if not self.assignments_count[worker_id]:
+            del self.correct_count[worker_id], self.total_count[worker_id], self.assignments_count[worker_id]
+
+    def update(
+        self,
+        assignments: List[mapping.AssignmentSolutions],
+        assignment_accuracy_evaluation_strategy: AssignmentAccuracyEvaluationStrategy,
+    ):
+        assignment_ids = set()
+        for assignment_solutions in assignments:
+            assignment = assignment_solutions[0]
+            assignment_ids.add(assignment.id)
+            counts = self.assignment_counts.get(assignment.id)
+            if counts is not None and counts[0] == assignment.status:
+                continue
+            if counts is not None:
+                self.add(*counts[1:], sign=-1)
+            assignment_evaluation = assignment_accuracy_evaluation_strategy.evaluate_assignment(assignment_solutions)
+            counts = (
+                assignment.status,
+                assignment.user_id,
+                assignment_evaluation.ok_checks,
+                assignment_evaluation.total_checks,
+            )
+            self.assignment_counts[assignment.id] = counts
+            self.add(*counts[1:], sign=1)
+        for assignment_id in set(self.assignment_counts) - assignment_ids:
+            self.add(*self.assignment_counts.pop(assignment_id)[1:], sign=-1)
+
+    def get_worker_weights(self) -> classification.WorkerWeights:
+        return {
+            worker_id: (correct + self.smoothness_k) / (self.total_count[worker_id] + 2 * self.smoothness_k)
+            for worker_id, correct in self.correct_count.items()
+        }
+
+
+# If accumulator is passed, only new or re-verdicted assignments are evaluated, so assignments must have IDs.
 def calculate_worker_weights(
     assignments: List[mapping.AssignmentSolutions],
     assignment_accuracy_evaluation_strategy: Optional[AssignmentAccuracyEvaluationStrategy],
     smoothness_k: float = 0.5,
+    accumulator: Optional[WorkerWeightsAccumulator] = None,
 ) -> classification.WorkerWeights:
+    if accumulator is not None and assignment_accuracy_evaluation_strategy.stable_evaluations:
+        assert accumulator.smoothness_k == smoothness_k
+        accumulator.update(assignments, assignment_accuracy_evaluation_strategy)
+        return accumulator.get_worker_weights()
+
     assignment_evaluations = [
         assignment_accuracy_evaluation_strategy.evaluate_assignment(assignment) for assignment in assignments
     ]
@@ -78,6 +78,23 @@ class ExpertPipeline:
     def add_input_objects(
         self, pool_id: str, input_objects: Union[List[mapping.TaskSingleSolution], List[mapping.Objects]]
     ):
+        tasks = self.to_tasks(pool_id, input_objects)
+        logger.debug(f'creating {len(tasks)} tasks')
+        self.client.create_tasks(tasks, allow_defaults=True, async_mode=True, skip_invalid_items=False)
+        self.client.open_pool(pool_id)
+
+    async def add_input_objects_async(
+        self, pool_id: str, input_objects: Union[List[mapping.TaskSingleSolution], List[mapping.Objects]]
+    ):
+        client = utils.AsyncTolokaClient(self.client)
+        tasks = self.to_tasks(pool_id, input_objects)
+        logger.debug(f'creating {len(tasks)} tasks')
+        await client.create_tasks(tasks, allow_defaults=True, async_mode=True, skip_invalid_items=False)
+        await client.open_pool(pool_id)
+
+    def to_tasks(
+        self, pool_id: str, input_objects: Union[List[mapping.TaskSingleSolution], List[mapping.Objects]]
+    ) -> List[toloka.Task]:
         assert input_objects, 'No objects supplied'
         # todo not very reliable typecheck due to dynamic generics
         # todo: verification case for annotations
@@ -96,13 +113,14 @@ class ExpertPipeline:
             task = self.task_mapping.to_task(task_objects_or_solutions)
             task.pool_id = pool_id
             tasks.append(task)
-        logger.debug(f'creating {len(tasks)} tasks')
-        self.client.create_tasks(tasks, allow_defaults=True, async_mode=True, skip_invalid_items=False)
-        self.client.open_pool(pool_id)
+        return tasks
 
     def loop(self, pool_id: str):
         utils.wait_pool_for_close(self.client, pool_id)
 
+    async def loop_async(self, pool_id: str):
+        await utils.wait_pool_for_close_async(utils.AsyncTolokaClient(self.client), pool_id)
+
     def get_results(
         self,
         pool_id: str,
@@ -117,3 +135,10 @@ class ExpertPipeline:
         if self.scenario == project_config.Scenario.EXPERT_LABELING_OF_SOLVED_TASKS:
             objects = [obj[0] + obj[1] for obj in objects]
         return list(zip(objects, mapping.get_solutions(assignments, self.task_mapping, objects)))
+
+    async def get_results_async(
+        self,
+        pool_id: str,
+        objects: Union[List[mapping.TaskSingleSolution], List[mapping.Objects]],
+    ) -> List[Tuple[Union[mapping.TaskSingleSolution, mapping.Objects], mapping.TaskMultipleSolutions]]:
+        return await utils.run_blocking(self.get_results, pool_id, objects)
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from typing import List, Dict, Tuple, Optional
 from dataclasses import dataclass
@@ -25,11 +26,15 @@ class FeedbackLoop:
     evaluation: Evaluation
     markup_task_mapping: mapping.TaskMapping
     check_task_mapping: mapping.TaskMapping
+    markup_task_index: mapping.TaskIndex
     check_loop: classification_loop.ClassificationLoop
     client: toloka.TolokaClient
     lang: str
     s3: Optional[datasource.S3]
     model_ws: Optional[worker.ModelWorkspace]
+    assignments_fetcher: Optional[classification_loop.AssignmentsFetcher]
+    state_store: Optional[classification_loop.LoopStateStore]
+    evaluation_cache: evaluation.AssignmentEvaluationCache
 
     def __init__(
         self,
@@ -43,6 +48,8 @@ class FeedbackLoop:
         s3: Optional[datasource.S3] = None,
         model_markup: Optional[worker.Model] = None,
         model_check: Optional[worker.Model] = None,
+        assignments_fetcher: Optional[classification_loop.AssignmentsFetcher] = None,
+        state_store: Optional[classification_loop.LoopStateStore] = None,
     ):
         self.evaluation = Evaluation(
             aggregation_algorithm=check_params.aggregation_algorithm,
@@ -56,6 +63,9 @@ class FeedbackLoop:
         self.client = client
         self.markup_task_mapping = markup_task_mapping
         self.check_task_mapping = check_task_mapping
+        self.markup_task_index = mapping.TaskIndex.from_objects(markup_task_mapping, pool_input_objects)
+        if state_store is not None and assignments_fetcher is None:
+            assignments_fetcher = classification_loop.AssignmentsFetcher(client, state_store=state_store)
         self.check_loop = classification_loop.ClassificationLoop(
             client=client,
             task_mapping=self.check_task_mapping,
@@ -66,7 +76,13 @@ class FeedbackLoop:
             #  1) also look at control tasks count for check pool
             #  2) (DATAFORGE-75): correct only when model substitutes all solutions
             with_control_tasks=model_check is None,
+            assignments_fetcher=assignments_fetcher,
+            state_store=state_store,
         )
+        self.assignments_fetcher = assignments_fetcher
+        self.state_store = state_store
+        # markup assignments are evaluated by several steps of each iteration and by results collection
+        self.evaluation_cache = evaluation.AssignmentEvaluationCache()
         self.lang = lang
         self.s3 = s3
         self.model_ws = None
@@ -114,6 +130,21 @@ class FeedbackLoop:
             iteration += 1
         self.give_bonuses_to_users(check_pool_id=check_pool_id, markup_assignments=markup_assignments)
 
+    async def loop_async(self, markup_pool_id: str, check_pool_id: str):
+        iteration = 1
+        while True:
+            logger.debug(f'feedback loop iteration #{iteration} is started')
+            markup_assignments, fast_markup_assignments = await self.get_markups_async(markup_pool_id, check_pool_id)
+            check_stats = await utils.run_blocking(
+                self.check_markups, markup_pool_id, check_pool_id, markup_assignments, fast_markup_assignments
+            )
+            if check_stats is None:
+                break
+            iteration += 1
+        await utils.run_blocking(
+            self.give_bonuses_to_users, check_pool_id=check_pool_id, markup_assignments=markup_assignments
+        )
+
     def give_bonuses_to_users(
         self,
         check_pool_id: str,
@@ -124,6 +155,7 @@ class FeedbackLoop:
             solution_id_to_evaluation=self.get_checks(check_pool_id),
             check_task_mapping=self.check_task_mapping,
             control_params=self.markup_params.control,
+            evaluation_cache=self.evaluation_cache,
         )
         if not bonuses:
             return None
@@ -150,16 +182,53 @@ class FeedbackLoop:
                 checks,
                 self.markup_task_mapping,
                 self.check_task_mapping,
+                task_index=self.markup_task_index,
+                evaluation_cache=self.evaluation_cache,
+            ),
+            worker_weights,
+        )
+
+    # Check pool results are received concurrently with markup pool results.
+    async def get_results_async(
+        self,
+        markup_pool_id: str,
+        check_pool_id: str,
+    ) -> Tuple[Results, Optional[classification.WorkerWeights]]:
+        (checks, worker_weights), human_markups = await asyncio.gather(
+            utils.run_blocking(self.get_checks_and_weights, check_pool_id),
+            self.get_human_markups_async(markup_pool_id),
+        )
+        markups, _ = await utils.run_blocking(self.filter_markups, human_markups, check_pool_id)
+        return (
+            get_results(
+                self.pool_input_objects,
+                markups,
+                checks,
+                self.markup_task_mapping,
+                self.check_task_mapping,
+                task_index=self.markup_task_index,
+                evaluation_cache=self.evaluation_cache,
             ),
             worker_weights,
         )
 
     def get_markups(
         self, markup_pool_id: str, check_pool_id: str
+    ) -> Tuple[List[mapping.AssignmentSolutions], List[mapping.AssignmentSolutions]]:
+        return self.filter_markups(self.get_human_markups(markup_pool_id), check_pool_id)
+
+    async def get_markups_async(
+        self, markup_pool_id: str, check_pool_id: str
+    ) -> Tuple[List[mapping.AssignmentSolutions], List[mapping.AssignmentSolutions]]:
+        human_markups = await self.get_human_markups_async(markup_pool_id)
+        return await utils.run_blocking(self.filter_markups, human_markups, check_pool_id)
+
+    def filter_markups(
+        self, human_markups: List[mapping.AssignmentSolutions], check_pool_id: str
     ) -> Tuple[List[mapping.AssignmentSolutions], List[mapping.AssignmentSolutions]]:
         filtered_human_markups, fast_markups = evaluation.prior_filter_assignments(
             self.client,
-            self.get_human_markups(markup_pool_id),
+            human_markups,
             self.markup_params.control,
             self.lang,
             task_duration_function=self.markup_params.task_duration_function,
@@ -168,15 +237,20 @@ class FeedbackLoop:
 
     def get_human_markups(self, pool_id: str) -> List[mapping.AssignmentSolutions]:
         utils.wait_pool_for_close(self.client, pool_id)
+        return self.receive_human_markups(pool_id)
+
+    async def get_human_markups_async(self, pool_id: str) -> List[mapping.AssignmentSolutions]:
+        await utils.wait_pool_for_close_async(utils.AsyncTolokaClient(self.client), pool_id)
+        return await utils.run_blocking(self.receive_human_markups, pool_id)
+
+    def receive_human_markups(self, pool_id: str) -> List[mapping.AssignmentSolutions]:
         return datasource.substitute_media_output(
-            mapping.get_assignments_solutions(
-                assignments=list(
-                    self.client.get_assignments(
-                        status=[toloka.Assignment.SUBMITTED, toloka.Assignment.ACCEPTED, toloka.Assignment.REJECTED],
-                        pool_id=pool_id,
-                    )
-                ),
-                mapping=self.markup_task_mapping,
+            classification_loop.get_assignments_solutions(
+                self.client,
+                self.markup_task_mapping,
+                pool_id,
+                [toloka.Assignment.SUBMITTED, toloka.Assignment.ACCEPTED, toloka.Assignment.REJECTED],
+                assignments_fetcher=self.assignments_fetcher,
             ),
             self.s3,
             self.client,
@@ -204,6 +278,7 @@ class FeedbackLoop:
                 evaluation.CheckAssignmentAccuracyEvaluationStrategy(
                     solution_id_to_evaluation,
                     self.check_task_mapping,
+                    self.evaluation_cache,
                 ),
                 self.markup_params.control,
                 self.client,
@@ -239,7 +314,9 @@ class FeedbackLoop:
 
         evaluation.evaluate_submitted_assignments_and_apply_rules(
             submitted_markup_assignments,
-            evaluation.CheckAssignmentAccuracyEvaluationStrategy(solution_id_to_evaluation, self.check_task_mapping),
+            evaluation.CheckAssignmentAccuracyEvaluationStrategy(
+                solution_id_to_evaluation, self.check_task_mapping, self.evaluation_cache
+            ),
             self.markup_params.control,
             self.client,
             self.lang,
@@ -253,6 +330,7 @@ class FeedbackLoop:
             self.check_task_mapping,
             self.evaluation.assignment_check_sample,
             self.markup_params.overlap.max_overlap,
+            self.evaluation_cache,
         )
 
         task_id_to_overlap_increase = {
@@ -1,4 +1,3 @@
-from collections import defaultdict
 from dataclasses import dataclass
 import enum
 from typing import List, Dict, Optional
@@ -54,6 +53,8 @@ def get_results(
     solution_id_to_evaluation: Dict[mapping.TaskID, evaluation.SolutionEvaluation],
     markup_task_mapping: mapping.TaskMapping,
     check_task_mapping: mapping.TaskMapping,
+    task_index: Optional[mapping.TaskIndex] = None,
+    evaluation_cache: Optional[evaluation.AssignmentEvaluationCache] = None,
 ) -> Results:
     assert all(
         assignment.status in (toloka.Assignment.ACCEPTED, toloka.Assignment.REJECTED)
@@ -61,7 +62,7 @@ def get_results(
     )
 
     assignment_accuracy_evaluation_strategy = evaluation.CheckAssignmentAccuracyEvaluationStrategy(
-        solution_id_to_evaluation, check_task_mapping
+        solution_id_to_evaluation, check_task_mapping, evaluation_cache
     )
     assignments_evaluations = [
         assignment_accuracy_evaluation_strategy.evaluate_assignment(assignment) for assignment in markup_assignments
@@ -69,7 +70,11 @@ def get_results(
     assignment_id_to_accuracy = {e.assignment.id: e.get_accuracy() for e in assignments_evaluations}
     assignment_id_to_evaluation_recall = {e.assignment.id: e.get_evaluation_recall() for e in assignments_evaluations}
 
-    task_id_to_result = defaultdict(list)
+    task_index = task_index if task_index is not None else mapping.TaskIndex()
+    pool_task_indices = [
+        task_index.add(markup_task_mapping.task_id(input_objects)) for input_objects in pool_input_objects
+    ]
+    task_results = [[] for _ in range(len(task_index))]
     for assignment, solutions in markup_assignments:
         for input_objects, output_objects in solutions:
             task_id = markup_task_mapping.task_id(input_objects)
@@ -86,14 +91,12 @@ def get_results(
                 assignment_accuracy=assignment_id_to_accuracy[assignment.id],
                 assignment_evaluation_recall=assignment_id_to_evaluation_recall[assignment.id],
             )
-            task_id_to_result[task_id].append(solution)
+            index = task_index.get(task_id)
+            if index is not None:  # solutions of objects outside of pool input objects are ignored
+                task_results[index].append(solution)
 
-    for solutions in task_id_to_result.values():
+    for solutions in task_results:
         solutions.sort(reverse=True)
 
     # order results in pool input order
-    results = []
-    for input_objects in pool_input_objects:
-        results.append(task_id_to_result[markup_task_mapping.task_id(input_objects)])
-
-    return results
+    return [task_results[i] for i in pool_task_indices]
@@ -1,8 +1,13 @@
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 from contextlib import AbstractContextManager
 from dataclasses import dataclass, is_dataclass
-from typing import List, Type, Tuple, Optional, Dict, Iterable, Any
+import datetime
+from functools import cached_property
+import hashlib
+import threading
+from typing import List, Type, Tuple, Optional, Dict, Iterable, Iterator, Any, Sequence
 
+import numpy as np
 import toloka.client as toloka
 
 import crowdom.base as base
@@ -67,6 +72,75 @@ def _get_all_annotations(obj_cls: Type[base.Object]) -> dict:
     return result
 
 
+class _ObjectCodec:
+    """
+    Conversion between object and task values, compiled once for object mapping: object class annotations are resolved
+    in advance and object fields are accessed directly.
+
+    Specialized conversion is available only for classes and dataclasses with fields of primitive types; in other cases
+    and for unexpected runtime values generic path with its error reporting is used.
+    """
+
+    obj_cls: Type[base.Object]
+    is_class: bool
+    task_fields: Tuple[str, ...]
+    obj_task_fields: Tuple[Tuple[str, str], ...]
+    decode_fields: Tuple[Tuple[str, str, type], ...]
+
+    def __init__(self, obj_cls: Type[base.Object], obj_task_fields: Tuple[Tuple[str, str], ...]):
+        self.obj_cls = obj_cls
+        self.is_class = issubclass(obj_cls, base.Class)
+        self.task_fields = tuple(task_field for _, task_field in obj_task_fields)
+        self.obj_task_fields = obj_task_fields
+        decode_fields = []
+        if not self.is_class:
+            annotations = _get_all_annotations(obj_cls)
+            for obj_field, task_field in obj_task_fields:
+                field_type = annotations.get(obj_field)
+                if field_type is not None:
+                    decode_fields.append((obj_field, task_field, field_type))
+        self.decode_fields = tuple(decode_fields)
+
+    @staticmethod
+    def compile(obj_cls: Type[base.Object], obj_task_fields: Tuple[Tuple[str, str], ...]) -> Optional['_ObjectCodec']:
+        if issubclass(obj_cls, base.Class):
+            if len(obj_task_fields) != 1 or obj_task_fields[0][0] != base.CLASS_OBJ_FIELD:
+                return None
+            return _ObjectCodec(obj_cls, obj_task_fields)
+        if not is_dataclass(obj_cls):
+            return None
+        try:
+            annotations = _get_all_annotations(obj_cls)
+        except AttributeError:
+            return None
+        if any(field_type not in obj_primitive_field_types for field_type in annotations.values()):
+            return None
+        return _ObjectCodec(obj_cls, obj_task_fields)
+
+    # returns None if object can't be encoded by compiled codec
+    def encode(self, obj: base.Object) -> Optional[Dict[str, Any]]:
+        if self.is_class:
+            assert isinstance(obj.value, str), 'class enum must have string values'
+            return {self.task_fields[0]: obj.value}
+        # all object fields are checked, not only mapped ones, as in generic path
+        if any(type(field_value) not in obj_primitive_field_types for field_value in obj.__dict__.values()):
+            return None
+        obj_values = obj.__dict__
+        return {task_field: obj_values[obj_field] for obj_field, task_field in self.obj_task_fields}
+
+    def decode(self, values: Dict[str, Any]) -> base.Object:
+        if self.is_class:
+            return self.obj_cls(values[self.task_fields[0]])
+        fields = {}
+        for obj_field, task_field, field_type in self.decode_fields:
+            field_value = values[task_field]
+            assert field_type == type(field_value), (
+                f'obj field type {field_type} does not match to values type ' f'{type(field_value)}'
+            )
+            fields[obj_field] = field_value
+        return self.obj_cls(**fields)
+
+
 @dataclass(frozen=True)
 class ObjectMapping:
     obj_meta: base.ObjectMeta
@@ -76,6 +150,10 @@ class ObjectMapping:
     def obj_type(self) -> base.ObjectT:
         return self.obj_meta.type
 
+    @cached_property
+    def codec(self) -> Optional[_ObjectCodec]:
+        return _ObjectCodec.compile(self.obj_type, self.obj_task_fields)
+
     def to_values(self, obj: Optional[base.Object]) -> Dict[str, Any]:
         if validation_enabled:
             if obj is None:
@@ -86,6 +164,10 @@ class ObjectMapping:
                 ), f'passed {obj.__class__} does not correspond to mapping {self.obj_type}'
         if obj is None:
             return {}
+        if self.codec is not None:
+            values = self.codec.encode(obj)
+            if values is not None:
+                return values
         obj_values = obj_to_values(obj)
         values = {}
         for obj_field, task_field in self.obj_task_fields:
@@ -122,6 +204,8 @@ class ObjectMapping:
         return spec
 
     def from_values(self, values: Dict[str, Any]) -> Optional[base.Object]:
+        if self.codec is not None and all(task_field in values for task_field in self.codec.task_fields):
+            return self.codec.decode(values)
         task_fields = set(task_field for _, task_field in self.obj_task_fields)
         if task_fields & values.keys() != task_fields:
             assert (
@@ -148,12 +232,16 @@ class ObjectMapping:
 
 
 TASK_ID_FIELD = 'id'
+TASK_ID_DIGEST_SIZE = 16
 Objects = Tuple[Optional[base.Object], ...]
 
 
 class TaskID:
     objects: Objects
     id: str
+    digest: bytes
+
+    __slots__ = ('objects', 'id', 'digest', '_hash')
 
     def __init__(self, objects: Objects):
         self.objects = objects
@@ -165,16 +253,173 @@ class TaskID:
         # floats string representation, but since we need to reproduce the results when restarting on the same
         # environment, this seems OK.
         self.id = ' '.join(repr(obj) for obj in objects)
+        # String ID is kept as is for Toloka task input values, so existing pools remain compatible. Comparisons and
+        # hashing, which are performed in every dict lookup, use fixed-size digest of this ID instead, because ID
+        # can be several kilobytes long, i.e. for long transcripts.
+        self.digest = hashlib.blake2b(self.id.encode('utf-8'), digest_size=TASK_ID_DIGEST_SIZE).digest()
+        self._hash = hash(self.digest)
 
     def __eq__(self, other):
-        return self.id == other.id
+        return self.digest == other.digest
 
     def __hash__(self):
-        return hash(self.id)
+        return self._hash
 
     def __repr__(self) -> str:
         return self.id
 
+    # hash of bytes is salted per process, so it must be recalculated after unpickling
+    def __getstate__(self) -> dict:
+        return {'objects': self.objects}
+
+    def __setstate__(self, state: dict):
+        self.__init__(state['objects'])
+
+
+class TaskIndex:
+    """
+    Dense integer index of pool tasks. It is built once per pool and shared by loop stages, so per-task values can be
+    stored in arrays, indexed by task position, instead of rebuilding dicts keyed by TaskID at each stage.
+
+    Index only grows, positions of already indexed tasks never change.
+    """
+
+    task_ids: List[TaskID]
+    task_id_to_index: Dict[TaskID, int]
+
+    def __init__(self, task_ids: Iterable[TaskID] = ()):
+        self.task_ids = []
+        self.task_id_to_index = {}
+        for task_id in task_ids:
+            self.add(task_id)
+
+    @staticmethod
+    def from_objects(task_mapping: 'TaskMapping', objects_list: Iterable[Objects]) -> 'TaskIndex':
+        return TaskIndex(task_mapping.task_id(objects) for objects in objects_list)
+
+    def add(self, task_id: TaskID) -> int:
+        index = self.task_id_to_index.get(task_id)
+        if index is None:
+            index = len(self.task_ids)
+            self.task_id_to_index[task_id] = index
+            self.task_ids.append(task_id)
+        return index
+
+    def index(self, task_id: TaskID) -> int:
+        return self.task_id_to_index[task_id]
+
+    def get(self, task_id: TaskID) -> Optional[int]:
+        return self.task_id_to_index.get(task_id)
+
+    def objects(self) -> List[Objects]:
+        return [task_id.objects for task_id in self.task_ids]
+
+    def to_dict(self, values: Sequence[Any]) -> Dict[TaskID, Any]:
+        assert len(values) <= len(self.task_ids)
+        return {task_id: value for task_id, value in zip(self.task_ids, values)}
+
+    def __len__(self) -> int:
+        return len(self.task_ids)
+
+    def __contains__(self, task_id: TaskID) -> bool:
+        return task_id in self.task_id_to_index
+
+    def __iter__(self) -> Iterator[TaskID]:
+        return iter(self.task_ids)
+
+    def __getitem__(self, index: int) -> TaskID:
+        return self.task_ids[index]
+
+
+class DecodedTaskCache:
+    """
+    LRU cache of decoded Toloka tasks. Same tasks are decoded many times by loop stages, i.e. for each assignment
+    containing them and for each listing of pool tasks, and decoding together with TaskID calculation is expensive
+    for long inputs.
+
+    Key is Toloka task ID along with task mapping identity, because the same task can be decoded with different
+    mappings. Task input values are immutable in Toloka, so entries never become stale. Tasks without ID, i.e. not yet
+    created ones, are not cached.
+
+    Cache is bounded both by entries count and by total size of task IDs, which approximates size of decoded objects.
+    """
+
+    max_entries: int
+    max_size: int
+    size: int
+    hits: int
+    misses: int
+
+    def __init__(self, max_entries: int = 100_000, max_size: int = 256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    # Returns None if task is not decoded yet.
+    def get(self, task: toloka.Task, task_mapping: 'TaskMapping') -> Optional[Tuple[Objects, TaskID]]:
+        if task.id is None:
+            return None
+        key = (id(task_mapping), task.id)
+        with self.lock:
+            entry = self.entries.get(key)
+            # mapping reference is stored in entry, so its id() can't be reused by another mapping while entry exists
+            if entry is not None and entry[0] is task_mapping:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], entry[2]
+            self.misses += 1
+        return None
+
+    def get_or_decode(self, task: toloka.Task, task_mapping: 'TaskMapping') -> Tuple[Objects, TaskID]:
+        decoded = self.get(task, task_mapping)
+        if decoded is not None:
+            return decoded
+        objects, task_id = self.decode(task, task_mapping)
+        if task.id is not None:
+            self.put((id(task_mapping), task.id), task_mapping, objects, task_id)
+        return objects, task_id
+
+    @staticmethod
+    def decode(task: toloka.Task, task_mapping: 'TaskMapping') -> Tuple[Objects, TaskID]:
+        objects = task_mapping.from_task(task)
+        return objects, TaskID(objects)
+
+    @staticmethod
+    def entry_size(task_id: TaskID) -> int:
+        return len(task_id.id)
+
+    def put(self, key: Tuple[int, str], task_mapping: 'TaskMapping', objects: Objects, task_id: TaskID):
+        size = self.entry_size(task_id)
+        if size > self.max_size:
+            return
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= self.entry_size(previous[2])
+            self.entries[key] = (task_mapping, objects, task_id)
+            self.size += size
+            while len(self.entries) > self.max_entries or self.size > self.max_size:
+                _, (_, _, evicted_task_id) = self.entries.popitem(last=False)
+                self.size -= self.entry_size(evicted_task_id)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+# shared by all loops in process
+decoded_task_cache = DecodedTaskCache()
+
 
 TaskSingleSolution = Tuple[Objects, Objects]
 
@@ -243,6 +488,15 @@ class TaskMapping:
     def from_task(self, task: toloka.Task) -> Objects:
         return self.from_task_values(task.input_values)
 
+    # same as from_task(), but also returns task ID and reuses results for tasks which were already decoded
+    def decode_task(self, task: toloka.Task) -> Tuple[Objects, 'TaskID']:
+        return decoded_task_cache.get_or_decode(task, self)
+
+    # TaskID of task which is decoded to objects, reused if task was already decoded
+    def decoded_task_id(self, task: Optional[toloka.Task], objects: Objects) -> 'TaskID':
+        decoded = decoded_task_cache.get(task, self) if task is not None else None
+        return decoded[1] if decoded is not None else TaskID(objects)
+
     def from_task_values(self, values: Dict[str, Any]) -> Objects:
         return tuple(mapping.from_values(values) for mapping in self.input_mapping)
 
@@ -309,25 +563,135 @@ def get_solutions(
     ]
 
 
+@dataclass
+class AssignmentFrame:
+    """
+    Columnar (struct of arrays) representation of fetched assignments, built once per fetch and shared by consumers,
+    which can work with NumPy arrays instead of iterating over assignments solutions again.
+
+    Assignment-level columns are aligned with `assignments`, solution-level columns contain one row per solution in
+    assignment and refer to assignment by its position in `solution_assignment_indices`.
+    """
+
+    assignments: List[toloka.Assignment]
+    task_index: TaskIndex
+
+    assignment_ids: np.ndarray  # str
+    worker_ids: np.ndarray  # str
+    statuses: np.ndarray  # str, values of toloka.Assignment.Status
+    created: np.ndarray  # datetime64
+    submitted: np.ndarray  # datetime64
+
+    solution_assignment_indices: np.ndarray  # int
+    task_indices: np.ndarray  # int
+    known_solutions: np.ndarray  # bool
+
+    @staticmethod
+    def from_assignments_solutions(
+        assignments_solutions: List[AssignmentSolutions],
+        task_mapping: 'TaskMapping',
+        task_index: Optional[TaskIndex] = None,
+    ) -> 'AssignmentFrame':
+        task_index = task_index if task_index is not None else TaskIndex()
+        assignments, assignment_ids, worker_ids, statuses, created, submitted = [], [], [], [], [], []
+        solution_assignment_indices, task_indices, known_solutions = [], [], []
+        for assignment_index, (assignment, solutions) in enumerate(assignments_solutions):
+            assignments.append(assignment)
+            assignment_ids.append(assignment.id or '')
+            worker_ids.append(assignment.user_id or '')
+            statuses.append(assignment.status.value if assignment.status is not None else '')
+            created.append(_to_utc_naive(assignment.created))
+            submitted.append(_to_utc_naive(assignment.submitted))
+
+            tasks = get_solutions_tasks(assignment, solutions)
+            assert tasks is not None, f'solutions do not correspond to tasks of assignment {assignment.id}'
+            for task, (input_objects, _) in zip(tasks, solutions):
+                solution_assignment_indices.append(assignment_index)
+                task_indices.append(task_index.add(task_mapping.decoded_task_id(task, input_objects)))
+                known_solutions.append(bool(task.known_solutions))
+
+        return AssignmentFrame(
+            assignments=assignments,
+            task_index=task_index,
+            assignment_ids=np.array(assignment_ids, dtype=object),
+            worker_ids=np.array(worker_ids, dtype=object),
+            statuses=np.array(statuses, dtype=object),
+            created=np.array(created, dtype='datetime64[us]'),
+            submitted=np.array(submitted, dtype='datetime64[us]'),
+            solution_assignment_indices=np.array(solution_assignment_indices, dtype=np.int64),
+            task_indices=np.array(task_indices, dtype=np.int64),
+            known_solutions=np.array(known_solutions, dtype=bool),
+        )
+
+    def __len__(self) -> int:
+        return len(self.assignments)
+
+    def status_mask(self, statuses: Iterable[toloka.Assignment.Status]) -> np.ndarray:
+        return np.isin(self.statuses, [status.value for status in statuses])
+
+    def solutions_mask(
+        self,
+        statuses: Optional[Iterable[toloka.Assignment.Status]] = None,
+        with_control_tasks: bool = True,
+    ) -> np.ndarray:
+        mask = np.ones(len(self.task_indices), dtype=bool)
+        if statuses is not None:
+            mask &= self.status_mask(statuses)[self.solution_assignment_indices]
+        if not with_control_tasks:
+            mask &= ~self.known_solutions
+        return mask
+
+    def durations(self) -> np.ndarray:
+        return self.submitted - self.created
+
+    def task_attempts(
+        self,
+        statuses: Optional[Iterable[toloka.Assignment.Status]] = None,
+        with_control_tasks: bool = True,
+    ) -> np.ndarray:
+        task_indices = self.task_indices[self.solutions_mask(statuses, with_control_tasks)]
+        return np.bincount(task_indices, minlength=len(self.task_index))
+
+
+
+def _to_utc_naive(dt: Optional[datetime.datetime]) -> Optional[datetime.datetime]:
+    if dt is None or dt.tzinfo is None:
+        return dt
+    return dt.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+
 def iterate_assignment(
     assignment: toloka.Assignment,
     mapping: TaskMapping,
     with_control_tasks: bool = False,
 ) -> Iterable[Tuple[str, Objects, Objects]]:
     return (
-        (task.input_values[TASK_ID_FIELD], mapping.from_task(task), mapping.from_solution(solution))
+        (task.input_values[TASK_ID_FIELD], mapping.decode_task(task)[0], mapping.from_solution(solution))
         for task, solution in zip(assignment.tasks, assignment.solutions)
         if (with_control_tasks or not task.known_solutions)
     )
 
 
+# Tasks of assignment aligned with its solutions, or None if solutions do not correspond to tasks, i.e. for
+# assignments which are made up only to hold solutions.
+def get_solutions_tasks(
+    assignment: toloka.Assignment,
+    solutions: List[TaskSingleSolution],
+) -> Optional[List[toloka.Task]]:
+    tasks = assignment.tasks or []
+    if len(tasks) != len(solutions):
+        # control tasks are omitted from solutions
+        tasks = [task for task in tasks if not task.known_solutions]
+    return tasks if len(tasks) == len(solutions) else None
+
+
 def iterate_assignment_tasks(
     assignment: toloka.Assignment,
     mapping: TaskMapping,
     with_control_tasks: bool = True,
 ) -> Iterable[Tuple[str, Objects]]:
     return (
-        (task.input_values[TASK_ID_FIELD], mapping.from_task(task))
+        (task.input_values[TASK_ID_FIELD], mapping.decode_task(task)[0])
         for task in assignment.tasks
         if (with_control_tasks or not task.known_solutions)
     )
@@ -1,33 +1,51 @@
 import abc
+import asyncio
 from collections import defaultdict
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 import logging
 import threading
 from time import sleep
-from typing import List, Dict, Optional, Tuple, Any
+from typing import List, Dict, Optional, Tuple, Any, Iterable, Union
 
 from ipywidgets import Output
 import matplotlib.pyplot as plt
 from seaborn import heatmap
 
+import numpy as np
 import pandas as pd
 from IPython.display import display, clear_output, Image
 import toloka.client as toloka
 
-from .. import base, classification, classification_loop, evaluation, feedback_loop, mapping, task_spec as spec
+from .. import (
+    base,
+    classification,
+    classification_loop,
+    evaluation,
+    feedback_loop,
+    mapping,
+    scheduler,
+    task_spec as spec,
+    utils,
+)
 
 logger = logging.getLogger(__name__)
 
 METRICS_IMAGE_FILE = 'metrics.png'
 
 
-def get_durations(assignment_solutions: List[mapping.AssignmentSolutions]) -> List[timedelta]:
-    return [
-        (assignment.submitted - assignment.created) / len(assignment.tasks)
-        for assignment, _ in assignment_solutions
-        if assignment.status != toloka.Assignment.REJECTED
-    ]
+# overlaps of tasks, counted by not rejected assignments
+def get_overlaps(assignments_frame: mapping.AssignmentFrame, task_ids: Iterable[mapping.TaskID]) -> List[int]:
+    task_attempts = assignments_frame.task_attempts(statuses=[toloka.Assignment.ACCEPTED, toloka.Assignment.SUBMITTED])
+    task_index = assignments_frame.task_index
+    return [int(task_attempts[task_index.index(task_id)]) for task_id in task_ids if task_id in task_index]
+
+
+def get_durations(assignments_frame: mapping.AssignmentFrame) -> List[timedelta]:
+    tasks_counts = np.array([len(assignment.tasks) for assignment in assignments_frame.assignments], dtype=np.int64)
+    not_rejected = ~assignments_frame.status_mask([toloka.Assignment.REJECTED])
+    durations = assignments_frame.durations()[not_rejected] / tasks_counts[not_rejected]
+    return durations.astype('timedelta64[us]').tolist()
 
 
 @dataclass
@@ -57,12 +75,7 @@ def _collect_and_update_pool_metrics(
         status = result['request']['name'].split('_')[0]
         history[status].append(result['result'])
 
-    operation = toloka_client.get_analytics(
-        [toloka.analytics_request.CompletionPercentagePoolAnalytics(subject_id=pool_id)]
-    )
-    operation = toloka_client.wait_operation(operation)
-    completed = operation.details['value'][0]['result']['value']
-    return completed
+    return utils.get_pool_completed_percentage(toloka_client, pool_id)
 
 
 def _get_confusion_matrix(
@@ -102,6 +115,7 @@ def _collect_and_update_classification_metrics(
     aggregation_algorithm: classification.AggregationAlgorithm,
     history: Dict[str, List[int]],
     completed: List[int],
+    worker_weights_accumulator: Optional[evaluation.WorkerWeightsAccumulator] = None,
 ) -> Metrics:
     assignments_solutions = classification_loop.get_assignments_solutions(
         toloka_client,
@@ -110,12 +124,13 @@ def _collect_and_update_classification_metrics(
         [toloka.Assignment.ACCEPTED, toloka.Assignment.REJECTED, toloka.Assignment.SUBMITTED],
         with_control_tasks=True,
     )
+    assignments_frame = mapping.AssignmentFrame.from_assignments_solutions(assignments_solutions, task_mapping)
     not_rejected_assignments_solutions = [
         (assignment, solution)
         for assignment, solution in assignments_solutions
         if assignment.status != toloka.Assignment.REJECTED
     ]
-    durations = get_durations(assignments_solutions)
+    durations = get_durations(assignments_frame)
 
     task_id_to_label_confidence = classification_loop.calculate_label_probas(
         toloka_client,
@@ -124,11 +139,9 @@ def _collect_and_update_classification_metrics(
         aggregation_algorithm,
         assignments_solutions,
         pool_id,
+        worker_weights_accumulator=worker_weights_accumulator,
     )
-    task_id_to_current_overlap = evaluation.get_tasks_attempts(not_rejected_assignments_solutions, task_mapping)
-    overlaps = [
-        overlap for task_id, overlap in task_id_to_current_overlap.items() if task_id in task_id_to_label_confidence
-    ]
+    overlaps = get_overlaps(assignments_frame, task_id_to_label_confidence.keys())
     probas = [proba for _, proba in task_id_to_label_confidence.values()]
     completed.append(_collect_and_update_pool_metrics(toloka_client, pool_id, history))
     confusion_matrix = _get_confusion_matrix(task_mapping, not_rejected_assignments_solutions)
@@ -145,6 +158,7 @@ def _collect_and_update_markup_metrics(
     check_assignment_evaluation_strategy: evaluation.AssignmentAccuracyEvaluationStrategy,
     history: Dict[str, Dict[str, List[int]]],
     completed: Dict[str, List[int]],
+    check_worker_weights_accumulator: Optional[evaluation.WorkerWeightsAccumulator] = None,
 ) -> Tuple[Metrics, Metrics]:
 
     check_assignments = classification_loop.get_assignments_solutions(
@@ -155,7 +169,8 @@ def _collect_and_update_markup_metrics(
         with_control_tasks=True,
     )
 
-    check_durations = get_durations(check_assignments)
+    check_assignments_frame = mapping.AssignmentFrame.from_assignments_solutions(check_assignments, check_task_mapping)
+    check_durations = get_durations(check_assignments_frame)
 
     not_rejected_check_assignments_solutions = [
         assignment_solution
@@ -164,7 +179,9 @@ def _collect_and_update_markup_metrics(
     ]
 
     check_worker_weights = (
-        evaluation.calculate_worker_weights(check_assignments, check_assignment_evaluation_strategy)
+        evaluation.calculate_worker_weights(
+            check_assignments, check_assignment_evaluation_strategy, accumulator=check_worker_weights_accumulator
+        )
         if aggregation_algorithm == classification.AggregationAlgorithm.MAX_LIKELIHOOD
         else None
     )
@@ -176,15 +193,10 @@ def _collect_and_update_markup_metrics(
         aggregation_algorithm,
         check_assignments,
         check_pool_id,
+        worker_weights_accumulator=check_worker_weights_accumulator,
     )
 
-    check_overlaps = [
-        overlap
-        for task_id, overlap in evaluation.get_tasks_attempts(
-            not_rejected_check_assignments_solutions, check_task_mapping
-        ).items()
-        if task_id in check_task_id_to_label_confidence
-    ]
+    check_overlaps = get_overlaps(check_assignments_frame, check_task_id_to_label_confidence.keys())
     check_probas = [proba for _, proba in check_task_id_to_label_confidence.values()]
     check_confusion_matrix = _get_confusion_matrix(check_task_mapping, not_rejected_check_assignments_solutions)
 
@@ -195,7 +207,10 @@ def _collect_and_update_markup_metrics(
         [toloka.Assignment.ACCEPTED, toloka.Assignment.REJECTED, toloka.Assignment.SUBMITTED],
     )
 
-    markup_durations = get_durations(markup_assignments)
+    markup_assignments_frame = mapping.AssignmentFrame.from_assignments_solutions(
+        markup_assignments, markup_task_mapping
+    )
+    markup_durations = get_durations(markup_assignments_frame)
 
     markup_solution_id_to_evaluation = evaluation.collect_evaluations_from_check_assignments(
         assignments=list(toloka_client.get_assignments(status=toloka.Assignment.ACCEPTED, pool_id=check_pool_id)),
@@ -205,8 +220,7 @@ def _collect_and_update_markup_metrics(
         confidence_threshold=0.0,
         worker_weights=check_worker_weights,
     )  # TODO: it seems not important which confidence to use here
-    markup_task_id_to_attempts_count = evaluation.get_tasks_attempts(markup_assignments, markup_task_mapping)
-    markup_overlaps = list(markup_task_id_to_attempts_count.values())
+    markup_overlaps = markup_assignments_frame.task_attempts().tolist()
     markup_probas = [
         solution_evaluation.confidence for solution_evaluation in markup_solution_id_to_evaluation.values()
     ]
@@ -275,11 +289,18 @@ def _plot_confusion_matrix(ax, confusion_matrix: Optional[pd.DataFrame], pool_na
 
 @dataclass
 class MetricsPlotter:
+    """
+    Plots are redrawn periodically until stop event is set. With `threading.Event`, plotter is run in its own thread.
+    With `asyncio.Event`, plotter is run by awaiting `run_async` together with loop's `loop_async`: metrics are
+    collected and drawn in executor, and redraw period is awaited without blocking event loop.
+    """
+
     toloka_client: toloka.TolokaClient
-    stop_event: threading.Event
+    stop_event: Union[threading.Event, asyncio.Event]
     redraw_period_seconds: int
-    thread: threading.Thread = field(init=False)
+    thread: Optional[threading.Thread] = field(init=False, default=None)
     output: Any = field(init=False)
+    times: List[datetime] = field(init=False, default_factory=list)
 
     def __post_init__(self):
         self.plots_image_file_name = METRICS_IMAGE_FILE
@@ -287,14 +308,40 @@ class MetricsPlotter:
 
         self.output = Output()
         display(self.output)
-        self.thread = threading.Thread(target=self.plot)
-        self.thread.start()
+        if isinstance(self.stop_event, threading.Event):
+            self.thread = threading.Thread(target=self.run)
+            self.thread.start()
+
+    def run(self):
+        while True:
+            self.redraw()
+            if self.stop_event.is_set():
+                logger.debug('terminating metrics plotter')
+                return
+            sleep(self.redraw_period_seconds)
+
+    async def run_async(self):
+        while True:
+            await utils.run_blocking(self.redraw)
+            if self.stop_event.is_set():
+                logger.debug('terminating metrics plotter')
+                return
+            try:
+                await asyncio.wait_for(self.stop_event.wait(), self.redraw_period_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def redraw(self):
+        # metrics requests are made concurrently with loop requests, and they should not delay loop
+        with scheduler.priority(scheduler.Priority.METRICS):
+            self.plot()
+        self.post_plot()
 
     @abc.abstractmethod
     def plot(self):
         ...
 
-    def post_plot(self) -> bool:
+    def post_plot(self):
         plt.savefig(self.plots_image_file_name)
         plt.close()
 
@@ -304,15 +351,9 @@ class MetricsPlotter:
 
         logger.debug('metrics are updated')
 
-        if self.stop_event.is_set():
-            logger.debug('terminating metrics plotter')
-            return True
-
-        sleep(self.redraw_period_seconds)
-        return False
-
     def join(self, timeout: float):
-        self.thread.join(timeout=timeout)
+        if self.thread is not None:
+            self.thread.join(timeout=timeout)
 
 
 @dataclass
@@ -322,35 +363,32 @@ class ClassificationMetricsPlotter(MetricsPlotter):
     task_duration_hint: timedelta
     params: classification_loop.Params
     assignment_evaluation_strategy: evaluation.AssignmentAccuracyEvaluationStrategy
+    history: Dict[str, List[int]] = field(init=False, default_factory=lambda: defaultdict(list))
+    completed: List[int] = field(init=False, default_factory=list)
+    worker_weights_accumulator: evaluation.WorkerWeightsAccumulator = field(
+        init=False, default_factory=evaluation.WorkerWeightsAccumulator
+    )
 
     def plot(self):
-        history = defaultdict(list)
-        completed = []
-        times = []
-        aggregation_algorithm = self.params.aggregation_algorithm
-
-        while True:
-            metrics = _collect_and_update_classification_metrics(
-                self.toloka_client,
-                self.task_mapping,
-                self.pool_id,
-                self.assignment_evaluation_strategy,
-                aggregation_algorithm,
-                history,
-                completed,
-            )
-            times.append(datetime.now())
-            with plt.style.context({'axes.labelsize': 20}):
-                fig, ax = plt.subplots(2, 3, figsize=(30, 15))
-                _plot_timeline(ax[0][0], times, history)
-                _plot_completion_timeline(ax[0][1], times, completed)
-                _plot_time_distribution(ax[0][2], metrics.durations, self.task_duration_hint)
-                _plot_confidence_distribution(ax[1][0], metrics.probas)
-                _plot_attempts_distribution(ax[1][1], metrics.overlaps)
-                _plot_confusion_matrix(ax[1][2], metrics.confusion_matrix)
-            stopped = self.post_plot()
-            if stopped:
-                return
+        metrics = _collect_and_update_classification_metrics(
+            self.toloka_client,
+            self.task_mapping,
+            self.pool_id,
+            self.assignment_evaluation_strategy,
+            self.params.aggregation_algorithm,
+            self.history,
+            self.completed,
+            self.worker_weights_accumulator,
+        )
+        self.times.append(datetime.now())
+        with plt.style.context({'axes.labelsize': 20}):
+            fig, ax = plt.subplots(2, 3, figsize=(30, 15))
+            _plot_timeline(ax[0][0], self.times, self.history)
+            _plot_completion_timeline(ax[0][1], self.times, self.completed)
+            _plot_time_distribution(ax[0][2], metrics.durations, self.task_duration_hint)
+            _plot_confidence_distribution(ax[1][0], metrics.probas)
+            _plot_attempts_distribution(ax[1][1], metrics.overlaps)
+            _plot_confusion_matrix(ax[1][2], metrics.confusion_matrix)
 
 
 @dataclass
@@ -361,48 +399,47 @@ class AnnotationMetricsPlotter(MetricsPlotter):
     check_task_duration_hint: timedelta
     markup_task_duration_hint: timedelta
     evaluation: feedback_loop.Evaluation
+    history: Dict[str, Dict[str, List[int]]] = field(
+        init=False, default_factory=lambda: defaultdict(lambda: defaultdict(list))
+    )
+    completed: Dict[str, List[int]] = field(init=False, default_factory=lambda: defaultdict(list))
+    check_worker_weights_accumulator: evaluation.WorkerWeightsAccumulator = field(
+        init=False, default_factory=evaluation.WorkerWeightsAccumulator
+    )
 
     def plot(self):
-        history = defaultdict(lambda: defaultdict(list))
-        completed = defaultdict(list)
-        times = []
         assert isinstance(self.task_spec.function, base.AnnotationFunction)
         check_task_mapping, markup_task_mapping = self.task_spec.check.task_mapping, self.task_spec.task_mapping
         check_assignment_evaluation_strategy = evaluation.ControlTasksAssignmentAccuracyEvaluationStrategy(
             check_task_mapping
         )
-        aggregation_algorithm = self.evaluation.aggregation_algorithm
 
-        while True:
-            markup_metrics, check_metrics = _collect_and_update_markup_metrics(
-                self.toloka_client,
-                check_task_mapping,
-                markup_task_mapping,
-                self.check_pool_id,
-                self.markup_pool_id,
-                aggregation_algorithm,
-                check_assignment_evaluation_strategy,
-                history,
-                completed,
-            )
-
-            times.append(datetime.now())
-            fig, ax = plt.subplots(4, 3, figsize=(30, 45))
-            for i, (pool_name, metrics, hint) in enumerate(
-                [
-                    ('annotation', markup_metrics, self.markup_task_duration_hint),
-                    ('check', check_metrics, self.check_task_duration_hint),
-                ]
-            ):
-                _plot_timeline(ax[i][0], times, history[pool_name], pool_name=pool_name)
-                _plot_completion_timeline(ax[i][1], times, completed[pool_name], pool_name=pool_name)
-                _plot_time_distribution(ax[i][2], metrics.durations, hint, pool_name=pool_name)
-                _plot_attempts_distribution(ax[2][i + 1], metrics.overlaps, pool_name=pool_name)
-                if pool_name == 'annotation':
-                    _plot_confidence_distribution(ax[2][0], metrics.probas, pool_name=pool_name)
-
-            _plot_confusion_matrix(ax[3][1], check_metrics.confusion_matrix)
-
-            stopped = self.post_plot()
-            if stopped:
-                return
+        markup_metrics, check_metrics = _collect_and_update_markup_metrics(
+            self.toloka_client,
+            check_task_mapping,
+            markup_task_mapping,
+            self.check_pool_id,
+            self.markup_pool_id,
+            self.evaluation.aggregation_algorithm,
+            check_assignment_evaluation_strategy,
+            self.history,
+            self.completed,
+            self.check_worker_weights_accumulator,
+        )
+
+        self.times.append(datetime.now())
+        fig, ax = plt.subplots(4, 3, figsize=(30, 45))
+        for i, (pool_name, metrics, hint) in enumerate(
+            [
+                ('annotation', markup_metrics, self.markup_task_duration_hint),
+                ('check', check_metrics, self.check_task_duration_hint),
+            ]
+        ):
+            _plot_timeline(ax[i][0], self.times, self.history[pool_name], pool_name=pool_name)
+            _plot_completion_timeline(ax[i][1], self.times, self.completed[pool_name], pool_name=pool_name)
+            _plot_time_distribution(ax[i][2], metrics.durations, hint, pool_name=pool_name)
+            _plot_attempts_distribution(ax[2][i + 1], metrics.overlaps, pool_name=pool_name)
+            if pool_name == 'annotation':
+                _plot_confidence_distribution(ax[2][0], metrics.probas, pool_name=pool_name)
+
+        _plot_confusion_matrix(ax[3][1], check_metrics.confusion_matrix)
@@ -173,7 +173,7 @@ class AssignmentSet:
         for assignment, _ in self.assignments:
             assignment_duration = assignment.submitted - assignment.created
             assignment_duration_hint = sum(
-                [task_duration_function(task_mapping.from_task(task)) for task in assignment.tasks],
+                [task_duration_function(task_mapping.decode_task(task)[0]) for task in assignment.tasks],
                 start=datetime.timedelta(seconds=0),
             )
             if fast_submits_predicate.check(
@@ -0,0 +1,162 @@
+from contextlib import contextmanager
+import enum
+import heapq
+import itertools
+import threading
+import time
+from typing import Iterator, Optional, Tuple
+
+import toloka.client as toloka
+from toloka.client.exceptions import raise_on_api_error
+
+
+class Priority(enum.IntEnum):
+    # lower value is served first
+    LOOP = 0
+    METRICS = 1
+
+
+_local = threading.local()
+
+
+def get_priority() -> Priority:
+    return getattr(_local, 'priority', Priority.LOOP)
+
+
+# Priority is set per thread, requests of threads without explicit priority are loop-critical.
+@contextmanager
+def priority(value: Priority) -> Iterator[None]:
+    previous = get_priority()
+    _local.priority = value
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+class RetryBudgetExceededError(Exception):
+    pass
+
+
+class RequestScheduler:
+    """
+    Scheduler of Toloka API requests of a client. Loops, metrics plotter, media and bonus requests are made
+    concurrently through the same client, and Toloka rate limits are per requester, so uncoordinated traffic pushes
+    loop-critical requests into rate limit backoff.
+
+    Requests are admitted by token bucket, which allows `rate` requests per second with bursts up to `capacity`
+    requests. Default rate is conservative, so requests of the client stay within Toloka rate limits; specify your
+    requester's quota to use it fully. When requests wait for tokens, they are served by priority of calling thread,
+    and in order of arrival within same priority.
+
+    Retries of failed requests are limited by budget shared by all requests: each request, but not its retry, adds
+    `retry_ratio` of retry to the budget, and budget is also refilled by `min_retries_per_second`, up to
+    `max_retries`. Failed request waits for budget to be refilled, so retry storms do not starve other requests. If
+    budget can't be refilled, retry is not made.
+    """
+
+    rate: float
+    capacity: float
+    retry_ratio: float
+    min_retries_per_second: float
+    max_retries: float
+
+    def __init__(
+        self,
+        rate: float = 10.0,
+        capacity: Optional[float] = None,
+        retry_ratio: float = 0.2,
+        min_retries_per_second: float = 1.0,
+        max_retries: float = 100.0,
+    ):
+        assert rate > 0
+        self.rate = rate
+        # capacity defaults to one second of requests
+        self.capacity = capacity or max(rate, 1.0)
+        assert self.capacity >= 1
+        self.retry_ratio = retry_ratio
+        self.min_retries_per_second = min_retries_per_second
+        self.max_retries = max_retries
+
+        self.condition = threading.Condition()
+        self.tokens = self.capacity
+        self.retries = max_retries
+        self.updated = time.monotonic()
+        self.waiters = []
+        self.counter = itertools.count()
+
+    def refill(self):
+        now = time.monotonic()
+        elapsed = now - self.updated
+        self.updated = now
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.retries = min(self.max_retries, self.retries + elapsed * self.min_retries_per_second)
+
+    def acquire(self, retry: bool = False):
+        ticket: Tuple[int, int] = (get_priority(), next(self.counter))
+        with self.condition:
+            heapq.heappush(self.waiters, ticket)
+            while True:
+                self.refill()
+                first = self.waiters[0] == ticket
+                if first and self.tokens >= 1:
+                    heapq.heappop(self.waiters)
+                    self.tokens -= 1
+                    if not retry:
+                        self.retries = min(self.max_retries, self.retries + self.retry_ratio)
+                    # next waiter becomes first, and retries may wait for budget
+                    self.condition.notify_all()
+                    return
+                timeout: Optional[float] = (1 - self.tokens) / self.rate if first else None
+                self.condition.wait(timeout)
+
+    # Waits for retry budget, returns False if budget can't be refilled.
+    def withdraw_retry(self) -> bool:
+        with self.condition:
+            while True:
+                self.refill()
+                if self.retries >= 1:
+                    self.retries -= 1
+                    return True
+                if self.min_retries_per_second <= 0:
+                    return False
+                self.condition.wait((1 - self.retries) / self.min_retries_per_second)
+
+
+class ScheduledTolokaClient(toloka.TolokaClient):
+    """
+    TolokaClient, each request attempt of which, including retries, is admitted by RequestScheduler. If retry budget
+    can't be refilled, original API error is raised without retry, so callers' backoff still applies.
+
+    Client has its own scheduler with default rate, unless scheduler is passed, i.e. to share it between clients of
+    the same requester.
+    """
+
+    scheduler: RequestScheduler
+
+    def __init__(self, *args, scheduler: Optional[RequestScheduler] = None, **kwargs):
+        self.scheduler = scheduler if scheduler is not None else RequestScheduler()
+        super(ScheduledTolokaClient, self).__init__(*args, **kwargs)
+
+    def _do_request_with_retries(self, method, path, **kwargs):
+        attempts = itertools.count()
+
+        @self.retrying.wraps
+        def wrapped(method, path, **kwargs):
+            self.scheduler.acquire(retry=next(attempts) > 0)
+            try:
+                response = self._session.request(method, path, **kwargs)
+                raise_on_api_error(response)
+            except self.EXCEPTIONS_TO_RETRY as e:
+                if not self.scheduler.withdraw_retry():
+                    # is not retried by self.retrying
+                    raise RetryBudgetExceededError(
+                        f'{method.upper()} {path} is failed, retry budget is exceeded'
+                    ) from e
+                raise
+            return response
+
+        try:
+            return wrapped(method, path, **kwargs)
+        except RetryBudgetExceededError as e:
+            raise e.__cause__
@@ -1,10 +1,15 @@
+import asyncio
+from concurrent.futures import Executor
 import decimal
 import json
-from functools import reduce
+from functools import partial, reduce
+import itertools
 import logging
+from multiprocessing.pool import ThreadPool
+import random
 import threading
 import time
-from typing import List, Optional
+from typing import Any, Awaitable, Callable, List, Optional, Sequence, Tuple, TypeVar
 
 import toloka.client as toloka
 
@@ -16,18 +21,116 @@ def get_pool_link(pool: toloka.Pool, client: toloka.TolokaClient) -> str:
     return f'{url_prefix}/requester/project/{pool.project_id}/pool/{pool.id}'
 
 
+class PoolCloseBackoff:
+    """
+    Delays between pool state checks while waiting for pool to close. Delays grow exponentially with jitter from
+    `min_interval_seconds` to `max_interval_seconds`, so small pools are checked often at the start, and big pools are
+    not polled needlessly.
+
+    Delay is also bounded by predicted time of pool completion, which is extrapolated from pool completion percentage
+    growth since the first check. Completion percentage is an analytics request, so it is requested only when delays
+    reach `max_interval_seconds`, before that pool is checked often enough anyway.
+    """
+
+    min_interval_seconds: float
+    max_interval_seconds: float
+    factor: float
+
+    def __init__(self, min_interval_seconds: float = 1.0, max_interval_seconds: float = 60.0, factor: float = 2.0):
+        assert 0 < min_interval_seconds <= max_interval_seconds and factor >= 1
+        self.min_interval_seconds = min_interval_seconds
+        self.max_interval_seconds = max_interval_seconds
+        self.factor = factor
+        self.interval_seconds = min_interval_seconds
+        self.first_completion: Optional[Tuple[float, float]] = None
+
+    def predict_seconds_to_completion(self, completed_percentage: float, now: float) -> Optional[float]:
+        if self.first_completion is None:
+            self.first_completion = (now, completed_percentage)
+            return None
+        first_time, first_percentage = self.first_completion
+        if completed_percentage <= first_percentage or now <= first_time:
+            return None
+        speed = (completed_percentage - first_percentage) / (now - first_time)
+        return max(0.0, 100.0 - completed_percentage) / speed
+
+    def forecast_is_needed(self) -> bool:
+        return self.interval_seconds >= self.max_interval_seconds
+
+    def next_delay(self, completed_percentage: Optional[float] = None) -> float:
+        delay = random.uniform(self.interval_seconds / 2, self.interval_seconds)
+        self.interval_seconds = min(self.interval_seconds * self.factor, self.max_interval_seconds)
+        if completed_percentage is not None:
+            seconds_to_completion = self.predict_seconds_to_completion(completed_percentage, time.monotonic())
+            if seconds_to_completion is not None:
+                delay = min(delay, seconds_to_completion)
+        return max(delay, self.min_interval_seconds)
+
+
+def get_pool_completed_percentage(client: toloka.TolokaClient, pool_id: str) -> float:
+    operation = client.get_analytics([toloka.analytics_request.CompletionPercentagePoolAnalytics(subject_id=pool_id)])
+    operation = client.wait_operation(operation)
+    return operation.details['value'][0]['result']['value']
+
+
+# Pool is checked with increasing intervals up to `pull_interval_seconds`, see PoolCloseBackoff. Waiting can be
+# interrupted by setting `wake_up` event, i.e. when it is known that pool is closed.
 def wait_pool_for_close(
     client: toloka.TolokaClient,
     pool_id: str,
     pull_interval_seconds: float = 60.0,
+    min_pull_interval_seconds: float = 1.0,
+    wake_up: Optional[threading.Event] = None,
+    forecast_completion: bool = True,
 ):
+    backoff = PoolCloseBackoff(min_pull_interval_seconds, pull_interval_seconds)
     pool = client.get_pool(pool_id)
     while not pool.is_closed():
-        logger.debug(f'waiting pool {get_pool_link(pool, client)} for close...')
-        time.sleep(pull_interval_seconds)
+        completed_percentage = (
+            get_pool_completed_percentage(client, pool_id)
+            if forecast_completion and backoff.forecast_is_needed()
+            else None
+        )
+        delay = backoff.next_delay(completed_percentage)
+        logger.debug(f'waiting pool {get_pool_link(pool, client)} for close, next check in {delay:.1f} seconds...')
+        if wake_up is None:
+            time.sleep(delay)
+        elif wake_up.wait(delay):
+            wake_up.clear()
         pool = client.get_pool(pool.id)
 
 
+async def wait_pool_for_close_async(
+    client: 'AsyncTolokaClient',
+    pool_id: str,
+    pull_interval_seconds: float = 60.0,
+    min_pull_interval_seconds: float = 1.0,
+    wake_up: Optional[asyncio.Event] = None,
+    forecast_completion: bool = True,
+):
+    backoff = PoolCloseBackoff(min_pull_interval_seconds, pull_interval_seconds)
+    pool = await client.get_pool(pool_id)
+    while not pool.is_closed():
+        completed_percentage = (
+            await run_blocking(get_pool_completed_percentage, client.client, pool_id, executor=client.executor)
+            if forecast_completion and backoff.forecast_is_needed()
+            else None
+        )
+        delay = backoff.next_delay(completed_percentage)
+        logger.debug(
+            f'waiting pool {get_pool_link(pool, client.client)} for close, next check in {delay:.1f} seconds...'
+        )
+        if wake_up is None:
+            await asyncio.sleep(delay)
+        else:
+            try:
+                await asyncio.wait_for(wake_up.wait(), delay)
+                wake_up.clear()
+            except asyncio.TimeoutError:
+                pass
+        pool = await client.get_pool(pool.id)
+
+
 # 'reduce' is used to avoid redundant AND/OR's with only one element
 def and_(filters: List[Optional[toloka.filter.FilterCondition]]) -> Optional[toloka.filter.FilterCondition]:
     filters = [f for f in filters if f is not None]
@@ -49,3 +152,87 @@ class DecimalEncoder(json.JSONEncoder):
         if isinstance(o, decimal.Decimal):
             return float(o)
         return super(DecimalEncoder, self).default(o)
+
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+def call_with_retries(
+    func: Callable[[], R],
+    retries: int = 5,
+    backoff_seconds: float = 1.0,
+) -> R:
+    # Toloka API rate limits are per requester, so concurrent callers can exceed them even with client retries
+    for attempt in itertools.count():
+        try:
+            return func()
+        except toloka.exceptions.TooManyRequestsApiError:
+            if attempt >= retries:
+                raise
+            delay = backoff_seconds * 2**attempt * random.uniform(1.0, 1.5)
+            logger.debug(f'rate limit is exceeded, retry #{attempt + 1} in {delay:.1f} seconds')
+            time.sleep(delay)
+
+
+def map_concurrently(
+    func: Callable[[T], R],
+    items: Sequence[T],
+    workers: int = 16,
+    batch_size: int = 100,
+    description: str = 'items',
+    retries: int = 5,
+    backoff_seconds: float = 1.0,
+) -> List[R]:
+    """
+    Applies func to items, preserving items order in results, for example to make per-object Toloka API calls for
+    which no bulk methods exist. Items are split into batches, which are processed by bounded pool of threads, and
+    progress is logged after each batch. Calls are retried in case of exceeded rate limits.
+
+    Single batch is processed in calling thread.
+    """
+    batches = [items[slice(i, i + batch_size)] for i in range(0, len(items), batch_size)]
+
+    def process(batch: Sequence[T]) -> List[R]:
+        return [call_with_retries(lambda: func(item), retries, backoff_seconds) for item in batch]
+
+    if len(batches) <= 1 or workers <= 1:
+        return [result for batch in batches for result in process(batch)]
+
+    results = []
+    with ThreadPool(min(workers, len(batches))) as pool:
+        for batch_results in pool.imap(process, batches):
+            results += batch_results
+            logger.debug(f'{description}: {len(results)}/{len(items)} are processed')
+    return results
+
+
+async def run_blocking(func: Callable[..., R], *args, executor: Optional[Executor] = None, **kwargs) -> R:
+    return await asyncio.get_running_loop().run_in_executor(executor, partial(func, *args, **kwargs))
+
+
+class AsyncTolokaClient:
+    """
+    Asyncio adapter for blocking TolokaClient. Each client method call is run in executor, default one if not
+    specified, and returns awaitable, so independent calls overlap and wall-clock time of awaiting them together is
+    time of the longest call. Non-callable client attributes are returned as is.
+
+    Adapter works with any client-like object, i.e. with TolokaClient test stubs.
+    """
+
+    client: toloka.TolokaClient
+    executor: Optional[Executor]
+
+    def __init__(self, client: toloka.TolokaClient, executor: Optional[Executor] = None):
+        self.client = client
+        self.executor = executor
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self.client, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs) -> Awaitable:
+            return run_blocking(attr, *args, executor=self.executor, **kwargs)
+
+        return call
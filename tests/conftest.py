@@ -0,0 +1,10 @@
+import pytest
+
+from crowdom import mapping
+
+
+# stubs reuse Toloka task IDs across tests for different tasks, which never happens with real Toloka
+@pytest.fixture(autouse=True)
+def clear_decoded_task_cache():
+    mapping.decoded_task_cache.clear()
+    yield
@@ -884,13 +884,13 @@ def test_integration(shuffle, mock_datetime):  # noqa
                 ),
             ),
             (
-                'patch_assignment',
+                'set_user_restriction',
                 (
-                    'markup assignment 0',
-                    toloka.assignment.AssignmentPatch(
-                        status=toloka.Assignment.REJECTED,
-                        public_comment='Check the tasks with numbers: 1, 3, 4. Learn more about tasks acceptance and filing '
-                        'appeals in the project instructions.',
+                    toloka.user_restriction.PoolUserRestriction(
+                        private_comment='Control tasks: [0, 1) done correctly',
+                        pool_id='markup pool',
+                        user_id='markup-1',
+                        will_expire=assignment_start + datetime.timedelta(minutes=1) + datetime.timedelta(hours=8),
                     ),
                 ),
             ),
@@ -898,20 +898,20 @@ def test_integration(shuffle, mock_datetime):  # noqa
                 'set_user_restriction',
                 (
                     toloka.user_restriction.PoolUserRestriction(
-                        private_comment='Control tasks: [0, 1) done correctly',
+                        private_comment='Control tasks: [1, 2) done correctly',
                         pool_id='markup pool',
-                        user_id='markup-1',
-                        will_expire=assignment_start + datetime.timedelta(minutes=1) + datetime.timedelta(hours=8),
+                        user_id='markup-3',
+                        will_expire=assignment_start + datetime.timedelta(minutes=1) + datetime.timedelta(hours=1),
                     ),
                 ),
             ),
             (
                 'patch_assignment',
                 (
-                    'markup assignment 1',
+                    'markup assignment 0',
                     toloka.assignment.AssignmentPatch(
                         status=toloka.Assignment.REJECTED,
-                        public_comment='Check the tasks with numbers: 1, 2, 3, 4. Learn more about tasks acceptance and filing '
+                        public_comment='Check the tasks with numbers: 1, 3, 4. Learn more about tasks acceptance and filing '
                         'appeals in the project instructions.',
                     ),
                 ),
@@ -919,19 +919,19 @@ def test_integration(shuffle, mock_datetime):  # noqa
             (
                 'patch_assignment',
                 (
-                    'markup assignment 2',
-                    toloka.assignment.AssignmentPatch(status=toloka.Assignment.ACCEPTED, public_comment=''),
+                    'markup assignment 1',
+                    toloka.assignment.AssignmentPatch(
+                        status=toloka.Assignment.REJECTED,
+                        public_comment='Check the tasks with numbers: 1, 2, 3, 4. Learn more about tasks acceptance and filing '
+                        'appeals in the project instructions.',
+                    ),
                 ),
             ),
             (
-                'set_user_restriction',
+                'patch_assignment',
                 (
-                    toloka.user_restriction.PoolUserRestriction(
-                        private_comment='Control tasks: [1, 2) done correctly',
-                        pool_id='markup pool',
-                        user_id='markup-3',
-                        will_expire=assignment_start + datetime.timedelta(minutes=1) + datetime.timedelta(hours=1),
-                    ),
+                    'markup assignment 2',
+                    toloka.assignment.AssignmentPatch(status=toloka.Assignment.ACCEPTED, public_comment=''),
                 ),
             ),
             (
@@ -1007,10 +1007,14 @@ def test_integration(shuffle, mock_datetime):  # noqa
                 ),
             ),
             (
-                'patch_assignment',
+                'set_user_restriction',
                 (
-                    'markup assignment 4',
-                    toloka.assignment.AssignmentPatch(status=toloka.Assignment.ACCEPTED, public_comment=''),
+                    toloka.user_restriction.PoolUserRestriction(
+                        private_comment='Control tasks: [0, 1) done correctly',
+                        pool_id='markup pool',
+                        user_id='markup-5',
+                        will_expire=assignment_start + datetime.timedelta(minutes=1) + datetime.timedelta(hours=8),
+                    ),
                 ),
             ),
             (
@@ -1019,11 +1023,18 @@ def test_integration(shuffle, mock_datetime):  # noqa
                     toloka.user_restriction.PoolUserRestriction(
                         private_comment='Control tasks: [0, 1) done correctly',
                         pool_id='markup pool',
-                        user_id='markup-5',
+                        user_id='markup-6',
                         will_expire=assignment_start + datetime.timedelta(minutes=1) + datetime.timedelta(hours=8),
                     ),
                 ),
             ),
+            (
+                'patch_assignment',
+                (
+                    'markup assignment 4',
+                    toloka.assignment.AssignmentPatch(status=toloka.Assignment.ACCEPTED, public_comment=''),
+                ),
+            ),
             (
                 'patch_assignment',
                 (
@@ -1035,17 +1046,6 @@ def test_integration(shuffle, mock_datetime):  # noqa
                     ),
                 ),
             ),
-            (
-                'set_user_restriction',
-                (
-                    toloka.user_restriction.PoolUserRestriction(
-                        private_comment='Control tasks: [0, 1) done correctly',
-                        pool_id='markup pool',
-                        user_id='markup-6',
-                        will_expire=assignment_start + datetime.timedelta(minutes=1) + datetime.timedelta(hours=8),
-                    ),
-                ),
-            ),
             (
                 'patch_assignment',
                 (
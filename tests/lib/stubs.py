@@ -158,8 +158,12 @@ class TolokaClientIntegrationStub(TolokaClientCallRecorderStub):
         self.tasks += tasks
         super(TolokaClientIntegrationStub, self).create_tasks(tasks, *args, **kwargs)
 
-    def get_tasks(self, pool_id: str) -> List[toloka.Task]:
-        return [task for task in self.tasks if task.pool_id == pool_id]
+    def get_tasks(self, pool_id: str, created_gte: Optional[datetime] = None) -> List[toloka.Task]:
+        return [
+            task
+            for task in self.tasks
+            if task.pool_id == pool_id and (created_gte is None or task.created >= created_gte)
+        ]
 
 
 class Boto3SessionStub:
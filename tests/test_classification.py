@@ -1,5 +1,10 @@
 from collections import defaultdict
+from typing import Tuple
 
+import crowdkit.aggregation
+import numpy as np
+import pandas as pd
+import pytest
 from pytest import approx
 import toloka.client as toloka
 
@@ -99,11 +104,26 @@ def test_label_prediction_with_different_weights():
     assert actual == expected
 
 
-def test_combined_class_label_prediction():
+def test_label_prediction_with_high_overlap():
+    cat, dog, crow = lib.ImageClass.possible_instances()
+
+    # product of answers probabilities underflows, but label probas are still calculated
+    actual = classification.predict_labels_probas(
+        labels=[[(dog, bob), (cat, john)] * 500 + [(cat, alice)]],
+        aggregation_algorithm=classification.AggregationAlgorithm.MAX_LIKELIHOOD,
+        task_mapping=lib.image_classification_mapping,
+        worker_weights={bob.id: 0.6, alice.id: 0.9, john.id: 0.6},
+    )
+    assert actual == [{cat: approx(18 / 19), dog: approx(1 / 19), crow: approx(0, abs=1e-100)}]
+
+
+@pytest.mark.parametrize('workers, use_processes', [(1, False), (4, False), (4, True)])
+def test_combined_class_label_prediction(workers: int, use_processes: bool):
     dictor_same, dictor_different, dictor_other, noise_yes, noise_no = lib.Answer.possible_instances()
 
     expected = [
         {dictor_different: approx(3 / 19), dictor_other: approx(4 / 19), dictor_same: approx(12 / 19)},
+        None,
         {noise_no: approx(0.4), noise_yes: approx(0.6)},
     ]
     actual = classification.predict_labels_probas(
@@ -113,6 +133,7 @@ def test_combined_class_label_prediction():
                 (dictor_other, john),
                 (dictor_same, alice),
             ],
+            [],
             [
                 (noise_yes, bob),
                 (noise_no, john),
@@ -122,9 +143,96 @@ def test_combined_class_label_prediction():
         aggregation_algorithm=classification.AggregationAlgorithm.MAX_LIKELIHOOD,
         task_mapping=lib.question_answer_mapping,
         worker_weights={bob.id: 0.1, alice.id: 0.9, john.id: 0.4},
+        workers=workers,
+        use_processes=use_processes,
     )
     assert actual == expected
 
+    with pytest.raises(AssertionError, match='Found mixed-class output labels'):
+        classification.predict_labels_probas(
+            labels=[[(dictor_same, bob), (noise_yes, alice)]],
+            aggregation_algorithm=classification.AggregationAlgorithm.MAX_LIKELIHOOD,
+            task_mapping=lib.question_answer_mapping,
+            worker_weights={bob.id: 0.1, alice.id: 0.9, john.id: 0.4},
+            workers=workers,
+            use_processes=use_processes,
+        )
+
+
+def test_native_aggregation():
+    # crowd-kit is reference implementation; labels are strings here, because Class labels are not handled correctly
+    # by pandas factorization in some pandas versions
+    labels = [
+        [('a', bob), ('a', alice), ('b', john)],
+        [],
+        [('b', bob), ('c', alice), ('b', john), ('b', mary)],
+        [('c', bob), ('a', mary)],
+        [('a', john), ('a', alice), ('a', mary)],
+    ]
+    data = classification.aggregation.EncodedLabels.encode(labels)
+    assert data.task_indices.tolist() == [0, 2, 3, 4]
+    assert data.label_values == ['a', 'b', 'c']
+
+    df = pd.DataFrame(
+        [
+            {'task': task_idx, 'worker': worker.id, 'label': label}
+            for task_idx, task_labels in enumerate(labels)
+            for label, worker in task_labels
+        ]
+    )
+    for native, reference in [
+        (classification.aggregation.MajorityVote(), crowdkit.aggregation.MajorityVote()),
+        (classification.aggregation.DawidSkene(n_iter=10), crowdkit.aggregation.DawidSkene(n_iter=10)),
+        (classification.aggregation.DawidSkene(n_iter=100, tol=0.0), crowdkit.aggregation.DawidSkene(100, 0.0)),
+    ]:
+        expected = reference.fit_predict_proba(df).sort_index()
+        assert list(expected.columns) == data.label_values
+        assert native.fit_predict_proba(data) == approx(expected.values)
+
+
+@pytest.mark.parametrize('skills, overlap, warm_started', [((0.6, 0.95), 5, True), ((0.3, 0.5), 3, False)])
+def test_dawid_skene_warm_start(skills: Tuple[float, float], overlap: int, warm_started: bool):
+    rng = np.random.default_rng(1)
+    workers = [worker.Human(toloka.Assignment(user_id=f'worker-{i}')) for i in range(10)]
+    workers_skills = rng.uniform(*skills, len(workers))
+    labels = []
+    for true_label in rng.integers(0, 3, 200):
+        task_labels = []
+        for w in rng.choice(len(workers), overlap, replace=False):
+            label = true_label if rng.random() < workers_skills[w] else rng.integers(0, 3)
+            task_labels.append((f'label-{label}', workers[w]))
+        labels.append(task_labels)
+    # on previous iteration, last tasks had less labels
+    previous_labels = [task_labels[:-1] if i >= 190 else task_labels for i, task_labels in enumerate(labels)]
+    data = classification.aggregation.EncodedLabels.encode(labels)
+
+    ds = classification.warm_start_dawid_skene
+    _, previous_model = ds.fit(classification.aggregation.EncodedLabels.encode(previous_labels))
+    cold_probas, cold_model = ds.fit(data)
+    warm_probas, warm_model = ds.fit(data, previous_model)
+
+    # noisy labels have many local optima, so warm start diverges, and EM is re-initialized from cold start
+    assert warm_model.warm_started == warm_started
+    if warm_started:
+        assert warm_model.iterations < cold_model.iterations
+    assert (warm_probas.argmax(axis=1) == cold_probas.argmax(axis=1)).all()
+    assert warm_probas == approx(cold_probas, abs=10 * ds.probas_tol)
+
+
+def test_aggregation_state():
+    cat, dog = lib.cat, lib.dog
+    labels = [[(cat, bob), (cat, alice), (dog, john)], [(dog, bob), (dog, mary)]]
+    state = classification.AggregationState()
+    for _ in range(2):
+        actual = classification.predict_labels_probas(
+            labels=labels,
+            aggregation_algorithm=classification.AggregationAlgorithm.DAWID_SKENE,
+            task_mapping=lib.image_classification_mapping,
+            state=state,
+        )
+        assert [classification.get_most_probable_label(probas)[0] for probas in actual] == [cat, dog]
+    assert list(state.dawid_skene) == [(cat, dog)]
+
 
 def test_most_probable_label():
     cat, dog, crow = lib.cat, lib.dog, lib.crow
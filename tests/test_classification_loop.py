@@ -1,11 +1,15 @@
+import asyncio
 import datetime
 import itertools
-from typing import List, Union, Iterable, Dict, Tuple
+from typing import List, Optional, Union, Iterable, Dict, Tuple
 
+from mock import patch
+import pytest
 from pytest import approx
 import toloka.client as toloka
 
 from crowdom import (
+    base,
     classification,
     classification_loop,
     control,
@@ -524,10 +528,6 @@ def test_loop_e2e():
                 ),
             ),
         ),
-        (
-            'patch_assignment',
-            ('0_john', toloka.assignment.AssignmentPatch(status=toloka.Assignment.ACCEPTED, public_comment='')),
-        ),
         (
             'set_user_restriction',
             (
@@ -539,17 +539,6 @@ def test_loop_e2e():
                 ),
             ),
         ),
-        (
-            'patch_assignment',
-            (
-                '1_bob',
-                toloka.assignment.AssignmentPatch(
-                    status=toloka.Assignment.REJECTED,
-                    public_comment='Check the tasks with numbers: 1, 4. Learn more about tasks acceptance and filing '
-                    'appeals in the project instructions.',
-                ),
-            ),
-        ),
         (
             'set_user_restriction',
             (
@@ -561,25 +550,30 @@ def test_loop_e2e():
                 ),
             ),
         ),
+        # bob's restriction for assignment 3_bob expires earlier than the one above, so it is not issued
+        (
+            'patch_assignment',
+            ('0_john', toloka.assignment.AssignmentPatch(status=toloka.Assignment.ACCEPTED, public_comment='')),
+        ),
         (
             'patch_assignment',
             (
-                '2_mary',
+                '1_bob',
                 toloka.assignment.AssignmentPatch(
                     status=toloka.Assignment.REJECTED,
-                    public_comment='Check the tasks with numbers: 3, 4. Learn more about tasks acceptance and filing '
+                    public_comment='Check the tasks with numbers: 1, 4. Learn more about tasks acceptance and filing '
                     'appeals in the project instructions.',
                 ),
             ),
         ),
         (
-            'set_user_restriction',
+            'patch_assignment',
             (
-                toloka.user_restriction.PoolUserRestriction(
-                    private_comment='Control tasks: [0, 1) done correctly',
-                    user_id='bob',
-                    pool_id=pool_id,
-                    will_expire=assignment_start + datetime.timedelta(seconds=20) + datetime.timedelta(hours=8),
+                '2_mary',
+                toloka.assignment.AssignmentPatch(
+                    status=toloka.Assignment.REJECTED,
+                    public_comment='Check the tasks with numbers: 3, 4. Learn more about tasks acceptance and filing '
+                    'appeals in the project instructions.',
                 ),
             ),
         ),
@@ -615,15 +609,6 @@ def test_loop_e2e():
                 ),
             ),
         ),
-        (
-            'patch_assignment',
-            (
-                '6_martha',
-                toloka.assignment.AssignmentPatch(
-                    status=toloka.Assignment.REJECTED, public_comment='Too few correct solutions'
-                ),
-            ),
-        ),
         (
             'set_user_restriction',
             (
@@ -637,7 +622,12 @@ def test_loop_e2e():
         ),
         (
             'patch_assignment',
-            ('7_fedor', toloka.assignment.AssignmentPatch(status=toloka.Assignment.ACCEPTED, public_comment='')),
+            (
+                '6_martha',
+                toloka.assignment.AssignmentPatch(
+                    status=toloka.Assignment.REJECTED, public_comment='Too few correct solutions'
+                ),
+            ),
         ),
         (
             'set_user_restriction',
@@ -650,17 +640,6 @@ def test_loop_e2e():
                 ),
             ),
         ),
-        (
-            'patch_assignment',
-            (
-                '8_alice',
-                toloka.assignment.AssignmentPatch(
-                    status=toloka.Assignment.REJECTED,
-                    public_comment='Check the tasks with numbers: 2, 4. Learn more about tasks acceptance and filing '
-                    'appeals in the project instructions.',
-                ),
-            ),
-        ),
         (
             'set_user_restriction',
             (
@@ -672,6 +651,21 @@ def test_loop_e2e():
                 ),
             ),
         ),
+        (
+            'patch_assignment',
+            ('7_fedor', toloka.assignment.AssignmentPatch(status=toloka.Assignment.ACCEPTED, public_comment='')),
+        ),
+        (
+            'patch_assignment',
+            (
+                '8_alice',
+                toloka.assignment.AssignmentPatch(
+                    status=toloka.Assignment.REJECTED,
+                    public_comment='Check the tasks with numbers: 2, 4. Learn more about tasks acceptance and filing '
+                    'appeals in the project instructions.',
+                ),
+            ),
+        ),
         (
             'patch_assignment',
             ('9_paul', toloka.assignment.AssignmentPatch(status=toloka.Assignment.ACCEPTED, public_comment='')),
@@ -683,10 +677,6 @@ def test_loop_e2e():
         ('patch_task_overlap_or_min', ('task 9', toloka.task.TaskOverlapPatch(overlap=5))),
         ('patch_task_overlap_or_min', ('task 8', toloka.task.TaskOverlapPatch(overlap=6))),
         ('open_pool', (pool_id,)),
-        (
-            'patch_assignment',
-            ('10_paul', toloka.assignment.AssignmentPatch(status=toloka.Assignment.ACCEPTED, public_comment='')),
-        ),
         (
             'set_user_restriction',
             (
@@ -698,14 +688,6 @@ def test_loop_e2e():
                 ),
             ),
         ),
-        (
-            'patch_assignment',
-            ('11_ivan', toloka.assignment.AssignmentPatch(status=toloka.Assignment.ACCEPTED, public_comment='')),
-        ),
-        (
-            'patch_assignment',
-            ('12_paul', toloka.assignment.AssignmentPatch(status=toloka.Assignment.ACCEPTED, public_comment='')),
-        ),
         (
             'set_user_restriction',
             (
@@ -717,6 +699,18 @@ def test_loop_e2e():
                 ),
             ),
         ),
+        (
+            'patch_assignment',
+            ('10_paul', toloka.assignment.AssignmentPatch(status=toloka.Assignment.ACCEPTED, public_comment='')),
+        ),
+        (
+            'patch_assignment',
+            ('11_ivan', toloka.assignment.AssignmentPatch(status=toloka.Assignment.ACCEPTED, public_comment='')),
+        ),
+        (
+            'patch_assignment',
+            ('12_paul', toloka.assignment.AssignmentPatch(status=toloka.Assignment.ACCEPTED, public_comment='')),
+        ),
         (
             'patch_assignment',
             ('13_tom', toloka.assignment.AssignmentPatch(status=toloka.Assignment.ACCEPTED, public_comment='')),
@@ -764,6 +758,226 @@ def test_loop_e2e():
     ]
 
 
+@patch('crowdom.classification_loop.time.sleep')
+def test_loop_streaming(sleep):
+    assignment_start = datetime.datetime(year=2020, month=10, day=5, hour=13, minute=15)
+
+    project = toloka.Project(
+        id='project',
+        task_spec=toloka.project.TaskSpec(
+            input_spec=lib.image_classification_mapping.to_toloka_input_spec(),
+            output_spec=lib.image_classification_mapping.to_toloka_output_spec(),
+        ),
+    )
+
+    dog, cat = lib.dog, lib.cat
+    images = [Image(url=f'https://storage.net/{i}.jpg') for i in range(2)]
+    control_images = [(Image(url=f'https://storage.net/{i}_control.jpg'), cat if i % 2 == 0 else dog) for i in range(2)]
+    pool_id = 'fake pool'
+
+    def create_assignment(
+        id: str, image_class_pairs: List[Tuple[Image, base.Class]], user_id: str
+    ) -> toloka.Assignment:
+        assignment, _ = lib.create_classification_assignment(
+            image_class_pairs,
+            control_images,
+            id=id,
+            user_id=user_id,
+            duration=datetime.timedelta(seconds=35),
+            assignment_start=assignment_start,
+            pool_id=pool_id,
+        )
+        return assignment
+
+    # bob's controls are wrong
+    bob_assignment = create_assignment(
+        '1_bob', [(control_images[1][0], cat), (images[1], cat), (images[0], dog), (control_images[0][0], dog)], 'bob'
+    )
+
+    # (pool is closed, submitted assignments, active assignments) for each poll
+    polls = [
+        # john's assignment is accepted, bob is still solving both tasks, so their overlap is not increased
+        (
+            False,
+            [
+                create_assignment(
+                    '0_john',
+                    [(images[0], cat), (control_images[0][0], cat), (images[1], dog), (control_images[1][0], dog)],
+                    'john',
+                )
+            ],
+            [bob_assignment],
+        ),
+        # bob's assignment is rejected, so tasks overlap is increased, but open pool is not reopened
+        (
+            False,
+            [bob_assignment],
+            [],
+        ),
+        # alice's assignment is accepted, pool is closed and no tasks to rework remain
+        (
+            True,
+            [
+                create_assignment(
+                    '2_alice',
+                    [(images[1], dog), (control_images[0][0], cat), (images[0], cat), (control_images[1][0], dog)],
+                    'alice',
+                )
+            ],
+            [],
+        ),
+    ]
+
+    class TolokaClientStub(lib.TolokaClientIntegrationStub):
+        poll: int
+        get_tasks_calls: List[Optional[datetime.datetime]]
+
+        def __init__(self):
+            self.poll = -1
+            self.get_tasks_calls = []
+            super(TolokaClientStub, self).__init__([], [project])
+
+        def get_pool(self, pool_id: str) -> toloka.Pool:
+            pool = super(TolokaClientStub, self).get_pool(pool_id)
+            self.poll += 1
+            closed, submitted, _ = polls[self.poll]
+            pool.is_closed = lambda: closed
+            for assignment in submitted:
+                assignment.status = toloka.Assignment.SUBMITTED
+                self.id_to_assignment[assignment.id] = assignment
+            return pool
+
+        def create_tasks(self, tasks, *args, **kwargs):
+            for task in tasks:
+                task.created = datetime.datetime.now()
+            super(TolokaClientStub, self).create_tasks(tasks, *args, **kwargs)
+
+        def get_tasks(self, pool_id: str, created_gte: Optional[datetime.datetime] = None) -> List[toloka.Task]:
+            self.get_tasks_calls.append(created_gte)
+            return super(TolokaClientStub, self).get_tasks(pool_id, created_gte)
+
+        def get_assignments(
+            self,
+            status: Union[toloka.Assignment.Status, List[toloka.Assignment.Status]],
+            pool_id: str,
+            **kwargs,
+        ) -> List[toloka.Assignment]:
+            if not isinstance(status, list):
+                status = [status]
+            assignments = [assignment for assignment in self.id_to_assignment.values() if assignment.status in status]
+            if toloka.Assignment.ACTIVE in status:
+                for assignment in polls[self.poll][2]:
+                    assignments.append(
+                        toloka.Assignment(id=assignment.id, status=toloka.Assignment.ACTIVE, tasks=assignment.tasks)
+                    )
+            return assignments
+
+    control_params = control.Control(
+        rules=control.RuleBuilder()
+        .add_static_reward(threshold=0.5)
+        .add_speed_control(0.1, 0.3)
+        .add_control_task_control(2, 1, 2)
+        .build()
+    )
+    task_duration_hint = datetime.timedelta(seconds=10)
+    pool_cfg = pool_config.ClassificationConfig(
+        project_id=project.id,
+        private_name=pool_id,
+        reward_per_assignment=0.01,
+        task_duration_hint=task_duration_hint,
+        real_tasks_count=2,
+        control_tasks_count=2,
+        overlap=2,
+        control_params=control_params,
+    )
+
+    stub = TolokaClientStub()
+    loop = classification_loop.ClassificationLoop(
+        client=stub,  # noqa
+        task_mapping=lib.image_classification_mapping,
+        params=classification_loop.Params(
+            aggregation_algorithm=classification.AggregationAlgorithm.MAX_LIKELIHOOD,
+            overlap=classification_loop.StaticOverlap(overlap=2),
+            control=control_params,
+            task_duration_function=duration.get_const_task_duration_function(task_duration_hint),
+        ),
+        lang='EN',
+    )
+    pool = loop.create_pool(control_objects=[((image,), (cls,)) for image, cls in control_images], pool_cfg=pool_cfg)
+    loop.add_input_objects(pool.id, [(image,) for image in images])
+    stub.calls = []
+    loop.loop(pool.id, streaming=True, poll_interval_seconds=5.0)
+
+    # pool tasks are listed once and then only refreshed with newly created tasks
+    latest_created = max(task.created for task in stub.tasks)
+    assert stub.get_tasks_calls == [None, latest_created, latest_created]
+
+    assert [(call, args) for call, args in stub.calls if call in ('patch_task_overlap_or_min', 'open_pool')] == [
+        ('patch_task_overlap_or_min', ('task 2', toloka.task.TaskOverlapPatch(overlap=3))),
+        ('patch_task_overlap_or_min', ('task 3', toloka.task.TaskOverlapPatch(overlap=3))),
+    ]
+    assert [(args[0], args[1].status) for call, args in stub.calls if call == 'patch_assignment'] == [
+        ('0_john', toloka.Assignment.ACCEPTED),
+        ('1_bob', toloka.Assignment.REJECTED),
+        ('2_alice', toloka.Assignment.ACCEPTED),
+    ]
+    assert sleep.call_count == 2
+    sleep.assert_called_with(5.0)
+
+
+def test_loop_async():
+    # (submitted assignments count, tasks to rework) for each iteration
+    iterations = [(3, 2), (1, 0)]
+
+    class AsyncLoop(classification_loop.ClassificationLoop):
+        def __init__(self):
+            self.calls = []
+            self.iteration = -1
+            self.client = self
+            self.task_mapping = lib.image_classification_mapping
+            self.model_ws = None
+            self.pool_tasks = {}
+            self.state_store = None
+
+        def get_pool(self, pool_id: str) -> toloka.Pool:
+            self.iteration += 1
+            pool = toloka.Pool(id=pool_id)
+            pool.is_closed = lambda: True
+            return pool
+
+        def get_tasks(self, pool_id: str) -> List[toloka.Task]:
+            return []
+
+        def get_assignments_solutions(
+            self, pool_id: str, status: List[toloka.Assignment.Status], with_control_tasks: bool = False
+        ) -> List[mapping.AssignmentSolutions]:
+            return [(status, with_control_tasks)]  # noqa
+
+        def evaluate_submitted_assignments(self, pool_id: str, submitted_assignments=None) -> int:
+            assert pool_id in self.pool_tasks
+            self.calls.append(('evaluate_submitted_assignments', pool_id, submitted_assignments))
+            return iterations[self.iteration][0]
+
+        def rework_tasks(self, pool_id: str, open_pool: bool = True, **kwargs) -> int:
+            self.calls.append(('rework_tasks', pool_id, kwargs))
+            return iterations[self.iteration][1]
+
+    loop = AsyncLoop()
+    asyncio.run(loop.loop_async('pool'))
+
+    finished_statuses = [toloka.Assignment.ACCEPTED, toloka.Assignment.REJECTED]
+    evaluate_call = ('evaluate_submitted_assignments', 'pool', [(toloka.Assignment.SUBMITTED, True)])
+    rework_call = (
+        'rework_tasks',
+        'pool',
+        {
+            'assignments_solutions': [(finished_statuses, False)],
+            'assignments_solutions_with_control_tasks': [(finished_statuses, True)],
+        },
+    )
+    assert loop.calls == [evaluate_call, rework_call] * 2
+
+
 class TestTaskIdToOverlapIncrease:
     images = [Image(url=f'https://storage.net/{i}.jpg') for i in range(4)]
     control_images = [
@@ -897,6 +1111,10 @@ class TestTaskIdToOverlapIncrease:
             ]
         ]
 
+        # assignment IDs are unique, as in Toloka, worker weights are accumulated by them
+        for i, assignment in enumerate(all_assignments):
+            assignment.id = f'assignment-{i}'
+
         accepted, rejected = toloka.Assignment.ACCEPTED, toloka.Assignment.REJECTED
         for assignment_indices, statuses, min_overlap, max_overlap, conf, expected_task_id_to_overlap_increase in [
             [
@@ -999,6 +1217,300 @@ def test_re_markup_not_finalized_objects():
         assert tasks_to_rework == expected_objects_to_re_markup
         assert stub.calls == expected_toloka_calls
 
+    # tasks of open pool are not patched again if their overlap is already set
+    task_id_to_overlap_increase = {lib.audio_transcript_mapping.task_id(audios[i]): 1 for i in (0, 2)}
+    task_overlaps = {'task-0': 3}
+    stub = TolokaClientStub(tasks)
+    for open_pool, expected_toloka_calls in (
+        (False, [('patch_task_overlap_or_min', ('task-2', toloka.task.TaskOverlapPatch(overlap=2)))]),
+        (False, []),
+        (
+            True,
+            [
+                ('patch_task_overlap_or_min', ('task-0', toloka.task.TaskOverlapPatch(overlap=3))),
+                ('patch_task_overlap_or_min', ('task-2', toloka.task.TaskOverlapPatch(overlap=2))),
+                ('open_pool', ('fake',)),
+            ],
+        ),
+    ):
+        stub.calls = []
+        classification_loop.rework_not_finalized_tasks(
+            client=stub,  # noqa
+            assignments=assignments,
+            task_mapping=lib.audio_transcript_mapping,
+            task_id_to_overlap_increase=task_id_to_overlap_increase,
+            pool_id='fake',
+            open_pool=open_pool,
+            task_overlaps=task_overlaps,
+        )
+        assert stub.calls == expected_toloka_calls
+        assert task_overlaps == {'task-0': 3, 'task-2': 2}
+
+
+def test_get_task_id_map():
+    audios = [(Audio(url=f'https://storage.net/{i}.wav'),) for i in range(3)]
+    tasks = []
+    for i, audio in enumerate(audios):
+        task = lib.audio_transcript_mapping.to_task(audio)
+        task.id = f'task-{i}'
+        tasks.append(task)
+    stub = TolokaClientStub(tasks[1:])
+
+    assert classification_loop.get_task_id_map(stub, 'fake', lib.audio_transcript_mapping) == {  # noqa
+        mapping.TaskID(audios[1]): 'task-1',
+        mapping.TaskID(audios[2]): 'task-2',
+    }
+
+
+def test_pool_tasks():
+    audios = [(Audio(url=f'https://storage.net/{i}.wav'),) for i in range(4)]
+    control_task = lib.audio_transcript_mapping.to_control_task(
+        ((Audio(url='https://storage.net/c.wav'),), (Text(text='hi'),))
+    )
+    control_task.id = 'task-c'
+    tasks = [control_task]
+    for i, audio in enumerate(audios[:2]):
+        task = lib.audio_transcript_mapping.to_task(audio)
+        task.id = f'task-{i}'
+        tasks.append(task)
+
+    class PoolTasksClientStub(TolokaClientStub):
+        get_tasks_calls: int = 0
+
+        def get_tasks(self, request: toloka.search_requests.TaskSearchRequest):
+            self.get_tasks_calls += 1
+            return super(PoolTasksClientStub, self).get_tasks(request)
+
+        def create_tasks(self, tasks, *args, **kwargs):
+            super(PoolTasksClientStub, self).create_tasks(tasks, *args, **kwargs)
+            for i, task in enumerate(tasks):
+                task.id = f'task-{i + 2}'
+            return toloka.batch_create_results.TaskBatchCreateResult(
+                items={str(i): task for i, task in reversed(list(enumerate(tasks)))}
+            )
+
+    stub = PoolTasksClientStub(tasks)
+    loop = classification_loop.ClassificationLoop(
+        client=stub,  # noqa
+        task_mapping=lib.audio_transcript_mapping,
+        params=None,  # noqa
+        lang='EN',
+    )
+
+    pool_tasks = loop.get_pool_tasks('fake')
+    assert pool_tasks.input_objects() == audios[:2]
+    assert pool_tasks.task_id_map() == {mapping.TaskID(audios[0]): 'task-0', mapping.TaskID(audios[1]): 'task-1'}
+    control_task_id = mapping.TaskID((Audio(url='https://storage.net/c.wav'),))
+    assert pool_tasks.task_id_map(with_control_tasks=True)[control_task_id] == 'task-c'
+    assert loop.get_pool_tasks('fake') is pool_tasks
+
+    # created tasks are appended in order of creation, pool tasks are not listed again
+    loop.add_input_objects('fake', audios[2:])
+    assert loop.get_pool_tasks('fake') is pool_tasks
+    assert pool_tasks.input_objects() == audios
+    task_index = mapping.TaskIndex.from_objects(lib.audio_transcript_mapping, [audios[3]])
+    assert pool_tasks.toloka_task_ids(task_index).tolist() == ['task-3', 'task-0', 'task-1', 'task-2']
+    assert stub.get_tasks_calls == 1
+
+
+def test_assignments_fetcher():
+    start = datetime.datetime(year=2020, month=10, day=5, hour=13, tzinfo=datetime.timezone.utc)
+
+    class AssignmentsClientStub(lib.TolokaClientCallRecorderStub):
+        id_to_assignment: Dict[str, toloka.Assignment]
+
+        def __init__(self):
+            self.id_to_assignment = {}
+            super(AssignmentsClientStub, self).__init__()
+
+        def get_assignments(self, pool_id: str, status: List[toloka.Assignment.Status], **kwargs):
+            self.calls.append(('get_assignments', (pool_id, status, kwargs)))
+            assignments = []
+            for assignment in self.id_to_assignment.values():
+                if assignment.status not in status:
+                    continue
+                if any(
+                    getattr(assignment, key[: -len('_gte')]) is None or getattr(assignment, key[: -len('_gte')]) < time
+                    for key, time in kwargs.items()
+                ):
+                    continue
+                assignments.append(toloka.Assignment.structure(assignment.unstructure()))
+            return assignments
+
+    def submit(assignment_id: str, minutes: int):
+        stub.id_to_assignment[assignment_id] = toloka.Assignment(
+            id=assignment_id,
+            status=toloka.Assignment.SUBMITTED,
+            submitted=start + datetime.timedelta(minutes=minutes),
+        )
+
+    def set_status(assignment_id: str, status: toloka.Assignment.Status, minutes: int):
+        assignment = stub.id_to_assignment[assignment_id]
+        assignment.status = status
+        setattr(assignment, status.value.lower(), start + datetime.timedelta(minutes=minutes))
+
+    all_statuses = [toloka.Assignment.SUBMITTED, toloka.Assignment.ACCEPTED, toloka.Assignment.REJECTED]
+    stub = AssignmentsClientStub()
+    fetcher = classification_loop.AssignmentsFetcher(stub, lag=datetime.timedelta(0))  # noqa
+
+    def get_ids(status: Union[toloka.Assignment.Status, List[toloka.Assignment.Status]]) -> List[str]:
+        return [assignment.id for assignment in fetcher.get_assignments(status=status, pool_id='fake')]
+
+    assert get_ids(all_statuses) == []
+    assert stub.calls == [('get_assignments', ('fake', all_statuses, {}))]
+
+    submit('a1', 10)
+    submit('a0', 20)
+    stub.calls = []
+    assert get_ids(toloka.Assignment.SUBMITTED) == ['a0', 'a1']
+    assert stub.calls == [('get_assignments', ('fake', all_statuses, {}))]
+
+    set_status('a1', toloka.Assignment.ACCEPTED, 30)
+    set_status('a0', toloka.Assignment.REJECTED, 30)
+    submit('a2', 30)
+    stub.calls = []
+    assert get_ids(toloka.Assignment.SUBMITTED) == ['a2']
+    assert get_ids([toloka.Assignment.ACCEPTED, toloka.Assignment.REJECTED]) == ['a0', 'a1']
+    assert stub.calls[:3] == [
+        ('get_assignments', ('fake', all_statuses, {'submitted_gte': start + datetime.timedelta(minutes=20)})),
+        ('get_assignments', ('fake', [toloka.Assignment.ACCEPTED], {})),
+        ('get_assignments', ('fake', [toloka.Assignment.REJECTED], {})),
+    ]
+
+    # status change after verdict is received by event time
+    set_status('a2', toloka.Assignment.ACCEPTED, 40)
+    stub.calls = []
+    assert get_ids(toloka.Assignment.ACCEPTED) == ['a1', 'a2']
+    assert stub.calls == [
+        ('get_assignments', ('fake', all_statuses, {'submitted_gte': start + datetime.timedelta(minutes=30)})),
+        ('get_assignments', ('fake', all_statuses, {'accepted_gte': start + datetime.timedelta(minutes=30)})),
+        ('get_assignments', ('fake', all_statuses, {'rejected_gte': start + datetime.timedelta(minutes=30)})),
+    ]
+
+    # active assignments are requested by creation time and are tracked until they are submitted, skipped or expired
+    def get_in_flight_ids() -> List[str]:
+        return [assignment.id for assignment in fetcher.get_in_flight_assignments(pool_id='fake')]
+
+    def get_in_flight_calls() -> List[Tuple[List[toloka.Assignment.Status], Dict]]:
+        return [(args[1], args[2]) for _, args in stub.calls if args[1] != all_statuses]
+
+    for assignment_id, minutes in (('a3', 50), ('a4', 55)):
+        stub.id_to_assignment[assignment_id] = toloka.Assignment(
+            id=assignment_id, status=toloka.Assignment.ACTIVE, created=start + datetime.timedelta(minutes=minutes)
+        )
+    submit('a5', 50)
+    stub.calls = []
+    assert get_in_flight_ids() == ['a3', 'a4', 'a5']
+    assert get_in_flight_calls() == [
+        ([toloka.Assignment.ACTIVE], {}),
+        ([toloka.Assignment.SKIPPED], {'skipped_gte': start + datetime.timedelta(minutes=50)}),
+        ([toloka.Assignment.EXPIRED], {'expired_gte': start + datetime.timedelta(minutes=50)}),
+    ]
+
+    set_status('a3', toloka.Assignment.SUBMITTED, 60)
+    set_status('a4', toloka.Assignment.EXPIRED, 60)
+    stub.calls = []
+    assert get_in_flight_ids() == ['a3', 'a5']
+    assert get_in_flight_calls() == [
+        ([toloka.Assignment.ACTIVE], {'created_gte': start + datetime.timedelta(minutes=55)}),
+        ([toloka.Assignment.SKIPPED], {'skipped_gte': start + datetime.timedelta(minutes=55)}),
+        ([toloka.Assignment.EXPIRED], {'expired_gte': start + datetime.timedelta(minutes=55)}),
+    ]
+
+    # ended assignments are not requested when there are no active ones
+    stub.calls = []
+    assert get_in_flight_ids() == ['a3', 'a5']
+    assert get_in_flight_calls() == [
+        ([toloka.Assignment.ACTIVE], {'created_gte': start + datetime.timedelta(minutes=55)}),
+    ]
+
+
+def test_loop_state_store(tmp_path):
+    audios = [(Audio(url=f'https://storage.net/{i}.wav'),) for i in range(4)]
+    tasks = []
+    for i, audio in enumerate(audios[:2]):
+        task = lib.audio_transcript_mapping.to_task(audio)
+        task.id = f'task-{i}'
+        tasks.append(task)
+    submitted = datetime.datetime(year=2020, month=10, day=5, hour=13, tzinfo=datetime.timezone.utc)
+    assignment = toloka.Assignment(
+        id='a0',
+        status=toloka.Assignment.ACCEPTED,
+        submitted=submitted,
+        accepted=submitted,
+        pool_id='fake',
+        tasks=[],
+        solutions=[],
+    )
+
+    class StateClientStub(TolokaClientStub):
+        def get_tasks(self, request: toloka.search_requests.TaskSearchRequest):
+            self.calls.append(('get_tasks', ()))
+            return super(StateClientStub, self).get_tasks(request)
+
+        def create_tasks(self, tasks, *args, **kwargs):
+            for task in tasks:
+                task.id = f'task-{len(self.tasks)}'
+                self.tasks.append(task)
+            return toloka.batch_create_results.TaskBatchCreateResult(items={'0': tasks[0]})
+
+        def get_assignments(self, pool_id: str, status: List[toloka.Assignment.Status], **kwargs):
+            self.calls.append(('get_assignments', (status, kwargs)))
+            return [assignment] if not kwargs else []
+
+    stored_tasks = []
+
+    class RecordingStateStore(classification_loop.LoopStateStore):
+        def set_tasks(self, pool_id: str, tasks: Iterable[toloka.Task], start: int = 0):
+            tasks = list(tasks)
+            stored_tasks.append((start, [task.id for task in tasks]))
+            super(RecordingStateStore, self).set_tasks(pool_id, tasks, start)
+
+    def create_loop(stub: StateClientStub) -> classification_loop.ClassificationLoop:
+        return classification_loop.ClassificationLoop(
+            client=stub,  # noqa
+            task_mapping=lib.audio_transcript_mapping,
+            params=None,  # noqa
+            lang='EN',
+            state_store=RecordingStateStore(str(tmp_path / 'state.db')),
+        )
+
+    stub = StateClientStub(list(tasks))
+    loop = create_loop(stub)
+    assert loop.get_pool_tasks('fake').input_objects() == audios[:2]
+    loop.add_input_objects('fake', audios[2:3])
+    assert [a.id for a, _ in loop.get_assignments_solutions('fake', [toloka.Assignment.ACCEPTED])] == ['a0']
+    assert [name for name, _ in stub.calls] == ['get_tasks', 'open_pool', 'get_assignments']
+    # only created tasks are stored in addition to listed ones
+    assert stored_tasks == [(0, ['task-0', 'task-1']), (2, ['task-2'])]
+
+    # restarted loop does not list pool tasks and receives only assignments with new events
+    stub.calls = []
+    loop = create_loop(stub)
+    assert loop.get_pool_tasks('fake').input_objects() == audios[:3]
+    assert [a.id for a, _ in loop.get_assignments_solutions('fake', [toloka.Assignment.ACCEPTED])] == ['a0']
+    all_statuses = [toloka.Assignment.SUBMITTED, toloka.Assignment.ACCEPTED, toloka.Assignment.REJECTED]
+    lag = datetime.timedelta(minutes=1)
+    assert stub.calls == [
+        ('get_assignments', (all_statuses, {'submitted_gte': submitted - lag})),
+        ('get_assignments', (all_statuses, {'accepted_gte': submitted - lag})),
+        ('get_assignments', ([toloka.Assignment.REJECTED], {})),
+    ]
+
+    # tasks created by restarted loop are stored after tasks restored from store
+    stored_tasks.clear()
+    loop.add_input_objects('fake', audios[3:])
+    assert stored_tasks == [(3, ['task-3'])]
+    assert create_loop(stub).get_pool_tasks('fake').input_objects() == audios
+
+    # loop is interrupted during tasks creation, so stored pool tasks are listed again and stored from scratch
+    loop.state_store.invalidate_tasks('fake')
+    stub.calls = []
+    stored_tasks.clear()
+    assert create_loop(stub).get_pool_tasks('fake').input_objects() == audios
+    assert stub.calls == [('get_tasks', ())]
+    assert stored_tasks == [(0, ['task-0', 'task-1', 'task-2', 'task-3'])]
+
 
 def test_calculate_label_probas():
     dog, cat, crow = lib.dog, lib.cat, lib.crow
@@ -1046,3 +1558,115 @@ def test_calculate_label_probas():
         )
         == expected
     )
+
+
+@pytest.mark.parametrize('drift_tolerance', [0.0, 1.0])
+def test_label_probas_tracker(drift_tolerance: float):
+    dog, cat, crow = lib.dog, lib.cat, lib.crow
+    images = [Image(url=f'https://storage.net/{i}.jpg') for i in range(4)]
+    control_images = [(Image(url=f'https://storage.net/{i}_control.jpg'), cat if i % 2 == 0 else dog) for i in range(4)]
+    task_mapping = lib.image_classification_mapping
+    assignment_evaluation_strategy = evaluation.ControlTasksAssignmentAccuracyEvaluationStrategy(task_mapping)
+    assignment_solutions = [
+        lib.create_classification_assignment(image_class_pairs, control_images, user_id=user_id, status=status)
+        for image_class_pairs, user_id, status in [
+            ([(images[0], cat), (control_images[0][0], cat), (images[1], dog)], 'john', toloka.Assignment.ACCEPTED),
+            ([(images[2], cat), (images[3], crow), (control_images[1][0], crow)], 'kate', toloka.Assignment.REJECTED),
+            ([(control_images[2][0], crow), (images[2], dog), (images[0], cat)], 'nolan', toloka.Assignment.REJECTED),
+            ([(images[1], dog), (control_images[3][0], dog), (images[3], dog)], 'nolan', toloka.Assignment.ACCEPTED),
+            ([(control_images[0][0], dog), (images[2], cat)], 'john', toloka.Assignment.ACCEPTED),
+        ]
+    ]
+    for i, (assignment, _) in enumerate(assignment_solutions):
+        assignment.id = f'assignment-{i}'
+    tasks = []
+    for i, image in enumerate(images):
+        task = task_mapping.to_task((image,))
+        task.id = f'task-{i}'
+        tasks.append(task)
+    pool_tasks = classification_loop.PoolTasks('fake', task_mapping, tasks)
+    algorithm = classification.AggregationAlgorithm.MAX_LIKELIHOOD
+
+    def calculate_label_probas(solutions: List[mapping.AssignmentSolutions]):
+        return classification_loop.calculate_label_probas(
+            client=None,  # noqa
+            task_mapping=task_mapping,
+            assignment_evaluation_strategy=assignment_evaluation_strategy,
+            aggregation_algorithm=algorithm,
+            assignment_solutions=solutions,
+            pool_id='fake',
+            pool_tasks=pool_tasks,
+        )
+
+    tracker = classification_loop.LabelProbasTracker(drift_tolerance)
+
+    for solutions in [assignment_solutions[:2], assignment_solutions]:
+        worker_weights = evaluation.calculate_worker_weights(solutions, assignment_evaluation_strategy)
+        tracker.update(solutions, task_mapping, algorithm, worker_weights)
+
+    label_probas = tracker.get_label_probas(pool_tasks)
+    expected = calculate_label_probas(assignment_solutions)
+    task_0 = mapping.TaskID((images[0],))
+    if drift_tolerance == 0.0:
+        # john's weight is decreased by the last assignment, so all tasks are re-aggregated
+        assert tracker.full_aggregations == 2
+        assert label_probas == expected
+    else:
+        # only tasks with new labels are re-aggregated, images[0] label proba is calculated with outdated john's weight
+        assert tracker.full_aggregations == 1
+        assert label_probas[task_0] == calculate_label_probas(assignment_solutions[:2])[task_0]
+        assert label_probas[task_0] != expected[task_0]
+        assert {task_id: p for task_id, p in label_probas.items() if task_id != task_0} == {
+            task_id: p for task_id, p in expected.items() if task_id != task_0
+        }
+
+    # previously accepted assignment is rejected
+    assignment_solutions[0][0].status = toloka.Assignment.REJECTED
+    worker_weights = evaluation.calculate_worker_weights(assignment_solutions, assignment_evaluation_strategy)
+    tracker.update(assignment_solutions, task_mapping, algorithm, worker_weights)
+    assert tracker.get_label_probas(pool_tasks) == calculate_label_probas(assignment_solutions)
+
+    # worker weights appear after aggregation without them
+    tracker = classification_loop.LabelProbasTracker(drift_tolerance)
+    tracker.update(assignment_solutions, task_mapping, classification.AggregationAlgorithm.MAJORITY_VOTE, None)
+    tracker.update(assignment_solutions, task_mapping, algorithm, worker_weights)
+    assert tracker.full_aggregations == 2
+    assert tracker.get_label_probas(pool_tasks) == calculate_label_probas(assignment_solutions)
+
+
+@pytest.mark.parametrize('warm_start_aggregation', [False, True])
+def test_aggregation_warm_start(warm_start_aggregation: bool):
+    cat, dog = lib.cat, lib.dog
+    images = [Image(url=f'https://storage.net/{i}.jpg') for i in range(2)]
+    assignments = [
+        lib.create_classification_assignment(image_class_pairs, [], user_id=user_id)[0]
+        for image_class_pairs, user_id in [
+            ([(images[0], cat), (images[1], dog)], 'john'),
+            ([(images[0], cat), (images[1], cat)], 'bob'),
+            ([(images[0], dog), (images[1], dog)], 'alice'),
+        ]
+    ]
+
+    class Loop(classification_loop.ClassificationLoop):
+        def get_assignments_and_worker_weights(self, pool_id: str, pool_input_objects=None):
+            return pool_input_objects, assignments, None
+
+    loop = Loop(
+        client=None,  # noqa
+        task_mapping=lib.image_classification_mapping,
+        params=classification_loop.Params(
+            aggregation_algorithm=classification.AggregationAlgorithm.DAWID_SKENE,
+            overlap=classification_loop.StaticOverlap(overlap=3),
+            control=control.Control(rules=[]),
+            task_duration_function=duration.get_const_task_duration_function(datetime.timedelta(seconds=10)),
+        ),
+        lang='EN',
+        warm_start_aggregation=warm_start_aggregation,
+    )
+    state = loop.get_aggregation_state('pool')
+    assert (state is not None) == warm_start_aggregation
+
+    # final results are aggregated from cold start
+    results, _ = loop.get_results('pool', [(image,) for image in images])
+    assert [classification.get_most_probable_label(probas)[0] for probas, _ in results] == [cat, dog]
+    assert state is None or not state.dawid_skene
@@ -1,8 +1,11 @@
-from datetime import timedelta
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+import numpy as np
 import pytest
 
-from toloka.client.assignment import Assignment
-from toloka.client.user_restriction import UserRestriction
+import toloka.client as toloka
+from toloka.client.assignment import Assignment, AssignmentPatch
+from toloka.client.user_restriction import UserRestriction, PoolUserRestriction, ProjectUserRestriction
 
 from crowdom import control
 
@@ -64,6 +67,85 @@ class TestPredicate:
 
         assert str(e.value) == 'Nested expressions are not allowed'
 
+    @pytest.mark.parametrize('boolean_operator', [control.BooleanOperator.AND, control.BooleanOperator.OR])
+    def test_check_batch(self, boolean_operator: control.BooleanOperator):
+        predicates = [
+            control.AssignmentDurationPredicate(threshold=threshold, comparison=control.ComparisonType(comparison))
+            for threshold, comparison in [(0.29, '<='), (0.1, '>'), (0.5, '<'), (0.3, '>=')]
+        ]
+        predicates.append(control.PredicateExpression(boolean_operator=boolean_operator, predicates=predicates[:2]))
+        durations = [timedelta(seconds=seconds) for seconds in [1, 10, 28, 29, 30, 49, 50, 51]]
+        hint = timedelta(seconds=100)
+        microsecond = timedelta(microseconds=1)
+        for predicate in predicates:
+            assert predicate.check_batch(
+                value=np.array([d // microsecond for d in durations]),
+                assignment_duration_hint=np.full(len(durations), hint // microsecond),
+            ).tolist() == [predicate.check(value=d, assignment_duration_hint=hint) for d in durations]
+
+    def test_check_batch_default(self):
+        class EvenPredicate(control.Predicate):
+            def check(self, value: int, **kwargs) -> bool:
+                return value % 2 == 0
+
+        predicate = EvenPredicate()
+        mask = predicate.check_batch(value=np.array([1, 2, 3, 4]), assignment_duration_hint=np.array([5, 6, 7, 8]))
+        assert mask.dtype == bool
+        assert mask.tolist() == [False, True, False, True]
+        assert predicate.check_batch(value=np.array([], dtype=np.int64)).tolist() == []
+
+    def test_check_batch_overrides(self):
+        class SecondsPredicate(control.AssignmentDurationPredicate):
+            # expects values as timedelta
+            def check(self, value: timedelta, assignment_duration_hint: timedelta, **kwargs) -> bool:
+                return value.total_seconds() < self.threshold
+
+        class FixedThresholdPredicate(control.AssignmentDurationPredicate):
+            def get_threshold(self, **kwargs) -> timedelta:
+                return timedelta(seconds=self.threshold)
+
+        class UnknownAccuracyPredicate(control.AssignmentAccuracyPredicate):
+            def check(self, value: Optional[float], **kwargs) -> bool:
+                return value is None or super().check(value=value, **kwargs)
+
+        durations = [timedelta(seconds=seconds) for seconds in [1, 10, 28, 29, 30, 49, 50, 51]]
+        hint = timedelta(seconds=100)
+        microsecond = timedelta(microseconds=1)
+        for predicate in [
+            SecondsPredicate(threshold=29.5, comparison=control.ComparisonType.LESS),
+            FixedThresholdPredicate(threshold=30, comparison=control.ComparisonType.LESS),
+        ]:
+            assert predicate.check_batch(
+                value=np.array([d // microsecond for d in durations]),
+                assignment_duration_hint=np.full(len(durations), hint // microsecond),
+            ).tolist() == [predicate.check(value=d, assignment_duration_hint=hint) for d in durations]
+
+        predicate = UnknownAccuracyPredicate(threshold=0.5, comparison=control.ComparisonType.LESS)
+        assert predicate.check_batch(value=np.array([0.2, np.nan, 0.7])).tolist() == [True, True, False]
+
+    @pytest.mark.parametrize('boolean_operator', [control.BooleanOperator.AND, control.BooleanOperator.OR])
+    def test_check_batch_expression_short_circuit(self, boolean_operator: control.BooleanOperator):
+        checked = []
+
+        class RecordingPredicate(control.AssignmentAccuracyPredicate):
+            def check_batch(self, value: np.ndarray, **kwargs) -> np.ndarray:
+                checked.append(value.tolist())
+                return super().check_batch(value=value, **kwargs)
+
+        predicate = control.PredicateExpression(
+            boolean_operator=boolean_operator,
+            predicates=[
+                RecordingPredicate(threshold=0.5, comparison=control.ComparisonType.LESS),
+                RecordingPredicate(threshold=0.2, comparison=control.ComparisonType.GREATER),
+            ],
+        )
+        values = [0.1, 0.3, 0.7]
+        assert predicate.check_batch(value=np.array(values)).tolist() == [predicate.check(value=v) for v in values]
+        if boolean_operator == control.BooleanOperator.AND:
+            assert checked == [values, [0.1, 0.3]]
+        else:
+            assert checked == [values, [0.7]]
+
 
 class TestRuleBuilder:
     def test_static_reward(self):
@@ -540,3 +622,245 @@ class TestControl:
             (control.AssignmentAccuracyPredicate, control.GiveBonusToUser, [bonus_rule]),
         ]:
             assert ctrl.filter_rules(predicate_type=predicate_type, action_type=action_type) == rules
+
+
+class TestUserRestrictionPlan:
+    def test_strongest_restriction(self):
+        start = datetime(year=2020, month=10, day=5)
+
+        def restriction(user_id: str, hours: Optional[int], pool_id: str = 'pool') -> PoolUserRestriction:
+            will_expire = start + timedelta(hours=hours) if hours is not None else None
+            return PoolUserRestriction(
+                user_id=user_id, private_comment=str(hours), will_expire=will_expire, pool_id=pool_id
+            )
+
+        class Client:
+            def __init__(self):
+                self.restrictions = []
+
+            def set_user_restriction(self, user_restriction: UserRestriction):
+                self.restrictions.append(user_restriction)
+
+        plan = control.UserRestrictionPlan()
+        for r in [
+            restriction('bob', 1),
+            restriction('alice', 8),
+            restriction('bob', 8),
+            restriction('bob', 2),
+            restriction('bob', 1, pool_id='other pool'),
+            restriction('alice', None),
+            restriction('alice', 24),
+        ]:
+            plan.add(r)
+        plan.add(ProjectUserRestriction(user_id='bob', private_comment='project', project_id='pool'))
+        assert len(plan) == 4
+
+        client = Client()
+        plan.execute(client)
+        assert client.restrictions == [
+            restriction('bob', 8),
+            restriction('alice', None),
+            restriction('bob', 1, pool_id='other pool'),
+            ProjectUserRestriction(user_id='bob', private_comment='project', project_id='pool'),
+        ]
+        assert len(plan) == 0
+
+
+class TestAssignmentVerdictPlan:
+    def test_conflicting_verdicts(self):
+        plan = control.AssignmentVerdictPlan()
+        plan.add('1', AssignmentPatch(status=Assignment.ACCEPTED, public_comment=''))
+        plan.add('1', AssignmentPatch(status=Assignment.ACCEPTED, public_comment=''))
+        assert len(plan) == 1
+        with pytest.raises(AssertionError) as e:
+            plan.add('1', AssignmentPatch(status=Assignment.REJECTED, public_comment='bad'))
+        assert str(e.value) == 'conflicting verdicts for assignment 1'
+
+    def test_execute(self):
+        class Client:
+            def __init__(self):
+                self.patched = []
+
+            def patch_assignment(self, assignment_id: str, patch: AssignmentPatch):
+                if assignment_id != '1':
+                    raise toloka.exceptions.ConflictStateApiError(status_code=409)
+                self.patched.append((assignment_id, patch.status))
+
+            def get_assignment(self, assignment_id: str) -> Assignment:
+                return Assignment(id=assignment_id, status=Assignment.REJECTED)
+
+        client = Client()
+        plan = control.AssignmentVerdictPlan()
+        plan.add('1', AssignmentPatch(status=Assignment.ACCEPTED, public_comment=''))
+        plan.add('2', AssignmentPatch(status=Assignment.REJECTED, public_comment='bad'))
+        plan.execute(client)  # verdict for '2' is already set
+        assert client.patched == [('1', Assignment.ACCEPTED)]
+        assert len(plan) == 0
+
+        plan.add('3', AssignmentPatch(status=Assignment.ACCEPTED, public_comment=''))
+        with pytest.raises(toloka.exceptions.ConflictStateApiError):
+            plan.execute(client)
+
+
+class TestDecisionTable:
+    duration_hint = timedelta(seconds=1)
+
+    def decide(
+        self, ctrl: control.Control, accuracy: float, duration_ratio: float
+    ) -> Tuple[Optional[Assignment.Status], List[bool]]:
+        # reference application of rules by assignment, as in loops
+        def matched(rule: control.Rule) -> bool:
+            predicate = rule.predicate
+            if isinstance(predicate, control.PredicateExpression):
+                predicate = predicate.predicates[0]
+            if isinstance(predicate, control.AssignmentAccuracyPredicate):
+                return rule.predicate.check(value=accuracy)
+            return rule.predicate.check(
+                value=duration_ratio * self.duration_hint, assignment_duration_hint=self.duration_hint
+            )
+
+        def first_verdict(rules: List[control.Rule]) -> Optional[str]:
+            return next((rule.action.status for rule in rules if matched(rule)), None)
+
+        table = control.DecisionTable(ctrl)
+        verdict = first_verdict(table.duration_verdict_rules)
+        blocks = [matched(rule) for rule in table.duration_block_rules]
+        if verdict is None:
+            verdict = first_verdict(table.accuracy_verdict_rules)
+            blocks += [matched(rule) for rule in table.accuracy_block_rules]
+        else:
+            blocks += [False] * len(table.accuracy_block_rules)
+        return verdict, blocks
+
+    @pytest.mark.parametrize(
+        'ctrl',
+        [
+            control.Control(
+                control.RuleBuilder()
+                .add_static_reward(threshold=0.5)
+                .add_speed_control(ratio_rand=0.1, ratio_poor=0.3)
+                .add_control_task_control(4, 1, 3)
+                .build()
+            ),
+            control.Control(
+                control.RuleBuilder()
+                .add_dynamic_reward(
+                    min_bonus_amount_usd=0.01,
+                    max_bonus_amount_usd=0.1,
+                    min_accuracy_for_bonus=0.5,
+                    min_accuracy_for_accept=0.25,
+                    bonus_granularity_num=4,
+                )
+                .add_complex_speed_control(
+                    [
+                        control.BlockTimePicker(0.1, '1d', True),
+                        control.BlockTimePicker(0.4, '2h', False),
+                        control.BlockTimePicker(0.2, '8h', True),
+                    ]
+                )
+                .build()
+            ),
+        ],
+    )
+    def test_decide(self, ctrl: control.Control):
+        accuracies = [0.0, 0.2, 0.25, 0.3, 0.5, 0.6, 0.75, 0.8, 0.875, 1.0]
+        duration_ratios = [0.05, 0.1, 0.15, 0.2, 0.3, 0.35, 0.4, 0.5, 1.0]
+        pairs = [(accuracy, ratio) for accuracy in accuracies for ratio in duration_ratios]
+        microsecond = timedelta(microseconds=1)
+        table = control.DecisionTable(ctrl)
+        decisions = table.decide(
+            accuracy=np.array([accuracy for accuracy, _ in pairs]),
+            durations=np.array([ratio * self.duration_hint // microsecond for _, ratio in pairs]),
+            duration_hints=np.full(len(pairs), self.duration_hint // microsecond),
+        )
+        for i, (accuracy, ratio) in enumerate(pairs):
+            verdict, blocks = self.decide(ctrl, accuracy, ratio)
+            assert decisions.verdicts[i] == verdict
+            assert (decisions.verdict_rules[i] is None) == (verdict is None)
+            if verdict is not None:
+                assert decisions.verdict_rules[i].action.status == verdict
+            assert decisions.blocks[i].tolist() == blocks
+
+    def test_decide_without_duration_rules(self):
+        ctrl = control.Control(control.RuleBuilder().add_static_reward(threshold=0.5).build())
+        decisions = control.DecisionTable(ctrl).decide(accuracy=np.array([0.2, 0.5, 0.7]))
+        assert decisions.verdicts.tolist() == [Assignment.REJECTED, Assignment.ACCEPTED, Assignment.ACCEPTED]
+        assert decisions.blocks.shape == (3, 0)
+
+    def test_decide_unknown_accuracy(self):
+        ctrl = control.Control(control.RuleBuilder().add_static_reward(threshold=0.5).build())
+        table = control.DecisionTable(ctrl)
+        with pytest.raises(TypeError):
+            table.accuracy_verdict_rules[0].predicate.check(value=None)
+        with pytest.raises(TypeError):
+            table.decide(accuracy=np.array([0.2, np.nan]))
+
+        # unknown accuracy is not checked if assignment gets verdict by duration rules
+        ctrl = control.Control(
+            control.RuleBuilder().add_static_reward(threshold=0.5).add_speed_control(0.1, 0.3).build()
+        )
+        decisions = control.DecisionTable(ctrl).decide(
+            accuracy=np.array([0.2, np.nan]), durations=np.array([500, 50]), duration_hints=np.array([1000, 1000])
+        )
+        assert decisions.verdicts.tolist() == [Assignment.REJECTED, Assignment.REJECTED]
+        assert decisions.blocks.tolist() == [[False, False], [True, False]]
+
+    def test_decide_predicates_without_threshold(self):
+        ctrl = control.Control(
+            [
+                control.Rule(
+                    predicate=control.PredicateExpression(
+                        boolean_operator=control.BooleanOperator.OR,
+                        predicates=[
+                            control.AssignmentAccuracyPredicate(threshold=0.2, comparison=control.ComparisonType.LESS),
+                            control.AssignmentAccuracyPredicate(
+                                threshold=0.8, comparison=control.ComparisonType.GREATER
+                            ),
+                        ],
+                    ),
+                    action=control.SetAssignmentStatus(status=Assignment.REJECTED),
+                ),
+                # rule of other type is not applied by accuracy or duration stages, as in loops
+                control.Rule(
+                    predicate=control.AlwaysTruePredicate(),
+                    action=control.SetAssignmentStatus(status=Assignment.ACCEPTED),
+                ),
+            ]
+        )
+        decisions = control.DecisionTable(ctrl).decide(accuracy=np.array([0.1, 0.5, 0.9]))
+        assert decisions.verdicts.tolist() == [Assignment.REJECTED, None, Assignment.REJECTED]
+
+    def test_decide_lazily(self):
+        checked = []
+
+        class RecordingPredicate(control.AssignmentAccuracyPredicate):
+            def check_batch(self, value: np.ndarray, **kwargs) -> np.ndarray:
+                checked.append((self.threshold, value.tolist()))
+                return super().check_batch(value=value, **kwargs)
+
+        def rule(threshold: float, action: control.Action) -> control.Rule:
+            return control.Rule(
+                predicate=RecordingPredicate(threshold=threshold, comparison=control.ComparisonType.GREATER_OR_EQUAL),
+                action=action,
+            )
+
+        block = control.BlockUser(scope=UserRestriction.POOL, private_comment='')
+        ctrl = control.Control(
+            [
+                rule(0.8, control.SetAssignmentStatus(status=Assignment.ACCEPTED)),
+                rule(0.0, control.SetAssignmentStatus(status=Assignment.REJECTED)),
+                rule(0.5, block),
+            ]
+        )
+        decisions = control.DecisionTable(ctrl).decide(
+            accuracy=np.array([0.9, 0.6, 0.3, 0.7]), blockable=np.array([True, True, True, False])
+        )
+        assert decisions.verdicts.tolist() == [
+            Assignment.ACCEPTED,
+            Assignment.REJECTED,
+            Assignment.REJECTED,
+            Assignment.REJECTED,
+        ]
+        assert decisions.blocks.tolist() == [[True], [True], [False], [False]]
+        # block rules are checked for all blockable assignments, verdict rules only for ones without verdict
+        assert checked == [(0.5, [0.9, 0.6, 0.3]), (0.8, [0.9, 0.6, 0.3, 0.7]), (0.0, [0.6, 0.3, 0.7])]
@@ -1,7 +1,7 @@
 from copy import deepcopy
 import datetime
 import decimal
-from typing import Tuple
+from typing import Dict, List, Optional, Tuple
 
 from mock import patch
 from pytest import approx
@@ -273,6 +273,29 @@ def test_get_objects_markup_attempts():
         )
 
 
+def test_get_tasks_attempts_decoded_task_ids():
+    tasks, solutions = [], []
+    for i in range(3):
+        task = lib.audio_transcript_mapping.to_task((Audio(url=f'https://storage.net/0{i}.wav'),))
+        task.id = f'task-{i}'
+        tasks.append(task)
+        solutions.append(lib.audio_transcript_mapping.to_solution((Text(text=str(i)),)))
+    assignment = toloka.Assignment(id='a', user_id='w', tasks=tasks, solutions=solutions)
+    assignments_solutions = mapping.get_assignments_solutions([assignment], lib.audio_transcript_mapping)
+    task_ids = [lib.audio_transcript_mapping.decode_task(task)[1] for task in tasks]
+
+    # TaskIDs decoded with assignment solutions are reused instead of being calculated from input objects
+    task_id_to_attempts = evaluation.get_tasks_attempts(assignments_solutions, lib.audio_transcript_mapping)
+    assert all(a is b for a, b in zip(task_id_to_attempts, task_ids))
+
+    # solutions which do not correspond to assignment tasks are identified by input objects
+    model_assignment = toloka.Assignment(id='', user_id='model')
+    task_id_to_attempts = evaluation.get_tasks_attempts(
+        [(model_assignment, assignments_solutions[0][1])], lib.audio_transcript_mapping
+    )
+    assert task_id_to_attempts == {task_id: 1 for task_id in task_ids}
+
+
 def test_evaluate_markup_assignment():
     assignment, solutions = lib.create_markup_assignment(
         audio_text_pairs=[
@@ -309,6 +332,65 @@ def test_evaluate_markup_assignment():
     )
 
 
+def test_assignment_evaluation_cache():
+    assignment, solutions = lib.create_markup_assignment(
+        audio_text_pairs=[
+            (Audio(url='https://storage.net/01.wav'), Text(text='hallo')),
+            (Audio(url='https://storage.net/02.wav'), Text(text='michael')),
+        ],
+        id='123',
+        user_id='gleb',
+    )
+    checks = [('https://storage.net/01.wav', 'hallo', True), ('https://storage.net/02.wav', 'michael', False)]
+    cache = evaluation.AssignmentEvaluationCache()
+
+    def evaluate(
+        solution_id_to_evaluation: Dict[mapping.TaskID, evaluation.SolutionEvaluation],
+        assignment: toloka.Assignment,
+    ) -> evaluation.AssignmentEvaluation:
+        return evaluation.CheckAssignmentAccuracyEvaluationStrategy(
+            solution_id_to_evaluation, lib.audio_transcript_check_mapping, cache
+        ).evaluate_assignment((assignment, solutions))
+
+    with patch.object(
+        evaluation.CheckAssignmentAccuracyEvaluationStrategy,
+        'ok',
+        autospec=True,
+        side_effect=evaluation.CheckAssignmentAccuracyEvaluationStrategy.ok,
+    ) as ok:
+        expected = evaluation.AssignmentEvaluation(
+            assignment=assignment, ok_checks=1, total_checks=2, objects=2, incorrect_solution_indexes=[1]
+        )
+        assert evaluate(lib.generate_evaluations(checks), assignment) == expected
+        assert ok.call_count == 2
+
+        # same check results, received again, and changed assignment status
+        accepted_assignment = deepcopy(assignment)
+        accepted_assignment.status = toloka.Assignment.ACCEPTED
+        assert evaluate(lib.generate_evaluations(checks), accepted_assignment) == evaluation.AssignmentEvaluation(
+            assignment=accepted_assignment, ok_checks=1, total_checks=2, objects=2, incorrect_solution_indexes=[1]
+        )
+        assert ok.call_count == 2
+
+        # check results with same verdicts, but other confidence and check assignments
+        evaluations = lib.generate_evaluations(checks)
+        for solution_evaluation in evaluations.values():
+            solution_evaluation.confidence = 0.9
+            solution_evaluation.worker_labels = [(lib.cat, worker.Human(accepted_assignment))]
+        assert evaluate(evaluations, assignment) == expected
+        assert ok.call_count == 2
+        assert cache.version == 1
+
+        # check results are changed
+        checks[1] = ('https://storage.net/02.wav', 'michael', True)
+        assert evaluate(lib.generate_evaluations(checks), assignment) == evaluation.AssignmentEvaluation(
+            assignment=assignment, ok_checks=2, total_checks=2, objects=2, incorrect_solution_indexes=[]
+        )
+        assert ok.call_count == 4
+        assert cache.version == 2
+        assert len(cache.evaluations) == 1
+
+
 def test_evaluate_classification_assignment():
     # TODO: need to test optional solution objects
     dog, cat = lib.dog, lib.cat
@@ -334,6 +416,44 @@ def test_evaluate_classification_assignment():
     )
 
 
+def test_control_tasks_comparators():
+    task_mapping = lib.image_classification_expert_task_mapping
+    strategy = evaluation.ControlTasksAssignmentAccuracyEvaluationStrategy(task_mapping)
+    image = Image(url='https://storage.net/1.jpg')
+    dog, cat = lib.dog, lib.cat
+    ok, bad = base.BinaryEvaluation(ok=True), base.BinaryEvaluation(ok=False)
+    comment = Text(text='good dog')
+
+    def control_task(task_id: str, expected_solution: dict) -> toloka.Task:
+        return toloka.Task(
+            id=task_id,
+            input_values=task_mapping.toloka_values((image,)),
+            known_solutions=[toloka.Task.KnownSolution(output_values=expected_solution, correctness_weight=1)],
+        )
+
+    # comment is not checked
+    task = control_task('task-1', {'choice': 'dog', '_ok': True})
+    assert strategy.ok(task, ((image,), (dog, ok, comment))) is True
+    assert strategy.ok(task, ((image,), (dog, ok, None))) is True
+    assert strategy.ok(task, ((image,), (dog, bad, comment))) is False
+    assert strategy.ok(task, ((image,), (cat, ok, comment))) is False
+    assert strategy.ok(toloka.Task(id='task-2', input_values=task.input_values), ((image,), (dog, ok, None))) is None
+
+    # expected comment is missing in solution
+    task = control_task('task-3', {'choice': 'dog', '_comment': 'good dog'})
+    assert strategy.ok(task, ((image,), (dog, bad, comment))) is True
+    assert strategy.ok(task, ((image,), (dog, bad, None))) is False
+
+    # expected value is not in output mapping
+    task = control_task('task-4', {'choice': 'dog', 'extra': 'value'})
+    assert strategy.ok(task, ((image,), (dog, ok, comment))) is False
+
+    assert strategy.comparators.keys() == {'task-1', 'task-3', 'task-4'}
+    # comparators are compiled once per control task
+    task = control_task('task-1', {'choice': 'cat', '_ok': True})
+    assert strategy.ok(task, ((image,), (dog, ok, comment))) is True
+
+
 @patch('crowdom.control.rule.datetime', wraps=datetime)
 def test_apply_rules_to_assignment(mock_datetime):
     now = datetime.datetime(2020, 11, 5)
@@ -492,16 +612,6 @@ def test_evaluate_submitted_markup_assignments_and_apply_rules(mock_datetime):
             0.5,
             evaluations_1,
             [
-                (
-                    'patch_assignment',
-                    (
-                        'assignment 0',
-                        toloka.assignment.AssignmentPatch(
-                            status=toloka.Assignment.ACCEPTED,
-                            public_comment='',
-                        ),
-                    ),
-                ),
                 (
                     'set_user_restriction',
                     (
@@ -513,6 +623,16 @@ def test_evaluate_submitted_markup_assignments_and_apply_rules(mock_datetime):
                         ),
                     ),
                 ),
+                (
+                    'patch_assignment',
+                    (
+                        'assignment 0',
+                        toloka.assignment.AssignmentPatch(
+                            status=toloka.Assignment.ACCEPTED,
+                            public_comment='',
+                        ),
+                    ),
+                ),
                 (
                     'patch_assignment',
                     (
@@ -973,15 +1093,6 @@ def test_prior_filter_assignments():
                         ),
                     ),
                 ),
-                (
-                    'patch_assignment',
-                    (
-                        'duration-4-tasks-4',
-                        toloka.AssignmentPatch(
-                            public_comment='Too few correct solutions', status=toloka.Assignment.Status.REJECTED
-                        ),
-                    ),
-                ),
                 (
                     'set_user_restriction',
                     (
@@ -1016,6 +1127,15 @@ def test_prior_filter_assignments():
                         ),
                     ),
                 ),
+                (
+                    'patch_assignment',
+                    (
+                        'duration-4-tasks-4',
+                        toloka.AssignmentPatch(
+                            public_comment='Too few correct solutions', status=toloka.Assignment.Status.REJECTED
+                        ),
+                    ),
+                ),
             ],
         ),
         (
@@ -1034,15 +1154,6 @@ def test_prior_filter_assignments():
                         ),
                     ),
                 ),
-                (
-                    'patch_assignment',
-                    (
-                        'duration-4-tasks-4',
-                        toloka.AssignmentPatch(
-                            public_comment='Too few correct solutions', status=toloka.Assignment.Status.REJECTED
-                        ),
-                    ),
-                ),
                 (
                     'set_user_restriction',
                     (
@@ -1054,15 +1165,6 @@ def test_prior_filter_assignments():
                         ),
                     ),
                 ),
-                (
-                    'patch_assignment',
-                    (
-                        'duration-5-tasks-4',
-                        toloka.AssignmentPatch(
-                            public_comment='Too few correct solutions', status=toloka.Assignment.Status.REJECTED
-                        ),
-                    ),
-                ),
                 (
                     'set_user_restriction',
                     (
@@ -1096,6 +1198,24 @@ def test_prior_filter_assignments():
                         ),
                     ),
                 ),
+                (
+                    'patch_assignment',
+                    (
+                        'duration-4-tasks-4',
+                        toloka.AssignmentPatch(
+                            public_comment='Too few correct solutions', status=toloka.Assignment.Status.REJECTED
+                        ),
+                    ),
+                ),
+                (
+                    'patch_assignment',
+                    (
+                        'duration-5-tasks-4',
+                        toloka.AssignmentPatch(
+                            public_comment='Too few correct solutions', status=toloka.Assignment.Status.REJECTED
+                        ),
+                    ),
+                ),
             ],
         ),
     ]:
@@ -1113,6 +1233,26 @@ def test_prior_filter_assignments():
         assert fast_assignments == expected_fast_assignments
         assert stub.calls == expected_calls
 
+    calls = []
+
+    def counting_task_duration_function(input_objects: Tuple[Image]) -> datetime.timedelta:
+        calls.append(input_objects)
+        return custom_task_duration_function(input_objects)
+
+    # tasks without Toloka ID are not memoized
+    evaluation.get_assignments_durations(assignments, counting_task_duration_function)
+    assert len(calls) == sum(len(solutions) for _, solutions in assignments)
+
+    # expected durations are calculated once per task, tasks are identified by Toloka task ID
+    for assignment, _ in assignments:
+        for i, task in enumerate(assignment.tasks):
+            task.id = f'task-{i}'
+    calls = []
+    durations, duration_hints = evaluation.get_assignments_durations(assignments, counting_task_duration_function)
+    assert len(calls) == 4
+    assert durations.tolist() == [seconds * 10**6 for seconds in [4, 5, 24, 25, 7, 7]]
+    assert duration_hints.tolist() == [seconds * 10**6 for seconds in [100, 100, 100, 100, 30, 10]]
+
 
 def test_calculate_worker_weights():
     dog, cat = lib.dog, lib.cat
@@ -1152,3 +1292,50 @@ def test_calculate_worker_weights():
         assignments,
         evaluation.ControlTasksAssignmentAccuracyEvaluationStrategy(lib.image_classification_mapping),
     ) == {'alice': 2.5 / 3, 'bob': 0.5 / 5, 'john': 2.5 / 5, 'mary': 0.5 / 3}
+
+    class CountingStrategy(evaluation.ControlTasksAssignmentAccuracyEvaluationStrategy):
+        evaluated: List[str] = []
+
+        def evaluate_assignment(
+            self, assignment_solutions: mapping.AssignmentSolutions
+        ) -> evaluation.AssignmentEvaluation:
+            self.evaluated.append(assignment_solutions[0].id)
+            return super(CountingStrategy, self).evaluate_assignment(assignment_solutions)
+
+    for i, (assignment, _) in enumerate(assignments):
+        assignment.id = f'assignment-{i}'
+        assignment.status = toloka.Assignment.SUBMITTED
+    strategy = CountingStrategy(lib.image_classification_mapping)
+    accumulator = evaluation.WorkerWeightsAccumulator()
+
+    def calculate_worker_weights(assignments_solutions: List[mapping.AssignmentSolutions]) -> Dict[str, float]:
+        strategy.evaluated.clear()
+        return evaluation.calculate_worker_weights(assignments_solutions, strategy, accumulator=accumulator)
+
+    assert calculate_worker_weights(assignments[:4]) == {'bob': 0.5 / 5, 'john': 2.5 / 5}
+    assert strategy.evaluated == [f'assignment-{i}' for i in range(4)]
+
+    # only new and re-verdicted assignments are evaluated
+    assignments[0][0].status = toloka.Assignment.ACCEPTED
+    assert calculate_worker_weights(assignments) == {'alice': 2.5 / 3, 'bob': 0.5 / 5, 'john': 2.5 / 5, 'mary': 0.5 / 3}
+    assert strategy.evaluated == ['assignment-0', 'assignment-4', 'assignment-5']
+
+    # counts of assignments which are no longer passed are withdrawn
+    assert calculate_worker_weights(assignments[1:4]) == {'bob': 0.5 / 5, 'john': 1.5 / 3}
+    assert strategy.evaluated == []
+
+    class ChangingStrategy(evaluation.CustomEvaluationStrategy):
+        ok_value = True
+
+        def ok(self, task: toloka.Task, solution: mapping.TaskSingleSolution) -> Optional[bool]:
+            return self.ok_value
+
+        def update(self):
+            self.ok_value = not self.ok_value
+
+    # evaluations of custom strategy can change, so weights are calculated from all assignments
+    strategy = ChangingStrategy()
+    accumulator = evaluation.WorkerWeightsAccumulator()
+    assert evaluation.calculate_worker_weights(assignments[:1], strategy, accumulator=accumulator) == {'john': 4.5 / 5}
+    strategy.update()
+    assert evaluation.calculate_worker_weights(assignments[:1], strategy, accumulator=accumulator) == {'john': 0.5 / 5}
@@ -1,5 +1,7 @@
 from collections import defaultdict
 from dataclasses import dataclass
+import datetime
+import pickle
 import pytest
 
 import toloka.client as toloka
@@ -95,6 +97,32 @@ class TestMapping:
         assert lib.text_mapping.from_values({}) is None
         assert lib.text_mapping.to_values(None) == {}
 
+    def test_object_mapping_codec(self):
+        assert lib.audio_mapping.codec is not None
+        assert lib.audio_class_mapping.codec is not None
+        assert lib.audio_class_mapping.to_values(lib.sp) == {'choice': 'sp'}
+        assert lib.audio_class_mapping.from_values({'choice': 'sp', 'id': 'extra'}) == lib.sp
+
+        with pytest.raises(AssertionError) as e:
+            lib.audio_mapping.from_values({'audio_link': 1})
+        assert str(e.value) == "obj field type <class 'str'> does not match to values type <class 'int'>"
+
+        # unexpected runtime value is reported by generic path
+        with pytest.raises(ValueError) as e:
+            lib.audio_mapping.to_values(Audio(url=None))  # noqa
+        assert str(e.value) == "object field \"url\" has unsupported type <class 'NoneType'>"
+
+    def test_object_mapping_codec_fallback(self):
+        @dataclass
+        class Volume(base.Object):
+            volume: float
+
+        volume_mapping = mapping.ObjectMapping(obj_meta=base.ObjectMeta(Volume), obj_task_fields=(('volume', 'v'),))
+        assert volume_mapping.codec is None
+        with pytest.raises(ValueError) as e:
+            volume_mapping.to_values(Volume(volume=0.5))
+        assert str(e.value) == "object field \"volume\" has unsupported type <class 'float'>"
+
     def test_invalid_object_mapping_not_dataclass(self):
         class NotDataclass:
             pass
@@ -202,6 +230,98 @@ class TestMapping:
             "Audio(url='https://2.wav') Text(text='hi')": 1,
         }
 
+    def test_task_id_digest(self):
+        long_text = 'hello world ' * 1000
+        task_id = lib.audio_transcript_check_mapping.task_id((Audio(url='https://1.wav'), Text(text=long_text)))
+        same_task_id = mapping.TaskID((Audio(url='https://1.wav'), Text(text=long_text)))
+        other_task_id = mapping.TaskID((Audio(url='https://1.wav'), Text(text=long_text + '!')))
+
+        assert len(task_id.digest) == mapping.TASK_ID_DIGEST_SIZE
+        assert task_id == same_task_id and hash(task_id) == hash(same_task_id)
+        assert task_id != other_task_id
+        assert task_id.id == f"Audio(url='https://1.wav') Text(text='{long_text}')"
+
+        # Toloka input values still contain full string ID, so tasks from existing pools are matched
+        task = lib.audio_transcript_check_mapping.to_task((Audio(url='https://1.wav'), Text(text=long_text)))
+        assert task.input_values[mapping.TASK_ID_FIELD] == task_id.id
+
+        restored_task_id = pickle.loads(pickle.dumps(task_id))
+        assert restored_task_id == task_id and hash(restored_task_id) == hash(task_id)
+        assert restored_task_id.objects == task_id.objects
+
+    def test_task_index(self):
+        audios = [(Audio(url=f'https://{i}.wav'),) for i in range(3)]
+        task_index = mapping.TaskIndex.from_objects(lib.audio_transcript_mapping, [audios[1], audios[0], audios[1]])
+
+        assert len(task_index) == 2
+        assert task_index.objects() == [audios[1], audios[0]]
+        assert task_index.index(mapping.TaskID(audios[0])) == 1
+        assert task_index.get(mapping.TaskID(audios[2])) is None
+        assert mapping.TaskID(audios[2]) not in task_index
+
+        assert task_index.add(mapping.TaskID(audios[2])) == 2
+        assert task_index.add(mapping.TaskID(audios[1])) == 0
+        assert task_index[2] == mapping.TaskID(audios[2])
+        assert list(task_index) == [mapping.TaskID(objects) for objects in (audios[1], audios[0], audios[2])]
+        assert task_index.to_dict(['b', 'a']) == {mapping.TaskID(audios[1]): 'b', mapping.TaskID(audios[0]): 'a'}
+
+    def test_decoded_task_cache(self):
+        cache = mapping.DecodedTaskCache(max_entries=2)
+        tasks = []
+        for i in range(3):
+            task = lib.audio_transcript_mapping.to_task((Audio(url=f'https://{i}.wav'),))
+            task.id = f'task-{i}'
+            tasks.append(task)
+
+        objects, task_id = cache.get_or_decode(tasks[0], lib.audio_transcript_mapping)
+        assert objects == (Audio(url='https://0.wav'),)
+        assert task_id == mapping.TaskID(objects)
+        assert cache.get_or_decode(tasks[0], lib.audio_transcript_mapping)[0] is objects
+        assert (cache.hits, cache.misses) == (1, 1)
+
+        # same task with another mapping is decoded again
+        assert cache.get_or_decode(tasks[0], lib.audio_transcript_ext_mapping)[0] == objects
+        assert (cache.hits, cache.misses, len(cache)) == (1, 2, 2)
+
+        # least recently used entry is evicted
+        cache.get_or_decode(tasks[0], lib.audio_transcript_mapping)
+        cache.get_or_decode(tasks[1], lib.audio_transcript_mapping)
+        assert len(cache) == 2
+        cache.get_or_decode(tasks[0], lib.audio_transcript_mapping)
+        assert (cache.hits, cache.misses) == (3, 3)
+        cache.get_or_decode(tasks[0], lib.audio_transcript_ext_mapping)
+        assert (cache.hits, cache.misses) == (3, 4)
+
+        # size bound
+        cache = mapping.DecodedTaskCache(max_size=2 * len(task_id.id))
+        for task in tasks:
+            cache.get_or_decode(task, lib.audio_transcript_mapping)
+        assert len(cache) == 2
+        assert cache.size == 2 * len(task_id.id)
+
+        # tasks without ID are not cached
+        task = lib.audio_transcript_mapping.to_task((Audio(url='https://4.wav'),))
+        assert cache.get_or_decode(task, lib.audio_transcript_mapping)[0] == (Audio(url='https://4.wav'),)
+        assert len(cache) == 2
+
+    def test_decoded_task_ids_reuse(self):
+        tasks, solutions = [], []
+        for i in range(3):
+            task = lib.audio_transcript_mapping.to_task((Audio(url=f'https://{i}.wav'),))
+            task.id = f'task-{i}'
+            tasks.append(task)
+            solutions.append(lib.audio_transcript_mapping.to_solution((Text(text=str(i)),)))
+        assignment = toloka.Assignment(id='a', user_id='w', tasks=tasks, solutions=solutions)
+        assignments_solutions = mapping.get_assignments_solutions([assignment], lib.audio_transcript_mapping)
+        task_ids = [lib.audio_transcript_mapping.decode_task(task)[1] for task in tasks]
+
+        # TaskIDs decoded with assignment solutions are reused instead of being calculated from input objects
+        task_index = mapping.TaskIndex()
+        mapping.AssignmentFrame.from_assignments_solutions(
+            assignments_solutions, lib.audio_transcript_mapping, task_index
+        )
+        assert all(a is b for a, b in zip(task_index, task_ids))
+
     def test_get_solutions(self):
         audios = [Audio(url=f'https://{i + 1}.wav') for i in range(3)]
         control_audio = Audio(url='https://42.wav')
@@ -360,6 +480,51 @@ class TestMapping:
             task_mapping.to_toloka_input_spec()
 
 
+def test_assignment_frame():
+    images = [Image(url=f'https://storage.net/{i}.jpg') for i in range(3)]
+    control_image = Image(url='https://storage.net/control.jpg')
+    cat, dog = lib.cat, lib.dog
+    assignments_solutions = [
+        lib.create_classification_assignment(
+            [(images[0], cat), (control_image, dog), (images[1], dog)],
+            [(control_image, cat)],
+            id='a1',
+            user_id='bob',
+            status=toloka.Assignment.ACCEPTED,
+        ),
+        lib.create_classification_assignment(
+            [(images[1], cat), (images[2], cat)],
+            [],
+            id='a2',
+            user_id='alice',
+            status=toloka.Assignment.REJECTED,
+            duration=datetime.timedelta(seconds=10),
+        ),
+    ]
+    # control task solution is omitted, as with with_control_tasks=False
+    assignments_solutions[0] = (assignments_solutions[0][0], [assignments_solutions[0][1][i] for i in (0, 2)])
+
+    task_index = mapping.TaskIndex.from_objects(lib.image_classification_mapping, [(images[2],)])
+    frame = mapping.AssignmentFrame.from_assignments_solutions(
+        assignments_solutions, lib.image_classification_mapping, task_index
+    )
+
+    assert len(frame) == 2
+    assert frame.task_index is task_index
+    assert frame.assignment_ids.tolist() == ['a1', 'a2']
+    assert frame.worker_ids.tolist() == ['bob', 'alice']
+    assert frame.durations().tolist() == [datetime.timedelta(seconds=40), datetime.timedelta(seconds=10)]
+    assert frame.status_mask([toloka.Assignment.ACCEPTED]).tolist() == [True, False]
+
+    assert frame.solution_assignment_indices.tolist() == [0, 0, 1, 1]
+    assert task_index.objects() == [(images[2],), (images[0],), (images[1],)]
+    assert frame.task_indices.tolist() == [1, 2, 2, 0]
+    assert frame.known_solutions.tolist() == [False, False, False, False]
+
+    assert frame.task_attempts().tolist() == [1, 1, 2]
+    assert frame.task_attempts(statuses=[toloka.Assignment.ACCEPTED]).tolist() == [0, 1, 1]
+
+
 class TestProjectSuitability:
     def test_is_suitable(self):
         assert (
@@ -0,0 +1,110 @@
+import threading
+import time
+
+import httpx
+import pytest
+from tenacity import Retrying, retry_if_exception_type, stop_after_attempt
+import toloka.client as toloka
+
+from crowdom import scheduler
+
+
+def test_token_bucket():
+    s = scheduler.RequestScheduler(rate=20.0, capacity=2.0)
+    start = time.monotonic()
+    for _ in range(4):
+        s.acquire()
+    # two requests are admitted immediately, next two wait for tokens
+    assert 0.09 <= time.monotonic() - start <= 0.5
+
+
+def test_rate_is_limited_by_default():
+    s = scheduler.RequestScheduler()
+    assert (s.rate, s.capacity) == (10.0, 10.0)
+    start = time.monotonic()
+    for _ in range(11):
+        s.acquire()
+    # burst of one second of requests is admitted immediately, next request waits for token
+    assert 0.09 <= time.monotonic() - start <= 0.5
+
+    # clients have their own schedulers unless scheduler is shared explicitly
+    clients = [scheduler.ScheduledTolokaClient(token='', url='https://toloka.dev') for _ in range(2)]
+    assert clients[0].scheduler is not clients[1].scheduler
+    assert scheduler.ScheduledTolokaClient(token='', url='https://toloka.dev', scheduler=s).scheduler is s
+
+
+def test_priority():
+    s = scheduler.RequestScheduler(rate=10.0, capacity=1.0)
+    s.acquire()
+    order = []
+
+    def request(name: str, value: scheduler.Priority):
+        with scheduler.priority(value):
+            s.acquire()
+        order.append(name)
+
+    threads = []
+    for name, value in [('metrics', scheduler.Priority.METRICS), ('loop', scheduler.Priority.LOOP)]:
+        thread = threading.Thread(target=request, args=(name, value))
+        thread.start()
+        threads.append(thread)
+        while len(s.waiters) < len(threads):
+            time.sleep(0.001)
+    for thread in threads:
+        thread.join()
+
+    # metrics request is waiting longer, but loop request is served first
+    assert order == ['loop', 'metrics']
+    assert scheduler.get_priority() == scheduler.Priority.LOOP
+
+
+def test_retry_budget():
+    s = scheduler.RequestScheduler(retry_ratio=0.5, min_retries_per_second=0.0, max_retries=2.0)
+    assert s.withdraw_retry()
+    assert s.withdraw_retry()
+    assert not s.withdraw_retry()
+    s.acquire()
+    assert not s.withdraw_retry()
+    s.acquire()
+    assert s.withdraw_retry()
+    # retries do not refill budget
+    s.acquire(retry=True)
+    s.acquire(retry=True)
+    assert not s.withdraw_retry()
+
+
+def test_retry_budget_refill_is_awaited():
+    s = scheduler.RequestScheduler(retry_ratio=0.0, min_retries_per_second=20.0, max_retries=1.0)
+    assert s.withdraw_retry()
+    start = time.monotonic()
+    assert s.withdraw_retry()
+    assert 0.04 <= time.monotonic() - start <= 0.5
+
+
+def test_scheduled_client():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.path)
+        if len(requests) == 1:
+            return httpx.Response(500, json={'code': 'INTERNAL_ERROR'})
+        return httpx.Response(200, json={'id': '1', 'status': 'CLOSED'})
+
+    class Client(scheduler.ScheduledTolokaClient):
+        def _session_for_thread(self, thread_id: int) -> httpx.Client:
+            return httpx.Client(base_url=self.url, transport=httpx.MockTransport(handler))
+
+    s = scheduler.RequestScheduler(retry_ratio=0.0, min_retries_per_second=0.0, max_retries=1.0)
+    client = Client(token='', url='https://toloka.dev', scheduler=s)
+    client.retrying = Retrying(
+        stop=stop_after_attempt(3), retry=retry_if_exception_type(client.EXCEPTIONS_TO_RETRY), reraise=True
+    )
+
+    assert client.get_pool('1').status == toloka.Pool.Status.CLOSED
+    assert requests == ['/api/v1/pools/1'] * 2
+
+    # retry budget is spent on the first request, so API error is raised without retry
+    requests.clear()
+    with pytest.raises(toloka.exceptions.InternalApiError):
+        client.get_pool('1')
+    assert requests == ['/api/v1/pools/1']
@@ -0,0 +1,141 @@
+import asyncio
+import threading
+import time
+
+from mock import patch
+import pytest
+import toloka.client as toloka
+
+from crowdom import utils
+
+
+def test_map_concurrently():
+    threads = set()
+
+    def func(item: int) -> int:
+        threads.add(threading.get_ident())
+        return item * 2
+
+    items = list(range(1000))
+    assert utils.map_concurrently(func, items, workers=4, batch_size=10) == [item * 2 for item in items]
+    assert threading.get_ident() not in threads
+
+    threads.clear()
+    assert utils.map_concurrently(func, items[:10], workers=4, batch_size=10) == [item * 2 for item in items[:10]]
+    assert threads == {threading.get_ident()}
+
+    assert utils.map_concurrently(func, [], workers=4) == []
+
+
+@patch('crowdom.utils.time.sleep')
+def test_call_with_retries(sleep):
+    calls = []
+
+    def func() -> str:
+        calls.append(None)
+        if len(calls) < 3:
+            raise toloka.exceptions.TooManyRequestsApiError(status_code=429)
+        return 'ok'
+
+    assert utils.call_with_retries(func, retries=2, backoff_seconds=1.0) == 'ok'
+    assert len(calls) == 3
+    delays = [args[0] for args, _ in sleep.call_args_list]
+    assert 1.0 <= delays[0] <= 1.5 and 2.0 <= delays[1] <= 3.0
+
+    calls.clear()
+    with pytest.raises(toloka.exceptions.TooManyRequestsApiError):
+        utils.call_with_retries(func, retries=1)
+    assert len(calls) == 2
+
+
+def test_async_toloka_client():
+    class Client:
+        url = 'https://toloka.dev/api'
+
+        def __init__(self):
+            # both calls have to be made at the same time to pass the barrier
+            self.barrier = threading.Barrier(2, timeout=5.0)
+
+        def get_pool(self, pool_id: str) -> toloka.Pool:
+            self.barrier.wait()
+            return toloka.Pool(id=pool_id)
+
+    client = utils.AsyncTolokaClient(Client())
+    assert client.url == 'https://toloka.dev/api'
+
+    async def get_pools():
+        return await asyncio.gather(client.get_pool('1'), client.get_pool('2'))
+
+    assert asyncio.run(get_pools()) == [toloka.Pool(id='1'), toloka.Pool(id='2')]
+
+
+def test_pool_close_backoff():
+    backoff = utils.PoolCloseBackoff(min_interval_seconds=1.0, max_interval_seconds=10.0)
+    for interval in [1.0, 2.0, 4.0, 8.0, 10.0, 10.0]:
+        assert max(interval / 2, 1.0) <= backoff.next_delay() <= interval
+
+
+@patch('crowdom.utils.time.monotonic')
+def test_pool_close_backoff_forecast(monotonic):
+    monotonic.side_effect = [0.0, 10.0]
+    backoff = utils.PoolCloseBackoff(min_interval_seconds=1.0, max_interval_seconds=60.0, factor=60.0)
+    assert backoff.next_delay(50.0) == 1.0
+    # 40% are completed in 10 seconds, so the rest 10% are expected to be completed in 2.5 seconds
+    assert backoff.next_delay(90.0) == 2.5
+
+
+def test_wait_pool_for_close_forecast():
+    class Client:
+        url = 'https://toloka.dev/api'
+
+        def __init__(self):
+            self.calls = []
+
+        def get_pool(self, pool_id: str) -> toloka.Pool:
+            self.calls.append('get_pool')
+            pool = toloka.Pool(id=pool_id)
+            pool.is_closed = lambda: self.calls.count('get_pool') > 4
+            return pool
+
+        def get_analytics(self, requests):
+            self.calls.append('get_analytics')
+            return toloka.operations.AnalyticsOperation(details={'value': [{'result': {'value': 50}}]})
+
+        def wait_operation(self, operation):
+            return operation
+
+    client = Client()
+    utils.wait_pool_for_close(client, 'pool', pull_interval_seconds=0.04, min_pull_interval_seconds=0.01)  # noqa
+    # completion percentage is requested only when checks interval reaches its maximum
+    assert client.calls == [
+        'get_pool',
+        'get_pool',
+        'get_pool',
+        'get_analytics',
+        'get_pool',
+        'get_analytics',
+        'get_pool',
+    ]
+
+
+def test_wait_pool_for_close_wake_up():
+    class Client:
+        url = 'https://toloka.dev/api'
+
+        def __init__(self):
+            self.calls = []
+
+        def get_pool(self, pool_id: str) -> toloka.Pool:
+            self.calls.append('get_pool')
+            pool = toloka.Pool(id=pool_id)
+            pool.is_closed = lambda: len(self.calls) > 1
+            return pool
+
+    client = Client()
+    wake_up = threading.Event()
+    wake_up.set()
+    start = time.monotonic()
+    utils.wait_pool_for_close(client, 'pool', wake_up=wake_up, forecast_completion=False)  # noqa
+    assert time.monotonic() - start < 0.5
+    assert client.calls == ['get_pool', 'get_pool']
+    assert not wake_up.is_set()